@@ -2,7 +2,6 @@ import math
 import numpy as np
 from config import *
 from config import half_circle
-import pygame.draw
 
 class RelativeState:
   """
@@ -122,6 +121,7 @@ class Agent:
     half_circle(canvas, env.toX(self.x), env.toY(self.y), env.toP(self.r), color=self.c, dir=self.dir)
 
   def _draw_eyes(self, env, canvas: "pygame.Surface", bx: float, by: float) -> None:
+    import pygame.draw
     angle = math.pi * RIGHT_AGENT_ANGLE / 180
     if self.dir == 1:
         angle = math.pi * LEFT_AGENT_ANGLE / 180
@@ -154,6 +154,7 @@ class Agent:
                        int(env.toP(self.r * PUPIL_RADIUS_FACTOR)))
 
   def _draw_lives(self, env, canvas: "pygame.Surface") -> None:
+    import pygame.draw
     for i in range(1, self.life):
         x_pos = self.dir * (REF_W / 2 + LIVES_OFFSET_X - i * LIVES_SPACING)
         y_pos = LIVES_OFFSET_Y
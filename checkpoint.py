@@ -0,0 +1,150 @@
+"""
+Full-state checkpoints for long training runs.
+
+A checkpoint is one .npz file holding the arrays of a run (population,
+winning streaks, ...) and a json 'meta' entry with counters and RNG states:
+the legacy np.random state and the bit generator state of any
+np.random.Generator (e.g. env.np_random). Files are written under a temporary
+name and os.replace'd into place, so a crash never leaves a torn checkpoint.
+
+CheckpointWriter does the writing on a background thread: submit() only copies
+the arrays, training continues while the file is written.
+
+usage:
+
+  writer = CheckpointWriter(keep=3)
+  writer.submit("run/ckpt_00001000.npz", {'population': population}, {'tournament': 1000,
+    'np_random': rng_state(), 'env_random': rng_state(env.np_random)})
+  ...
+  writer.close()
+
+  arrays, meta = load("run/ckpt_00001000.npz")
+  set_rng_state(meta['np_random'])
+"""
+
+import os
+import sys
+import json
+import queue
+import threading
+import numpy as np
+
+def _to_json(value):
+  if isinstance(value, np.ndarray):
+    return {'__ndarray__': value.tolist(), 'dtype': value.dtype.str}
+  if isinstance(value, dict):
+    return {k: _to_json(v) for k, v in value.items()}
+  if isinstance(value, (list, tuple)):
+    return [_to_json(v) for v in value]
+  if isinstance(value, np.generic):
+    return value.item()
+  return value
+
+def _from_json(value):
+  if isinstance(value, dict):
+    if '__ndarray__' in value:
+      return np.array(value['__ndarray__'], dtype=np.dtype(value['dtype']))
+    return {k: _from_json(v) for k, v in value.items()}
+  if isinstance(value, list):
+    return [_from_json(v) for v in value]
+  return value
+
+def rng_state(np_random=None):
+  """ json-able state of a np.random.Generator, or of the global np.random when None """
+  if np_random is None:
+    return _to_json(list(np.random.get_state()))
+  return _to_json(np_random.bit_generator.state)
+
+def set_rng_state(state, np_random=None):
+  """ inverse of rng_state """
+  state = _from_json(state)
+  if np_random is None:
+    np.random.set_state(tuple(state))
+  else:
+    np_random.bit_generator.state = state
+
+def save(filename, arrays, meta):
+  """ write arrays (dict of numpy arrays) and meta (json-able dict) atomically """
+  tmp = filename + ".tmp"
+  with open(tmp, 'wb') as out:
+    np.savez(out, __meta__=np.frombuffer(json.dumps(_to_json(meta)).encode('utf-8'), dtype=np.uint8), **arrays)
+  os.replace(tmp, filename)
+
+def load(filename):
+  """ returns (dict of arrays, meta) """
+  with np.load(filename) as data:
+    arrays = {k: data[k] for k in data.files if k != '__meta__'}
+    meta = json.loads(data['__meta__'].tobytes().decode('utf-8'))
+  return arrays, meta
+
+def latest(path, prefix="ckpt_"):
+  """ most recent checkpoint file in path (names sort by counter), or None """
+  if not os.path.isdir(path):
+    return None
+  names = sorted(f for f in os.listdir(path) if f.startswith(prefix) and f.endswith(".npz"))
+  return os.path.join(path, names[-1]) if names else None
+
+def resume_file(path, resume):
+  """
+  checkpoint for a --resume flag: 'latest' is the most recent one in path, or None (the run starts
+  fresh) when there is none yet. any other value is a filename, the run stops if it doesn't exist.
+  """
+  if resume == 'latest':
+    filename = latest(path)
+    if filename is None:
+      print("no checkpoint in", path+", starting fresh")
+    return filename
+  if not os.path.exists(resume):
+    sys.exit("checkpoint not found: "+resume)
+  return resume
+
+class CheckpointWriter:
+  """ writes checkpoints (and any other saves handed to submit_call) on a background thread, in order """
+  def __init__(self, keep=None):
+    self.keep = keep # number of most recent checkpoints to keep on disk (None: all)
+    self.written = []
+    self._queue = queue.Queue()
+    self._error = None
+    self._thread = threading.Thread(target=self._loop, daemon=True)
+    self._thread.start()
+
+  def _loop(self):
+    while True:
+      job = self._queue.get()
+      if job is None:
+        return
+      fn, args = job
+      try:
+        fn(*args)
+      except Exception as e: # surfaced by the next submit / close
+        self._error = e
+
+  def _check(self):
+    if self._error is not None:
+      error, self._error = self._error, None
+      raise error
+
+  def _save(self, filename, arrays, meta):
+    save(filename, arrays, meta)
+    self.written.append(filename)
+    while self.keep is not None and len(self.written) > self.keep:
+      old = self.written.pop(0)
+      if os.path.exists(old):
+        os.remove(old)
+
+  def submit(self, filename, arrays, meta):
+    """ snapshot arrays now (a copy), write them later """
+    self._check()
+    snapshot = {k: np.array(v, copy=True) for k, v in arrays.items()}
+    self._queue.put((self._save, (filename, snapshot, _to_json(meta))))
+
+  def submit_call(self, fn, *args):
+    """ run fn(*args) on the writer thread, args must not be modified afterwards """
+    self._check()
+    self._queue.put((fn, args))
+
+  def close(self):
+    """ wait for every pending write """
+    self._queue.put(None)
+    self._thread.join()
+    self._check()
@@ -0,0 +1,101 @@
+"""
+CMA-ES (Hansen's (mu/mu_w, lambda)-CMA-ES with rank-one and rank-mu updates), numpy only.
+
+every generation is one ask() / tell() pair on the whole population at once:
+candidates are drawn as a (popsize, n) matrix, and the covariance update is a
+couple of matrix products (no per-candidate python loop). fitness is maximized.
+
+usage:
+
+  es = CMAES(np.zeros(n), sigma=0.5, popsize=64)
+  while True:
+    solutions = es.ask()
+    es.tell(solutions, fitness_of(solutions))
+"""
+
+import numpy as np
+
+class CMAES:
+  def __init__(self, x0, sigma=0.5, popsize=None, np_random=None):
+    self.n = n = len(x0)
+    self.np_random = np.random.default_rng() if np_random is None else np_random
+    self.popsize = popsize if popsize is not None else 4 + int(3 * np.log(n))
+    self.mu = self.popsize // 2
+    weights = np.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+    self.weights = weights / weights.sum()
+    self.mueff = 1.0 / np.sum(self.weights ** 2)
+
+    # adaptation constants (defaults from "The CMA Evolution Strategy: A Tutorial")
+    self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+    self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+    self.c1 = 2 / ((n + 1.3) ** 2 + self.mueff)
+    self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff))
+    self.damps = 1 + 2 * max(0, np.sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+    self.chiN = np.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n * n))
+
+    self.mean = np.array(x0, dtype=np.float64)
+    self.sigma = float(sigma)
+    self.C = np.eye(n)
+    self.B = np.eye(n)
+    self.D = np.ones(n)
+    self.pc = np.zeros(n)
+    self.ps = np.zeros(n)
+    self.generation = 0
+    self.eigen_generation = 0 # generation of the last eigendecomposition
+    self.best_solution = self.mean.copy()
+    self.best_fitness = -np.inf
+
+  def ask(self):
+    """ (popsize, n) candidates """
+    z = self.np_random.standard_normal((self.popsize, self.n))
+    self.y = (z * self.D) @ self.B.T # ~ N(0, C)
+    return self.mean + self.sigma * self.y
+
+  def tell(self, solutions, fitness):
+    """ update from the candidates of the last ask() and their (popsize,) fitness """
+    fitness = np.asarray(fitness, dtype=np.float64)
+    order = np.argsort(-fitness)
+    if fitness[order[0]] > self.best_fitness:
+      self.best_fitness = float(fitness[order[0]])
+      self.best_solution = np.array(solutions[order[0]])
+    n = self.n
+    y = self.y[order[:self.mu]]
+    y_w = self.weights @ y
+    self.mean = self.mean + self.sigma * y_w
+    self.generation += 1
+
+    # step-size path uses C^-1/2 y_w = B D^-1 B^T y_w
+    invsqrt_y = self.B @ ((self.B.T @ y_w) / self.D)
+    self.ps = (1 - self.cs) * self.ps + np.sqrt(self.cs * (2 - self.cs) * self.mueff) * invsqrt_y
+    ps_norm = np.linalg.norm(self.ps)
+    hsig = ps_norm / np.sqrt(1 - (1 - self.cs) ** (2 * self.generation)) / self.chiN < 1.4 + 2 / (n + 1)
+    self.pc = (1 - self.cc) * self.pc + hsig * np.sqrt(self.cc * (2 - self.cc) * self.mueff) * y_w
+
+    rank_one = np.outer(self.pc, self.pc) + (1 - hsig) * self.cc * (2 - self.cc) * self.C
+    rank_mu = (y * self.weights[:, None]).T @ y
+    self.C = (1 - self.c1 - self.cmu) * self.C + self.c1 * rank_one + self.cmu * rank_mu
+    self.sigma *= np.exp((self.cs / self.damps) * (ps_norm / self.chiN - 1))
+
+    # the eigendecomposition is O(n^3), only redo it every few generations
+    if self.generation - self.eigen_generation > 1 / (self.c1 + self.cmu) / n / 10:
+      self.eigen_generation = self.generation
+      self.C = np.triu(self.C) + np.triu(self.C, 1).T
+      eigenvalues, self.B = np.linalg.eigh(self.C)
+      self.D = np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+  def get_state(self):
+    """ (arrays, meta) for checkpoint.save """
+    arrays = {'mean': self.mean, 'C': self.C, 'B': self.B, 'D': self.D, 'pc': self.pc, 'ps': self.ps,
+              'best_solution': self.best_solution}
+    meta = {'sigma': self.sigma, 'generation': self.generation, 'eigen_generation': self.eigen_generation,
+            'best_fitness': self.best_fitness, 'np_random': self.np_random.bit_generator.state}
+    return arrays, meta
+
+  def set_state(self, arrays, meta):
+    for name in ['mean', 'C', 'B', 'D', 'pc', 'ps', 'best_solution']:
+      setattr(self, name, np.array(arrays[name]))
+    self.sigma = meta['sigma']
+    self.generation = meta['generation']
+    self.eigen_generation = meta['eigen_generation']
+    self.best_fitness = meta['best_fitness']
+    self.np_random.bit_generator.state = meta['np_random']
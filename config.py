@@ -1,5 +1,5 @@
 import math
-import pygame
+# pygame is only imported by the drawing helpers, so headless workers never load it.
 # import pygame.gfxdraw # Removed as filled_pie is not available
 
 from collections import namedtuple
@@ -75,6 +75,7 @@ ACTION_THRESHOLD = 0.75
 
 
 def half_circle(surface, x, y, r, color, dir):
+    import pygame
     # Draw a full circle
     pygame.draw.circle(surface, color, (int(x), int(y)), int(r))
 
@@ -0,0 +1,218 @@
+"""
+Streaming offline-RL dataset of SlimeVolley transitions.
+
+Each shard is a directory holding one .npy file per field (column), written
+through np.memmap so a rollout loop only copies a row into the page cache.
+Full shards are flushed to disk by a background thread while the next shard
+is being filled. index.json lists the shards and how many rows each holds.
+
+Row t holds (obs, action, reward, terminated, truncated, otherObs, otherAction),
+where obs/otherObs are the observations the two agents acted on, so the
+next observation of a transition is row t+1 unless terminated or truncated.
+
+layout:
+
+  path/index.json
+  path/shard_00000/obs.npy
+  path/shard_00000/action.npy
+  ...
+"""
+
+import os
+import json
+import queue
+import threading
+import numpy as np
+
+INDEX_FILE = "index.json"
+
+# pack the 3 binary buttons (forward, backward, jump) into one byte
+ACTION_BITS = np.array([1, 2, 4], dtype=np.uint8)
+
+def pack_action(action):
+  """ (..., 3) actions (interpreted as in Agent.setAction) -> (...) uint8 """
+  action = np.asarray(action)
+  return ((action > 0) * ACTION_BITS).sum(axis=-1).astype(np.uint8)
+
+def unpack_action(packed):
+  """ (...) uint8 -> (..., 3) float32 multi-binary actions """
+  packed = np.asarray(packed, dtype=np.uint8)
+  return ((packed[..., None] & ACTION_BITS) > 0).astype(np.float32)
+
+def make_fields(obs_shape=(12,)):
+  """ column layout: name -> (dtype, per-row shape). pixel obs are stored as uint8 """
+  obs_shape = tuple(obs_shape)
+  obs_dtype = np.uint8 if len(obs_shape) == 3 else np.float32
+  return {
+    'obs': (obs_dtype, obs_shape),
+    'action': (np.uint8, ()),
+    'reward': (np.float32, ()),
+    'terminated': (np.bool_, ()),
+    'truncated': (np.bool_, ()),
+    'otherObs': (obs_dtype, obs_shape),
+    'otherAction': (np.uint8, ()),
+  }
+
+class DatasetWriter:
+  """
+  writes transitions into fixed-size memory-mapped shards.
+
+  usage:
+
+  writer = DatasetWriter("data/baseline_selfplay")
+  multiagent_rollout(env, policy_right, policy_left, recorder=writer)
+  writer.close()
+  """
+  def __init__(self, path, shard_size=65536, obs_shape=(12,)):
+    self.path = path
+    self.shard_size = int(shard_size)
+    self.fields = make_fields(obs_shape)
+    self.shards = [] # list of [name, count], in order
+    self.columns = None
+    self.count = 0 # rows written into the current shard
+    self._flush_queue = queue.Queue()
+    self._flush_error = None
+    self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+    self._flusher.start()
+    os.makedirs(path, exist_ok=True)
+
+  def _open_shard(self):
+    name = "shard_"+str(len(self.shards)).zfill(5)
+    shard_dir = os.path.join(self.path, name)
+    os.makedirs(shard_dir, exist_ok=True)
+    self.columns = {}
+    for field, (dtype, shape) in self.fields.items():
+      filename = os.path.join(shard_dir, field+".npy")
+      self.columns[field] = np.lib.format.open_memmap(filename, mode='w+',
+        dtype=dtype, shape=(self.shard_size,)+shape)
+    self.shards.append([name, 0])
+    self.count = 0
+
+  def _close_shard(self):
+    # hand the full shard to the background thread, keep simulating.
+    self._flush_queue.put(self.columns)
+    self.columns = None
+
+  def _flush_loop(self):
+    while True:
+      columns = self._flush_queue.get()
+      if columns is None:
+        return
+      try:
+        for column in columns.values():
+          column.flush()
+        del columns
+      except Exception as e: # surfaced by close()
+        self._flush_error = e
+
+  def _write_index(self):
+    index = {
+      'shard_size': self.shard_size,
+      'fields': {k: [np.dtype(d).str, list(s)] for k, (d, s) in self.fields.items()},
+      'shards': self.shards,
+    }
+    tmp = os.path.join(self.path, INDEX_FILE+".tmp")
+    with open(tmp, 'wt') as out:
+      json.dump(index, out, indent=2)
+    os.replace(tmp, os.path.join(self.path, INDEX_FILE))
+
+  def write_batch(self, obs, action, reward, terminated, truncated, otherObs, otherAction):
+    """ append N transitions, each argument has N rows. actions are (N, 3) """
+    batch = {
+      'obs': obs,
+      'action': pack_action(action),
+      'reward': reward,
+      'terminated': terminated,
+      'truncated': truncated,
+      'otherObs': otherObs,
+      'otherAction': pack_action(otherAction),
+    }
+    n = len(batch['action'])
+    start = 0
+    while start < n:
+      if self.columns is None:
+        self._open_shard()
+      size = min(n - start, self.shard_size - self.count)
+      for field, column in self.columns.items():
+        column[self.count:self.count+size] = batch[field][start:start+size]
+      self.count += size
+      self.shards[-1][1] = self.count
+      start += size
+      if self.count == self.shard_size:
+        self._close_shard()
+        self._write_index()
+
+  def write(self, obs, action, reward, terminated, truncated, otherObs, otherAction):
+    """ append a single transition """
+    self.write_batch(np.asarray(obs)[None], np.asarray(action)[None], np.asarray([reward]),
+      np.asarray([terminated]), np.asarray([truncated]), np.asarray(otherObs)[None],
+      np.asarray(otherAction)[None])
+
+  def __len__(self):
+    return sum(count for _, count in self.shards)
+
+  def close(self):
+    if self.columns is not None:
+      self._close_shard()
+    self._flush_queue.put(None)
+    self._flusher.join()
+    self._write_index()
+    if self._flush_error is not None:
+      raise self._flush_error
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+class DatasetReader:
+  """
+  samples random minibatches across shards.
+
+  columns are opened with np.load(mmap_mode='r') on first use, so only the
+  pages touched by a minibatch are ever read from disk.
+  """
+  def __init__(self, path):
+    self.path = path
+    with open(os.path.join(path, INDEX_FILE)) as f:
+      index = json.load(f)
+    self.fields = {k: (np.dtype(d), tuple(s)) for k, (d, s) in index['fields'].items()}
+    self.shards = [(name, count) for name, count in index['shards'] if count > 0]
+    self.offsets = np.cumsum([0] + [count for _, count in self.shards])
+    self._columns = {}
+
+  def __len__(self):
+    return int(self.offsets[-1])
+
+  def column(self, shard, field):
+    """ zero-copy view of one field of one shard, trimmed to the rows written """
+    key = (shard, field)
+    if key not in self._columns:
+      name, count = self.shards[shard]
+      filename = os.path.join(self.path, name, field+".npy")
+      self._columns[key] = np.load(filename, mmap_mode='r')[:count]
+    return self._columns[key]
+
+  def get(self, indices, fields=None):
+    """ gather global row indices (in any order) from every shard they fall in """
+    indices = np.asarray(indices, dtype=np.int64)
+    fields = list(self.fields) if fields is None else fields
+    shard_ids = np.searchsorted(self.offsets, indices, side='right') - 1
+    batch = {}
+    for field in fields:
+      dtype, shape = self.fields[field]
+      batch[field] = np.empty((len(indices),)+shape, dtype=dtype)
+    for shard in np.unique(shard_ids):
+      rows = np.nonzero(shard_ids == shard)[0]
+      local = indices[rows] - self.offsets[shard]
+      for field in fields:
+        batch[field][rows] = self.column(shard, field)[local]
+    return batch
+
+  def sample(self, batch_size, np_random=None, fields=None):
+    """ uniformly sample a minibatch of transitions """
+    if np_random is None:
+      np_random = np.random.default_rng()
+    indices = np_random.integers(len(self), size=batch_size)
+    return self.get(indices, fields=fields)
@@ -0,0 +1,113 @@
+"""
+OpenAI-ES (Salimans et al. 2017) with a shared Gaussian noise table, numpy only.
+
+the noise table is one large read-only float32 array, generated from a seed and
+placed in shared memory so every worker process maps the same pages. a
+perturbation is a slice noise[index:index+n], so a candidate is identified by
+(index, sign): theta + sign * sigma * noise[index:index+n]. workers only need
+the current theta and a list of indices, and only send back fitnesses.
+
+sampling is antithetic (every index is evaluated with both signs), fitness is
+rank normalized (centered ranks in [-0.5, 0.5]) and theta follows Adam on the
+estimated gradient. fitness is maximized.
+
+usage:
+
+  noise = NoiseTable(2**25, seed=0)
+  es = OpenES(np.zeros(n), noise, popsize=256)
+  while True:
+    indices = es.ask()
+    es.tell(indices, fitness_of(es.theta, indices)) # (popsize/2, 2) fitness for signs (+1, -1)
+"""
+
+import numpy as np
+from multiprocessing import shared_memory
+
+class NoiseTable:
+  """ size float32 N(0,1) samples in shared memory. create with a seed, attach in workers by name """
+  def __init__(self, size, seed=0, name=None):
+    self.size = size
+    if name is None:
+      self.shm = shared_memory.SharedMemory(create=True, size=size * 4)
+      self.owner = True
+      self.noise = np.ndarray(size, dtype=np.float32, buffer=self.shm.buf)
+      np.random.default_rng(seed).standard_normal(size, dtype=np.float32, out=self.noise)
+    else:
+      self.shm = shared_memory.SharedMemory(name=name)
+      self.owner = False
+      self.noise = np.ndarray(size, dtype=np.float32, buffer=self.shm.buf)
+
+  @property
+  def name(self):
+    return self.shm.name
+
+  def get(self, index, dim):
+    return self.noise[index:index+dim]
+
+  def sample_index(self, np_random, dim, count=None):
+    return np_random.integers(0, self.size - dim + 1, size=count)
+
+  def close(self):
+    del self.noise
+    self.shm.close()
+    if self.owner:
+      self.shm.unlink()
+
+def centered_ranks(x):
+  """ ranks of x (any shape) mapped to [-0.5, 0.5], ties broken by position """
+  ranks = np.empty(x.size)
+  ranks[np.argsort(x.ravel())] = np.arange(x.size)
+  return (ranks / (x.size - 1) - 0.5).reshape(x.shape)
+
+class OpenES:
+  def __init__(self, theta0, noise, sigma=0.1, popsize=256, learning_rate=0.01, weight_decay=0.005,
+               beta1=0.9, beta2=0.999, np_random=None):
+    assert popsize % 2 == 0, "popsize must be even (antithetic pairs)"
+    self.theta = np.array(theta0, dtype=np.float64)
+    self.n = len(self.theta)
+    self.noise = noise
+    self.sigma = sigma
+    self.popsize = popsize
+    self.learning_rate = learning_rate
+    self.weight_decay = weight_decay
+    self.beta1 = beta1
+    self.beta2 = beta2
+    self.np_random = np.random.default_rng() if np_random is None else np_random
+    self.m = np.zeros(self.n)
+    self.v = np.zeros(self.n)
+    self.generation = 0
+
+  def ask(self):
+    """ (popsize/2,) noise indices, each one is evaluated with sign +1 and -1 """
+    return self.noise.sample_index(self.np_random, self.n, self.popsize // 2)
+
+  def perturbation(self, index, sign):
+    return self.theta + sign * self.sigma * self.noise.get(index, self.n)
+
+  def tell(self, indices, fitness):
+    """ update theta from (popsize/2, 2) fitness: column 0 for theta + sigma*eps, column 1 for theta - sigma*eps """
+    ranks = centered_ranks(np.asarray(fitness, dtype=np.float64))
+    weights = ranks[:, 0] - ranks[:, 1]
+    epsilon = self.noise.noise[np.asarray(indices)[:, None] + np.arange(self.n)] # (popsize/2, n)
+    gradient = (weights @ epsilon) / (len(indices) * 2 * self.sigma)
+    gradient -= self.weight_decay * self.theta
+
+    # Adam, ascending
+    self.generation += 1
+    self.m = self.beta1 * self.m + (1 - self.beta1) * gradient
+    self.v = self.beta2 * self.v + (1 - self.beta2) * gradient * gradient
+    step = self.learning_rate * np.sqrt(1 - self.beta2 ** self.generation) / (1 - self.beta1 ** self.generation)
+    self.theta = self.theta + step * self.m / (np.sqrt(self.v) + 1e-8)
+
+  def get_state(self):
+    """ (arrays, meta) for checkpoint.save """
+    arrays = {'theta': self.theta, 'm': self.m, 'v': self.v}
+    meta = {'generation': self.generation, 'sigma': self.sigma, 'np_random': self.np_random.bit_generator.state}
+    return arrays, meta
+
+  def set_state(self, arrays, meta):
+    for name in ['theta', 'm', 'v']:
+      setattr(self, name, np.array(arrays[name]))
+    self.generation = meta['generation']
+    self.sigma = meta['sigma']
+    self.np_random.bit_generator.state = meta['np_random']
@@ -0,0 +1,158 @@
+"""
+Event index over recorded matches.
+
+While a match is simulated, Game logs sparse per-frame events (agent touches,
+fence and stub bounces, net crossings, scoring, delay-screen resets) into an
+EventRecorder attached as game.events. The recorder builds an EventIndex: a
+compact table sorted by (match, frame), plus the row offset of every match
+in the dataset / replay it was recorded alongside, so query results can be
+turned into seekable positions without re-simulating anything.
+
+frames are 1-based game steps (the same as env.t), so the dataset row of
+(match, frame) is matches['offset'][match] + frame - 1.
+"""
+
+import numpy as np
+
+# event types
+TOUCH = 1 # value: -1 left agent, 1 right agent
+STUB_BOUNCE = 2 # ball bounced off the round stub above the fence
+FENCE_BOUNCE = 3 # ball bounced off the side of the fence
+NET_CROSS = 4 # value: direction the ball is heading (-1 to the left, 1 to the right)
+SCORE = 5 # value: score returned by Game.step (1 right agent scored, -1 left agent scored)
+DELAY_RESET = 6 # ball is held still again after a point
+
+EVENT_NAMES = {
+  TOUCH: "touch",
+  STUB_BOUNCE: "stub_bounce",
+  FENCE_BOUNCE: "fence_bounce",
+  NET_CROSS: "net_cross",
+  SCORE: "score",
+  DELAY_RESET: "delay_reset",
+}
+
+EVENT_DTYPE = np.dtype([('match', np.int32), ('frame', np.int32), ('type', np.uint8), ('value', np.int8)])
+MATCH_DTYPE = np.dtype([('offset', np.int64), ('length', np.int32)])
+RALLY_DTYPE = np.dtype([('match', np.int32), ('start', np.int32), ('end', np.int32),
+                        ('winner', np.int8), ('touches', np.int32), ('crossings', np.int32),
+                        ('last_contact', np.uint8)])
+
+class EventRecorder:
+  """
+  collects events from Game while matches are played.
+
+  usage:
+
+  recorder = EventRecorder()
+  multiagent_rollout(env, policy_right, policy_left, events=recorder)
+  index = recorder.build()
+  """
+  def __init__(self):
+    self.events = []
+    self.matches = []
+    self.match = -1
+    self.offset = 0
+
+  def begin_match(self, offset=None):
+    """ offset: row of the first frame in the dataset (defaults to right after the previous match) """
+    if offset is None:
+      offset = self.offset
+    self.match += 1
+    self.offset = offset
+    self.matches.append((offset, 0))
+
+  def log(self, frame, kind, value=0):
+    self.events.append((self.match, frame, kind, value))
+
+  def end_match(self, length):
+    self.matches[-1] = (self.offset, length)
+    self.offset += length
+
+  def build(self):
+    return EventIndex(np.array(self.events, dtype=EVENT_DTYPE), np.array(self.matches, dtype=MATCH_DTYPE))
+
+class EventIndex:
+  """ sorted event table with per-rally summaries and seekable query results """
+  def __init__(self, events, matches):
+    order = np.lexsort((events['frame'], events['match']))
+    self.events = events[order]
+    self.matches = matches
+    self._rallies = None
+
+  def save(self, filename):
+    np.savez(filename, events=self.events, matches=self.matches)
+
+  @staticmethod
+  def load(filename):
+    data = np.load(filename)
+    return EventIndex(data['events'], data['matches'])
+
+  def of_type(self, kind):
+    return self.events[self.events['type'] == kind]
+
+  def rows(self, table):
+    """ dataset rows of events (or of rally ends) in table """
+    frame = table['frame'] if 'frame' in table.dtype.names else table['end']
+    return self.matches['offset'][table['match']] + frame - 1
+
+  def rallies(self):
+    """
+    one row per rally: a rally ends with a SCORE event, or with the end of its match.
+    last_contact is the type of the final touch / stub / fence event of the rally.
+    """
+    if self._rallies is not None:
+      return self._rallies
+    events = self.events
+    n = len(events)
+    is_score = events['type'] == SCORE
+    boundary = np.ones(n, dtype=bool)
+    if n > 0:
+      boundary[1:] = (events['match'][1:] != events['match'][:-1]) | is_score[:-1]
+    rally_id = np.cumsum(boundary) - 1
+    num_rallies = int(rally_id[-1]) + 1 if n > 0 else 0
+
+    # matches without any events still count as one (empty) rally each
+    first = np.nonzero(boundary)[0]
+    rallies = np.zeros(num_rallies, dtype=RALLY_DTYPE)
+    rallies['match'] = events['match'][first]
+    ends = np.nonzero(is_score)[0]
+    rallies['end'] = self.matches['length'][rallies['match']]
+    rallies['end'][rally_id[ends]] = events['frame'][ends]
+    rallies['winner'][rally_id[ends]] = events['value'][ends]
+    same_match = np.zeros(num_rallies, dtype=bool)
+    same_match[1:] = rallies['match'][1:] == rallies['match'][:-1]
+    rallies['start'][1:] = np.where(same_match[1:], rallies['end'][:-1], 0)
+
+    rallies['touches'] = np.bincount(rally_id, weights=events['type'] == TOUCH, minlength=num_rallies)
+    rallies['crossings'] = np.bincount(rally_id, weights=events['type'] == NET_CROSS, minlength=num_rallies)
+    contact = np.nonzero(np.isin(events['type'], (TOUCH, STUB_BOUNCE, FENCE_BOUNCE)))[0]
+    last = np.full(num_rallies, -1)
+    np.maximum.at(last, rally_id[contact], contact)
+    has_contact = last >= 0
+    rallies['last_contact'][has_contact] = events['type'][last[has_contact]]
+
+    missing = np.setdiff1d(np.arange(len(self.matches)), rallies['match'])
+    if len(missing) > 0:
+      empty = np.zeros(len(missing), dtype=RALLY_DTYPE)
+      empty['match'] = missing
+      empty['end'] = self.matches['length'][missing]
+      rallies = np.sort(np.concatenate([rallies, empty]), order=['match', 'start'])
+    # the delay reset after the final point opens a rally that is never played
+    rallies = rallies[(rallies['winner'] != 0) | (rallies['end'] > rallies['start'])]
+    self._rallies = rallies
+    return rallies
+
+  def long_rallies(self, min_frames):
+    """ e.g. long_rallies(300): rallies longer than 300 frames """
+    rallies = self.rallies()
+    return rallies[(rallies['end'] - rallies['start']) > min_frames]
+
+  def points_lost_to(self, contact=STUB_BOUNCE):
+    """ scored rallies where the last contact before the ball landed was a stub (or fence) bounce """
+    rallies = self.rallies()
+    return rallies[(rallies['winner'] != 0) & (rallies['last_contact'] == contact)]
+
+  def rallies_with_crossings(self, min_crossings):
+    """ e.g. rallies_with_crossings(10): the ball crossed the net more than 10 times """
+    rallies = self.rallies()
+    return rallies[rallies['crossings'] > min_crossings]
@@ -2,8 +2,8 @@ import math
 import numpy as np
 from config import *
 from agent import Agent
+from events import TOUCH, STUB_BOUNCE, FENCE_BOUNCE, NET_CROSS, SCORE, DELAY_RESET
 from typing import Optional
-import pygame
 
 class DelayScreen:
   """ initially the ball is held still for INIT_DELAY_FRAMES(30) frames """
@@ -32,6 +32,8 @@ class Particle:
 
     self.prev_y = self.y
 
+    self.hitFence = False
+
     self.vx = vx
 
     self.vy = vy
@@ -40,7 +42,9 @@ class Particle:
 
     self.c = c
 
-  def display(self, env, canvas: pygame.Surface) -> pygame.Surface:
+  def display(self, env, canvas: "pygame.Surface") -> "pygame.Surface":
+
+    import pygame.draw
 
     pygame.draw.circle(canvas, self.c, (int(env.toX(self.x)), int(env.toY(self.y))), int(env.toP(self.r)))
 
@@ -68,11 +72,13 @@ class Particle:
 
     score = self._check_vertical_bounds()
 
+    self.hitFence = False
+
     if score != NO_SCORE:
 
         return score
 
-    self._check_fence_collision()
+    self.hitFence = self._check_fence_collision()
 
     return NO_SCORE
 
@@ -122,7 +128,9 @@ class Particle:
 
 
 
-  def _check_fence_collision(self) -> None:
+  def _check_fence_collision(self) -> bool:
+
+    hit = False
 
     if (self.x <= (REF_WALL_WIDTH / 2 + self.r)) and (self.prev_x > (REF_WALL_WIDTH / 2 + self.r)) and (self.y <= REF_WALL_HEIGHT):
 
@@ -130,6 +138,8 @@ class Particle:
 
         self.x = REF_WALL_WIDTH / 2 + self.r + NUDGE * TIMESTEP
 
+        hit = True
+
 
 
     if (self.x >= (-REF_WALL_WIDTH / 2 - self.r)) and (self.prev_x < (-REF_WALL_WIDTH / 2 - self.r)) and (self.y <= REF_WALL_HEIGHT):
@@ -138,6 +148,10 @@ class Particle:
 
         self.x = -REF_WALL_WIDTH / 2 - self.r - NUDGE * TIMESTEP
 
+        hit = True
+
+    return hit
+
   def getDist2(self, p: "Particle") -> float: # returns distance squared from p
 
     dy = p.y - self.y
@@ -268,7 +282,9 @@ class Wall:
 
     self.c = c
 
-  def display(self, env, canvas: pygame.Surface) -> pygame.Surface:
+  def display(self, env, canvas: "pygame.Surface") -> "pygame.Surface":
+
+    import pygame.draw
 
     pygame.draw.rect(canvas, self.c, (int(env.toX(self.x-self.w/2)), int(env.toY(self.y+self.h/2)), int(env.toP(self.w)), int(env.toP(self.h))))
 
@@ -290,6 +306,8 @@ class Game:
     self.agent_right: Optional[Agent] = None
     self.delayScreen: Optional[DelayScreen] = None
     self.np_random = np_random
+    self.events = None # optional events.EventRecorder
+    self.frame = 0
     self.reset()
 
   def _create_ball(self) -> Particle:
@@ -307,19 +325,26 @@ class Game:
     self.agent_left.updateState(self.ball, self.agent_right)
     self.agent_right.updateState(self.ball, self.agent_left)
     self.delayScreen = DelayScreen()
+    self.frame = 0
 
   def newMatch(self) -> None:
     self.ball = self._create_ball()
     self.delayScreen.reset()
+    if self.events is not None:
+      self.events.log(self.frame, DELAY_RESET)
 
   def step(self) -> int:
     """ main game loop """
+    self.frame += 1
     self.betweenGameControl()
     self._update_agents()
     self._update_ball()
     self._handle_collisions()
     
     score = -self.ball.checkEdges()
+
+    if self.events is not None:
+      self._log_ball_events()
     
     if score != NO_SCORE:
         self._handle_scoring(score)
@@ -341,12 +366,26 @@ class Game:
   def _handle_collisions(self) -> None:
     if self.ball.isColliding(self.agent_left):
         self.ball.bounce(self.agent_left)
+        if self.events is not None:
+          self.events.log(self.frame, TOUCH, self.agent_left.dir)
     if self.ball.isColliding(self.agent_right):
         self.ball.bounce(self.agent_right)
+        if self.events is not None:
+          self.events.log(self.frame, TOUCH, self.agent_right.dir)
     if self.ball.isColliding(self.fenceStub):
         self.ball.bounce(self.fenceStub)
+        if self.events is not None:
+          self.events.log(self.frame, STUB_BOUNCE)
+
+  def _log_ball_events(self) -> None:
+    if self.ball.hitFence:
+      self.events.log(self.frame, FENCE_BOUNCE)
+    if self.ball.prev_x * self.ball.x < 0:
+      self.events.log(self.frame, NET_CROSS, 1 if self.ball.x > 0 else -1)
 
   def _handle_scoring(self, score: int) -> None:
+    if self.events is not None:
+      self.events.log(self.frame, SCORE, score)
     self.newMatch()
     if score < 0:  # baseline agent won
         self.agent_left.emotion = "happy"
@@ -362,7 +401,7 @@ class Game:
     self.agent_left.updateState(self.ball, self.agent_right)
     self.agent_right.updateState(self.ball, self.agent_left)
 
-  def display(self, env, canvas: pygame.Surface) -> pygame.Surface:
+  def display(self, env, canvas: "pygame.Surface") -> "pygame.Surface":
     # background color
     # if PIXEL_MODE is True, canvas is an RGB array.
     # if PIXEL_MODE is False, canvas is viewer object
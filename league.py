@@ -0,0 +1,105 @@
+"""
+Round-robin league: match results between models, keyed by model hash, and Elo ratings fitted to them.
+
+every pair of models plays `trials` matches once; the result (wins, draws, losses and total score
+from the right agent's perspective) is stored under a key made of both models' content hashes
+(match_cache.policy_key), the engine version, the trial count and the first seed. a model that
+joins the league therefore only needs its own pairings played, and renaming or copying a model
+file doesn't cost any matches.
+
+ratings are the Bradley-Terry maximum likelihood fit of all stored results (draws count half a win
+for each side), on the Elo scale: a 400 point gap means 10:1 odds. every model also gets `prior`
+virtual draws against a 1000-rated opponent, which anchors the scale and keeps the ratings of
+unbeaten or winless models finite. the fit takes milliseconds, so it is redone from the stored
+results instead of updated match by match, and doesn't depend on the order matches were played in.
+
+usage:
+
+  league = League("league.json")
+  for a, b in league.pending(hashes):
+    league.put(a, b, play(a, b))     # {'right': a, 'left': b, 'wins': .., 'draws': .., 'losses': .., 'score': ..}
+  league.save()
+  ratings = league.ratings(hashes)   # hash -> elo
+"""
+
+import os
+import json
+import hashlib
+import itertools
+import numpy as np
+from match_cache import ENGINE_VERSION
+
+class League:
+  def __init__(self, path=None, trials=100, seed=721):
+    self.path = path
+    self.trials = trials
+    self.seed = seed
+    self.results = {}
+    if path is not None and os.path.exists(path):
+      with open(path) as f:
+        self.results = json.load(f)['results']
+
+  def pair_key(self, a, b):
+    """ key of the pairing of model hashes a and b (in either order) under the current settings """
+    digest = hashlib.sha256()
+    digest.update(repr((ENGINE_VERSION, min(a, b), max(a, b), self.trials, self.seed)).encode('utf-8'))
+    return digest.hexdigest()
+
+  def get(self, a, b):
+    return self.results.get(self.pair_key(a, b))
+
+  def put(self, a, b, result):
+    self.results[self.pair_key(a, b)] = result
+
+  def pending(self, hashes):
+    """ pairs of distinct hashes without a stored result """
+    unique = sorted(set(hashes))
+    return [(a, b) for a, b in itertools.combinations(unique, 2) if self.get(a, b) is None]
+
+  def save(self):
+    tmp = self.path + ".tmp"
+    with open(tmp, 'w') as f:
+      json.dump({'results': self.results}, f)
+    os.replace(tmp, self.path)
+
+  def standings(self, hashes):
+    """ hash -> (points, games) over the stored results between these hashes, draws are half a point """
+    unique = sorted(set(hashes))
+    standings = {h: [0.0, 0] for h in unique}
+    for a, b in itertools.combinations(unique, 2):
+      result = self.get(a, b)
+      if result is None:
+        continue
+      games = result['wins'] + result['draws'] + result['losses']
+      standings[result['right']][0] += result['wins'] + 0.5 * result['draws']
+      standings[result['left']][0] += result['losses'] + 0.5 * result['draws']
+      standings[result['right']][1] += games
+      standings[result['left']][1] += games
+    return {h: tuple(s) for h, s in standings.items()}
+
+  def ratings(self, hashes, prior=1.0, iterations=10000, tol=1e-10):
+    """ hash -> Elo rating, fitted to the stored results between these hashes """
+    unique = sorted(set(hashes))
+    index = {h: i for i, h in enumerate(unique)}
+    n = len(unique)
+    games = np.zeros((n, n))
+    points = np.full(n, 0.5 * prior)
+    for a, b in itertools.combinations(unique, 2):
+      result = self.get(a, b)
+      if result is None:
+        continue
+      i, j = index[result['right']], index[result['left']]
+      count = result['wins'] + result['draws'] + result['losses']
+      games[i, j] += count
+      games[j, i] += count
+      points[i] += result['wins'] + 0.5 * result['draws']
+      points[j] += result['losses'] + 0.5 * result['draws']
+    # minorization-maximization (Hunter 2004), strengths relative to the virtual opponent's 1
+    gamma = np.ones(n)
+    for _ in range(iterations):
+      updated = points / ((games / (gamma[:, None] + gamma[None, :])).sum(axis=1) + prior / (gamma + 1.0))
+      converged = np.max(np.abs(np.log(updated / gamma))) < tol
+      gamma = updated
+      if converged:
+        break
+    return {h: 1000.0 + 400.0 * np.log10(gamma[index[h]]) for h in unique}
@@ -0,0 +1,145 @@
+"""
+Compile a small feedforward policy into a lookup table over a quantized state grid.
+
+1. sensitivity: shuffle one observation dimension at a time across recorded
+   (reachable) observations and measure how often the action changes.
+2. keep the k most sensitive dimensions, split each into quantile bins so the
+   grid has at most max_cells cells. fewer dimensions means finer bins, so k
+   is picked by agreement on a validation slice of the observations.
+3. every cell stores the packed action (3 buttons in a byte, see dataset.py):
+   the majority action of the recorded observations that fall into it, or the
+   policy's action at the cell center for cells never visited.
+
+the compiled policy answers with one searchsorted per kept dimension and one
+table lookup, batched via fancy indexing. its agreement with the original on
+held-out trajectories is reported with a one-sided 95% Wilson lower bound.
+
+only stateless policies (mlp.Model) can be compiled: the baseline RNN's action
+depends on its recurrent state, not just on the observation.
+"""
+
+import math
+import numpy as np
+from dataset import pack_action, unpack_action
+
+class LookupPolicy:
+  """ drop-in policy (predict / predict_batch) backed by a quantized action table """
+  def __init__(self, dims, edges, table, center):
+    self.dims = np.asarray(dims, dtype=np.int64)
+    self.edges = [np.asarray(e, dtype=np.float64) for e in edges] # interior bin edges per kept dimension
+    self.table = np.asarray(table, dtype=np.uint8)
+    self.center = np.asarray(center) # value used for dimensions that were dropped
+    self.shape = tuple(len(e) + 1 for e in self.edges)
+
+  def cell_index(self, obs):
+    obs = np.asarray(obs)
+    index = np.zeros(len(obs), dtype=np.int64)
+    for d, e, n in zip(self.dims, self.edges, self.shape): # row-major, as np.ravel_multi_index
+      index *= n
+      index += np.searchsorted(e, obs[:, d], side='right')
+    return index
+
+  def predict_batch(self, obs):
+    return unpack_action(self.table[self.cell_index(obs)])
+
+  def predict(self, obs):
+    return self.predict_batch(np.asarray(obs)[None])[0]
+
+  def save(self, filename):
+    # one float64 array per kept dimension (edges_0, edges_1, ...), no pickled objects
+    np.savez(filename, dims=self.dims, table=self.table, center=self.center,
+      **{'edges_%d' % i: e for i, e in enumerate(self.edges)})
+
+  @staticmethod
+  def load(filename):
+    data = np.load(filename)
+    edges = [data['edges_%d' % i] for i in range(len(data['dims']))]
+    return LookupPolicy(data['dims'], edges, data['table'], data['center'])
+
+def wilson_lower_bound(successes, n, z=1.645):
+  """ one-sided 95% lower confidence bound of a binomial rate """
+  if n == 0:
+    return 0.0
+  p = successes / n
+  denom = 1 + z*z/n
+  centre = p + z*z/(2*n)
+  margin = z * math.sqrt(p*(1-p)/n + z*z/(4*n*n))
+  return (centre - margin) / denom
+
+def sensitivity(predict_batch, obs, np_random=None):
+  """ per dimension: fraction of actions that change when that dimension is shuffled across obs """
+  if np_random is None:
+    np_random = np.random.default_rng(0)
+  base = pack_action(predict_batch(obs))
+  result = np.zeros(obs.shape[1])
+  for d in range(obs.shape[1]):
+    shuffled = obs.copy()
+    shuffled[:, d] = np_random.permutation(obs[:, d])
+    result[d] = np.mean(pack_action(predict_batch(shuffled)) != base)
+  return result
+
+def _build(predict_batch, obs, actions, dims, max_cells, center):
+  """ grid over dims with the cell-center / majority-vote table """
+  num_bins = max(int(round(max_cells ** (1.0 / max(len(dims), 1)))), 1)
+  while num_bins > 1 and num_bins ** len(dims) > max_cells:
+    num_bins -= 1
+  quantiles = np.linspace(0, 1, num_bins + 1)[1:-1]
+  edges = [np.unique(np.quantile(obs[:, d], quantiles)) for d in dims]
+  shape = tuple(len(e) + 1 for e in edges)
+  num_cells = int(np.prod(shape))
+
+  # every cell gets the policy's action at its center first ...
+  centers = []
+  for e, d in zip(edges, dims):
+    lo = np.concatenate([[obs[:, d].min()], e])
+    hi = np.concatenate([e, [obs[:, d].max()]])
+    centers.append((lo + hi) / 2)
+  table = np.zeros(num_cells, dtype=np.uint8)
+  for start in range(0, num_cells, 65536):
+    cells = np.arange(start, min(start + 65536, num_cells))
+    grid = np.tile(center, (len(cells), 1))
+    for axis, idx in enumerate(np.unravel_index(cells, shape)):
+      grid[:, dims[axis]] = centers[axis][idx]
+    table[cells] = pack_action(predict_batch(grid))
+
+  # ... then visited cells take the majority action of the observations inside them
+  policy = LookupPolicy(dims, edges, table, center)
+  votes = np.bincount(policy.cell_index(obs) * 8 + actions, minlength=num_cells * 8).reshape(num_cells, 8)
+  visited = votes.sum(axis=1) > 0
+  table[visited] = votes[visited].argmax(axis=1)
+  return policy
+
+def compile_policy(predict_batch, obs, max_cells=2**20, validation=0.2, min_sensitivity=0.001, np_random=None):
+  """
+  predict_batch: (N, 12) obs -> (N, 3) actions of a stateless policy.
+  obs: (N, 12) reachable observations to compile from, a validation fraction of them
+  is held back to choose how many dimensions to keep.
+  returns (LookupPolicy, per dimension sensitivity).
+  """
+  if np_random is None:
+    np_random = np.random.default_rng(0)
+  obs = np.asarray(obs, dtype=np.float64)
+  scores = sensitivity(predict_batch, obs, np_random)
+  order = [d for d in np.argsort(-scores) if scores[d] >= min_sensitivity] or [int(np.argmax(scores))]
+  center = np.median(obs, axis=0)
+
+  perm = np_random.permutation(len(obs))
+  num_val = int(len(obs) * validation)
+  fit, val = obs[perm[num_val:]], obs[perm[:num_val]]
+  best_k = len(order)
+  if num_val > 0:
+    fit_actions = pack_action(predict_batch(fit))
+    best = -1.0
+    for k in range(1, len(order) + 1):
+      candidate = _build(predict_batch, fit, fit_actions, np.sort(order[:k]), max_cells, center)
+      rate = agreement(candidate, predict_batch, val)[0]
+      if rate > best:
+        best, best_k = rate, k
+
+  policy = _build(predict_batch, obs, pack_action(predict_batch(obs)), np.sort(order[:best_k]), max_cells, center)
+  return policy, scores
+
+def agreement(policy, predict_batch, obs):
+  """ (agreement rate, 95% lower bound) of the compiled policy with the original on obs """
+  same = pack_action(policy.predict_batch(obs)) == pack_action(predict_batch(obs))
+  return float(same.mean()), wilson_lower_bound(int(same.sum()), len(same))
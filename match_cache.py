@@ -0,0 +1,175 @@
+"""
+Persistent cache of match outcomes.
+
+A match played by utils.multiagent_rollout is fully determined by the engine
+code, the game's RNG state when the match starts (env.game.np_random), and
+both policies: their weights and, for the recurrent BaselinePolicy, its state. The cache key is a
+sha256 over all of them (ENGINE_VERSION hashes the simulator and policy sources), and the
+stored value is what the match leaves behind: (score, length), the env RNG
+state after the match and the policies' final recurrent states. A hit
+restores those, so the caller continues exactly as if the match had been
+simulated (except env.game, which still shows the previous match).
+
+policies the cache cannot key (random, remote, noisy or sampling models) are
+simulated every time. entries live in a small in-memory LRU in front of an
+sqlite file (or memory only when path is None), the file is trimmed to
+max_entries by least recent use (checked every trim_every inserts). the file can
+be shared by several processes: every statement commits on its own (no
+transaction holds the write lock between calls), the journal is in WAL mode and
+a writer waits up to timeout seconds for another one to finish.
+
+usage:
+
+  cache = MatchCache("match_cache.sqlite")
+  score, length = multiagent_rollout(env, policy_right, policy_left, cache=cache)
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+from mlp import Model
+from policy import BaselinePolicy
+
+def _engine_version():
+  root = os.path.dirname(os.path.abspath(__file__))
+  digest = hashlib.sha256()
+  # the simulator, and the code that turns a policy's weights into actions and plays the match
+  for name in ['game.py', 'agent.py', 'config.py', 'slimevolley.py', 'policy.py', 'mlp.py', 'precision.py', 'utils.py']:
+    with open(os.path.join(root, name), 'rb') as f:
+      digest.update(f.read())
+  return digest.hexdigest()[:16]
+
+ENGINE_VERSION = _engine_version()
+
+def policy_key(policy):
+  """ content hash of a deterministic policy (including its recurrent state), None if it can't be cached """
+  digest = hashlib.sha256()
+  if isinstance(policy, Model):
+    if policy.sample_output or any(policy.output_noise):
+      return None
+    digest.update(b'mlp' + repr(tuple(policy.game_config)).encode('utf-8'))
+    digest.update(np.ascontiguousarray(policy.get_model_params(), dtype=np.float64).tobytes())
+  elif isinstance(policy, BaselinePolicy):
+    digest.update(b'baseline')
+    for a in (policy.weight, policy.bias, policy.outputState):
+      digest.update(np.ascontiguousarray(a, dtype=np.float64).tobytes())
+  else:
+    return None
+  return digest.hexdigest()
+
+def _policy_state(policy):
+  if isinstance(policy, BaselinePolicy):
+    return [policy.inputState.tolist(), policy.outputState.tolist(), policy.prevOutputState.tolist()]
+  return None
+
+def _set_policy_state(policy, state):
+  if state is not None:
+    policy.inputState, policy.outputState, policy.prevOutputState = [np.array(s) for s in state]
+
+class MatchCache:
+  def __init__(self, path=None, max_entries=1000000, memory_entries=4096, trim_every=1000, timeout=30.0):
+    self.path = path
+    self.max_entries = max_entries
+    self.memory_entries = memory_entries
+    self.trim_every = trim_every
+    self.inserts = 0
+    self.memory = OrderedDict() # key -> value, most recently used last
+    self.hits = 0
+    self.misses = 0
+    self.lock = threading.Lock()
+    self.db = None
+    if path is not None:
+      self.db = sqlite3.connect(path, check_same_thread=False, timeout=timeout, isolation_level=None) # autocommit
+      self.db.execute("PRAGMA journal_mode=WAL")
+      self.db.execute("CREATE TABLE IF NOT EXISTS matches (key TEXT PRIMARY KEY, value TEXT, used REAL)")
+
+  def match_key(self, env, policy_right, policy_left):
+    """ key of the match multiagent_rollout would play next, None if it can't be cached """
+    right, left = policy_key(policy_right), policy_key(policy_left)
+    if right is None or left is None or env.otherAction is not None:
+      return None
+    digest = hashlib.sha256()
+    digest.update(ENGINE_VERSION.encode('utf-8'))
+    digest.update(repr((type(env).__name__, env.t_limit, env.atari_mode, env.from_pixels, env.survival_bonus)).encode('utf-8'))
+    digest.update(json.dumps(env.game.np_random.bit_generator.state, sort_keys=True).encode('utf-8'))
+    digest.update(right.encode('utf-8') + left.encode('utf-8'))
+    return digest.hexdigest()
+
+  def get(self, key):
+    with self.lock:
+      value = self.memory.get(key)
+      if value is not None:
+        self.memory.move_to_end(key)
+      elif self.db is not None:
+        row = self.db.execute("SELECT value FROM matches WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+          value = json.loads(row[0])
+          self.db.execute("UPDATE matches SET used = ? WHERE key = ?", (time.time(), key))
+          self._remember(key, value)
+      if value is None:
+        self.misses += 1
+      else:
+        self.hits += 1
+      return value
+
+  def put(self, key, value):
+    with self.lock:
+      self._remember(key, value)
+      if self.db is not None:
+        self.db.execute("INSERT OR REPLACE INTO matches VALUES (?, ?, ?)", (key, json.dumps(value), time.time()))
+        self.inserts += 1
+        if self.inserts % self.trim_every == 0: # counting is O(entries), don't do it on every insert
+          self.trim()
+
+  def trim(self):
+    """ drop the least recently used rows beyond max_entries from the file """
+    count = self.db.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+    if count > self.max_entries:
+      self.db.execute("DELETE FROM matches WHERE key IN (SELECT key FROM matches ORDER BY used LIMIT ?)",
+        (count - self.max_entries,))
+
+  def _remember(self, key, value):
+    self.memory[key] = value
+    self.memory.move_to_end(key)
+    while len(self.memory) > self.memory_entries:
+      self.memory.popitem(last=False)
+
+  def lookup(self, env, policy_right, policy_left):
+    """ returns (key, (score, length) or None). on a hit the env RNG and policy states are fast-forwarded """
+    key = self.match_key(env, policy_right, policy_left)
+    if key is None:
+      return None, None
+    value = self.get(key)
+    if value is None:
+      return key, None
+    env.game.np_random.bit_generator.state = value['env_random']
+    _set_policy_state(policy_right, value['right_state'])
+    _set_policy_state(policy_left, value['left_state'])
+    return key, (value['score'], value['length'])
+
+  def store(self, key, env, policy_right, policy_left, score, length):
+    """ record the outcome of the match that was keyed by lookup """
+    if key is None:
+      return
+    self.put(key, {
+      'score': score.item() if isinstance(score, np.generic) else score,
+      'length': int(length),
+      'env_random': env.game.np_random.bit_generator.state,
+      'right_state': _policy_state(policy_right),
+      'left_state': _policy_state(policy_left),
+    })
+
+  def stats(self):
+    return {'hits': self.hits, 'misses': self.misses}
+
+  def close(self):
+    if self.db is not None:
+      with self.lock:
+        self.trim()
+      self.db.close()
+      self.db = None
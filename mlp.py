@@ -4,8 +4,11 @@ Simple MLP policy trained via estool (saved in /zoo)
 code from https://github.com/hardmaru/estool
 """
 
+import zipfile
 import numpy as np
-import json
+import weight_cache
+import model_format
+from precision import PRECISIONS, compute_dtype, cast_weight, matmul as precision_matmul
 from collections import namedtuple
 
 def relu(x):
@@ -24,7 +27,47 @@ def softmax(x):
 def sample(p):
   return (np.random.rand(*p.shape) < p).astype(float)
 
-from .config import GameConfig
+# in-place versions of the activations for the batched path (rows are samples)
+
+def relu_(x):
+  return np.maximum(x, 0, out=x)
+
+def tanh_(x):
+  return np.tanh(x, out=x)
+
+def sigmoid_(x):
+  np.negative(x, out=x)
+  np.exp(x, out=x)
+  x += 1
+  return np.reciprocal(x, out=x)
+
+def softmax_(x):
+  x -= x.max(axis=-1, keepdims=True)
+  np.exp(x, out=x)
+  x /= x.sum(axis=-1, keepdims=True)
+  return x
+
+INPLACE_ACTIVATIONS = {relu: relu_, np.tanh: tanh_, sigmoid: sigmoid_, softmax: softmax_, passthru: passthru}
+
+from config import GameConfig
+
+games = {}
+
+games['slimevolley'] = GameConfig(env_name='SlimeVolley',
+  input_size=12,
+  output_size=3,
+  time_factor=0,
+  layers=[20, 20], # hidden size of 20x20 neurons
+  activation='tanh',
+  noise_bias=0.0,
+  output_noise=[False, False, False],
+  rnn_mode=False,
+)
+
+games['slimevolleylite'] = games['slimevolley']._replace(layers=[10, 10]) # hidden size of 10x10 neurons
+
+# actor of the stable-baselines PPO1 MlpPolicy (64x64 tanh, logits out), see model_format.convert_stable_baselines
+games['ppo'] = games['slimevolley']._replace(layers=[64, 64], activation='passthru')
 
 
 
@@ -34,6 +77,8 @@ class Model:
 
   def __init__(self, game_config):
 
+    self.game_config = game_config
+
     self.output_noise = game_config.output_noise
 
     self.env_name = game_config.env_name
@@ -68,6 +113,16 @@ class Model:
 
     self.render_mode = False
 
+    self.batch_buffers = {} # dtype -> input / per-layer outputs for the largest batch so far, and views of the last batch size
+
+    self.precision = 'float64' # default precision of predict_batch
+
+    self.batch_params = {} # precision -> weights, biases, bias_std cast for the batched path
+
+    self.population = None # stacked per-layer views of a population, see set_population
+
+    self.population_size = 0
+
 
 
 
@@ -214,7 +269,7 @@ class Model:
 
 
 
-      self.param_count += (np.product(shape) + shape[1])
+      self.param_count += (np.prod(shape) + shape[1])
 
 
 
@@ -290,9 +345,191 @@ class Model:
 
     return h
 
+  def unflatten_population(self, population):
+
+    # population is (P, param_count), one flat parameter vector per row (as in set_model_params).
+
+    # returns per-layer stacked weights (P, in, out), biases (P, out) and bias_std (P, out).
+
+    # weights and biases are views into population (no copy) when its rows are contiguous.
+
+    population = np.asarray(population)
+
+    num_models = population.shape[0]
+
+    weights, biases, bias_stds = [], [], []
+
+    pointer = 0
+
+    for i in range(len(self.shapes)):
+
+      w_shape = self.shapes[i]
+
+      b_shape = self.shapes[i][1]
+
+      s_w = np.prod(w_shape)
+
+      weights.append(population[:, pointer:pointer+s_w].reshape((num_models,)+w_shape))
+
+      biases.append(population[:, pointer+s_w:pointer+s_w+b_shape])
+
+      pointer += s_w + b_shape
+
+      if self.output_noise[i]:
+
+        log_std = population[:, pointer:pointer+b_shape]
+
+        bias_stds.append(np.exp(self.sigma_factor*log_std + self.sigma_bias))
+
+        pointer += b_shape
+
+      else:
+
+        bias_stds.append(np.broadcast_to(self.bias_std[i], (num_models, b_shape)))
+
+    return weights, biases, bias_stds
+
+  def set_population(self, population):
+
+    self.population = self.unflatten_population(population)
+
+    self.population_size = len(population)
+
+  def predict_population(self, x, t=0, mean_mode=False, np_random=np.random):
+
+    # forward P different policies (set via set_population) at once.
+
+    # x is (P, input_size), or (P, M, input_size) for M observations per policy.
+
+    # returns (P, output_size), or (P, M, output_size).
+
+    weights, biases, bias_stds = self.population
+
+    x = np.asarray(x)
+
+    h = x.reshape(self.population_size, -1, self.input_size)
+
+    if self.time_input == 1:
+
+      time_signal = np.broadcast_to(np.asarray(t, dtype=h.dtype) / self.time_factor, h.shape[:2])
+
+      h = np.concatenate([h, time_signal[:, :, None]], axis=2)
+
+    for i in range(len(weights)):
+
+      h = np.matmul(h, weights[i])
+
+      h += biases[i][:, None, :]
+
+      if (self.output_noise[i] and (not mean_mode)):
+
+        h += np_random.standard_normal(size=h.shape) * bias_stds[i][:, None, :]
+
+      h = INPLACE_ACTIVATIONS[self.activations[i]](h)
+
+    if self.sample_output:
+
+      h = (np_random.random(size=h.shape) < h).astype(h.dtype)
+
+    return h.reshape(x.shape[:-1] + (self.output_size,))
+
+  def set_precision(self, precision):
+
+    # default precision of predict_batch: 'float64', 'float32' or 'int8' (see precision.py)
+
+    assert precision in PRECISIONS, "unknown precision: "+str(precision)
+
+    self.precision = precision
+
+  def _get_batch_params(self, precision):
+
+    if precision not in self.batch_params:
+
+      dtype = compute_dtype(precision)
+
+      self.batch_params[precision] = ([cast_weight(w, precision) for w in self.weight],
+
+                                      [np.asarray(b, dtype=dtype) for b in self.bias],
+
+                                      [np.asarray(s, dtype=dtype) for s in self.bias_std])
+
+    return self.batch_params[precision]
+
+  def _get_batch_buffers(self, batch_size, dtype):
+
+    # one set of buffers per dtype, grown to the largest batch seen. smaller batches use their first rows.
+
+    inputs, outputs, views = self.batch_buffers.get(dtype, (None, None, None))
+
+    if inputs is None or len(inputs) < batch_size:
+
+      inputs = np.zeros((batch_size, self.shapes[0][0]), dtype=dtype)
+
+      outputs = [np.zeros((batch_size, shape[1]), dtype=dtype) for shape in self.shapes]
+
+      views = None
+
+    if views is None or len(views[0]) != batch_size:
+
+      views = (inputs[:batch_size], [out[:batch_size] for out in outputs])
+
+    self.batch_buffers[dtype] = (inputs, outputs, views)
+
+    return views
+
+  def predict_batch(self, x, t=0, mean_mode=False, precision=None, np_random=np.random):
+
+    # x is (N, input_size). returns (N, output_size).
+
+    # the result lives in a preallocated buffer that is overwritten by the next call, copy it to keep it.
+
+    # precision defaults to self.precision, noise and sampling are drawn per row from np_random.
+
+    x = np.asarray(x)
+
+    precision = self.precision if precision is None else precision
+
+    dtype = compute_dtype(precision)
+
+    weight, bias, bias_std = self._get_batch_params(precision)
+
+    inputs, outputs = self._get_batch_buffers(x.shape[0], dtype)
+
+    inputs[:, :self.input_size] = x.reshape(x.shape[0], -1)
+
+    if self.time_input == 1:
+
+      inputs[:, self.input_size] = np.asarray(t, dtype=dtype) / self.time_factor
+
+    h = inputs
+
+    for i in range(len(weight)):
+
+      out = outputs[i]
+
+      precision_matmul(h, weight[i], out)
+
+      out += bias[i]
+
+      if (self.output_noise[i] and (not mean_mode)):
+
+        out += np_random.standard_normal(size=out.shape) * bias_std[i]
+
+      h = INPLACE_ACTIVATIONS[self.activations[i]](out)
+
+    if self.sample_output:
+
+      np.less(np_random.random(size=h.shape), h, out=h)
+
+    return h
+
+
 
+  def set_model_params(self, model_params, copy=True):
 
-  def set_model_params(self, model_params):
+    # copy=False keeps the per-layer weights as (possibly read-only) views of model_params
+
+    self.batch_params = {}
 
     pointer = 0
 
@@ -302,11 +539,13 @@ class Model:
 
       b_shape = self.shapes[i][1]
 
-      s_w = np.product(w_shape)
+      s_w = np.prod(w_shape)
 
       s = s_w + b_shape
 
-      chunk = np.array(model_params[pointer:pointer+s])
+      chunk = model_params[pointer:pointer+s]
+
+      chunk = np.array(chunk) if copy else np.asarray(chunk)
 
       self.weight[i] = chunk[:s_w].reshape(w_shape)
 
@@ -318,7 +557,7 @@ class Model:
 
         s = b_shape
 
-        self.bias_log_std[i] = np.array(model_params[pointer:pointer+s])
+        self.bias_log_std[i] = np.array(model_params[pointer:pointer+s]) if copy else np.asarray(model_params[pointer:pointer+s])
 
         self.bias_std[i] = np.exp(self.sigma_factor*self.bias_log_std[i] + self.sigma_bias)
 
@@ -332,17 +571,49 @@ class Model:
 
   def load_model(self, filename):
 
-    with open(filename) as f:    
+    # binary models (model_format) are memory-mapped, json models are parsed once per process.
+
+    # either way the weights are read-only views, no copy is made.
+
+    if model_format.is_binary(filename):
+
+      model_params, _, data = model_format.load(filename)
 
-      data = json.load(f)
+    else:
+
+      arrays, data = weight_cache.load_json(filename)
+
+      model_params = arrays['params'] # assuming other stuff is in data
 
     print('loading file %s' % (filename))
 
     self.data = data
 
-    model_params = np.array(data[0]) # assuming other stuff is in data
+    assert len(model_params) == self.param_count, "%s has %d parameters, expected %d" % (filename, len(model_params), self.param_count)
+
+    self.set_model_params(model_params, copy=False)
+
+  def get_model_params(self):
+
+    # inverse of set_model_params
+
+    params = []
+
+    for i in range(len(self.shapes)):
+
+      params.append(np.ravel(self.weight[i]))
+
+      params.append(np.ravel(self.bias[i]))
+
+      if self.output_noise[i]:
+
+        params.append(np.ravel(self.bias_log_std[i]))
+
+    return np.concatenate(params)
 
-    self.set_model_params(model_params)
+  def save_model(self, filename, extra=None, dtype=np.float32):
+
+    model_format.save(filename, self.get_model_params(), self.game_config, extra=extra, dtype=dtype)
 
 
 
@@ -354,29 +625,37 @@ class Model:
 
   @staticmethod
 
-  def makeSlimePolicy(filename):
+  def from_file(filename):
+
+    # binary models carry their own layout, json models are matched to mlp.games by parameter count.
+
+    if model_format.is_binary(filename):
+
+      _, game_config, _ = model_format.load(filename)
 
-    game_config = GameConfig(env_name='SlimeVolley',
+    else:
 
-      input_size=12,
+      arrays, _ = weight_cache.load_json(filename)
 
-      output_size=3,
+      matches = [g for g in games.values() if Model(g).param_count == len(arrays['params'])]
 
-      time_factor=0,
+      assert len(matches) > 0, "no known game config fits "+filename
 
-      layers=[20, 20], # hidden size of 20x20 neurons
+      game_config = matches[0]
 
-      activation='tanh',
+    model = Model(game_config)
 
-      noise_bias=0.0,
+    model.load_model(filename)
 
-      output_noise=[False, False, False],
+    return model
 
-      rnn_mode=False,
 
-    )
 
-    model = Model(game_config) 
+  @staticmethod
+
+  def makeSlimePolicy(filename):
+
+    model = Model(games['slimevolley'])
 
     model.load_model(filename)
 
@@ -388,30 +667,30 @@ class Model:
 
   def makeSlimePolicyLite(filename):
 
-    game_config = GameConfig(env_name='SlimeVolley',
+    model = Model(games['slimevolleylite'])
 
-      input_size=12,
+    model.load_model(filename)
 
-      output_size=3,
+    return model
 
-      time_factor=0,
 
-      layers=[10, 10], # hidden size of 20x20 neurons
 
-      activation='tanh',
+  @staticmethod
 
-      noise_bias=0.0,
+  def makePPOPolicy(filename):
 
-      output_noise=[False, False, False],
+    # exported .bin, or the stable-baselines zip itself (actor weights read without tensorflow)
 
-      rnn_mode=False,
+    model = Model(games['ppo'])
 
-    )
+    if zipfile.is_zipfile(filename):
 
-    model = Model(game_config) 
+      params, _ = model_format.read_stable_baselines(filename)
 
-    model.load_model(filename)
+      model.set_model_params(params)
 
-    return model
+    else:
 
+      model.load_model(filename)
 
+    return model
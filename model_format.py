@@ -0,0 +1,130 @@
+"""
+Compact binary model format for mlp.Model parameters.
+
+layout (little endian):
+
+  8 bytes   magic b"SLIMEMLP"
+  uint32    format version
+  uint32    header length in bytes
+  header    utf-8 json: game_config (GameConfig fields), param_count, dtype, extra
+  padding   zeros up to a 64 byte boundary
+  blob      param_count parameters of the given dtype (float32 by default)
+
+the blob is memory-mapped on load, so opening a model costs the same no matter
+how large it is, and processes loading the same file share its pages.
+"""
+
+import io
+import os
+import json
+import zipfile
+import struct
+import numpy as np
+from config import GameConfig
+
+MAGIC = b"SLIMEMLP"
+VERSION = 1
+ALIGN = 64
+EXTENSION = ".bin"
+
+_PREFIX = struct.Struct("<8sII")
+
+def is_binary(filename):
+  with open(filename, 'rb') as f:
+    return f.read(len(MAGIC)) == MAGIC
+
+def dumps(params, game_config, extra=None, dtype=np.float32):
+  """ the bytes of a model file holding params (flat, in set_model_params order) """
+  params = np.asarray(params, dtype=np.dtype(dtype).newbyteorder('<')).ravel()
+  header = json.dumps({
+    'game_config': game_config._asdict(),
+    'param_count': int(params.size),
+    'dtype': params.dtype.str,
+    'extra': extra if extra is not None else {},
+  }).encode('utf-8')
+  offset = _PREFIX.size + len(header)
+  padding = (-offset) % ALIGN
+  return b"".join([_PREFIX.pack(MAGIC, VERSION, len(header)), header, b"\0" * padding, params.tobytes()])
+
+def loads(buffer):
+  """ inverse of dumps: (params, GameConfig, extra), params is a view into buffer """
+  magic, version, header_len = _PREFIX.unpack_from(buffer, 0)
+  assert magic == MAGIC, "not a binary model"
+  assert version <= VERSION, "unsupported model format version %d" % version
+  header = json.loads(bytes(buffer[_PREFIX.size:_PREFIX.size+header_len]).decode('utf-8'))
+  offset = _PREFIX.size + header_len
+  offset += (-offset) % ALIGN
+  params = np.frombuffer(buffer, dtype=np.dtype(header['dtype']), count=header['param_count'], offset=offset)
+  return params, GameConfig(**header['game_config']), header['extra']
+
+def save(filename, params, game_config, extra=None, dtype=np.float32):
+  """ write params (flat, in set_model_params order) atomically """
+  tmp = filename + ".tmp"
+  with open(tmp, 'wb') as out:
+    out.write(dumps(params, game_config, extra, dtype))
+  os.replace(tmp, filename)
+
+def read_header(filename):
+  """ returns (header dict, byte offset of the parameter blob) """
+  with open(filename, 'rb') as f:
+    magic, version, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+    assert magic == MAGIC, filename+" is not a binary model file"
+    assert version <= VERSION, "unsupported model format version %d" % version
+    header = json.loads(f.read(header_len).decode('utf-8'))
+  offset = _PREFIX.size + header_len
+  offset += (-offset) % ALIGN
+  return header, offset
+
+def load(filename):
+  """ returns (read-only memory-mapped params, GameConfig, extra) """
+  header, offset = read_header(filename)
+  params = np.memmap(filename, dtype=np.dtype(header['dtype']), mode='r',
+    offset=offset, shape=(header['param_count'],))
+  return params, GameConfig(**header['game_config']), header['extra']
+
+def convert_json(json_filename, out_filename=None, game_config=None, dtype=np.float32):
+  """
+  convert an estool / GA json model ([params, ...extra]) into the binary format.
+  game_config defaults to the mlp.games entry whose param_count matches.
+  """
+  import mlp
+  with open(json_filename) as f:
+    data = json.load(f)
+  params = np.array(data[0])
+  if game_config is None:
+    game_config = mlp.Model.from_file(json_filename).game_config
+  if out_filename is None:
+    out_filename = os.path.splitext(json_filename)[0] + EXTENSION
+  save(out_filename, params, game_config, extra={'json': data[1:]}, dtype=dtype)
+  return out_filename
+
+def read_stable_baselines(zip_filename, scope='model/pi'):
+  """
+  actor weights of a stable-baselines MlpPolicy zip (PPO1 / PPO2), read without tensorflow.
+  returns (flat params in set_model_params order, hidden layer sizes).
+  """
+  with zipfile.ZipFile(zip_filename) as archive:
+    arrays = np.load(io.BytesIO(archive.read('parameters')))
+    names = [scope+'_fc%d' % i for i in range(len(arrays.files)) if scope+'_fc%d/w:0' % i in arrays.files]
+    names.append(scope)
+    params = []
+    for name in names:
+      params.append(np.ravel(arrays[name+'/w:0']))
+      params.append(np.ravel(arrays[name+'/b:0']))
+    layers = [int(arrays[name+'/b:0'].size) for name in names[:-1]]
+  return np.concatenate(params), layers
+
+def convert_stable_baselines(zip_filename, out_filename=None, dtype=np.float32):
+  """
+  convert the actor of a stable-baselines PPO zip into the binary format (mlp.games['ppo'] layout).
+  the deterministic action (Bernoulli mode, i.e. logits > 0) is what Agent.setAction does with
+  the passthru output, so the exported model plays exactly like PPO1.predict(obs, deterministic=True).
+  """
+  import mlp
+  params, layers = read_stable_baselines(zip_filename)
+  game_config = mlp.games['ppo']
+  assert layers == list(game_config.layers), "unsupported actor layout %s in %s" % (layers, zip_filename)
+  if out_filename is None:
+    out_filename = os.path.splitext(zip_filename)[0] + EXTENSION
+  save(out_filename, params, game_config, extra={'source': os.path.basename(zip_filename)}, dtype=dtype)
+  return out_filename
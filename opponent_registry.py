@@ -0,0 +1,110 @@
+"""
+Versioned registry of self-play opponents, loaded in the background.
+
+a self-play trainer promotes a new generation by writing path/<prefix><generation>.zip
+(zero padded, so names sort by generation). OpponentRegistry watches path from a
+background thread: at most every poll_interval seconds it stats the directory, and
+only when the directory's mtime changed it lists it. every new generation is
+deserialized by loader(filename) on that thread and kept in an in-memory LRU pool of
+the pool_size most recent generations.
+
+latest() and sample() only read the pool under a lock, so an episode reset costs
+O(1), no filesystem access and no deserialization. (inotify would avoid the poll,
+but it is linux-only and not in the standard library; one stat per poll_interval is
+negligible next to an episode.)
+
+usage:
+
+  registry = OpponentRegistry("ppo1_selfplay", lambda f: PPO1.load(f))
+  ...
+  generation, model = registry.sample(np_random, latest_prob=0.8) # (None, None) until one is loaded
+  ...
+  registry.close()
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+class OpponentRegistry:
+  def __init__(self, path, loader, prefix="history_", suffix=".zip", pool_size=8, poll_interval=1.0):
+    self.path = path
+    self.loader = loader
+    self.prefix = prefix
+    self.suffix = suffix
+    self.pool_size = pool_size
+    self.poll_interval = poll_interval
+    self.pool = OrderedDict() # filename -> model, oldest generation first
+    self.loaded = set() # every filename handed to loader, so evicted generations are not reloaded
+    self.lock = threading.Lock()
+    self.error = None
+    self._mtime = None
+    self.poll() # whatever is already there (e.g. when resuming) is available right away
+    self._stop = threading.Event()
+    self._thread = threading.Thread(target=self._loop, daemon=True)
+    self._thread.start()
+
+  def _loop(self):
+    while not self._stop.is_set():
+      try:
+        self.poll()
+      except Exception as e: # surfaced by the next latest / sample
+        self.error = e
+      self._stop.wait(self.poll_interval)
+
+  def poll(self):
+    """ load the generations written since the last poll (called by the background thread) """
+    if not os.path.isdir(self.path):
+      return
+    mtime = os.stat(self.path).st_mtime_ns
+    if mtime == self._mtime:
+      return
+    self._mtime = mtime
+    names = sorted(f for f in os.listdir(self.path) if f.startswith(self.prefix) and f.endswith(self.suffix))
+    for name in names[-self.pool_size:]:
+      filename = os.path.join(self.path, name)
+      if filename in self.loaded:
+        continue
+      model = self.loader(filename)
+      self.loaded.add(filename)
+      with self.lock:
+        self.pool[filename] = model
+        while len(self.pool) > self.pool_size:
+          self.pool.popitem(last=False)
+
+  def _check(self):
+    if self.error is not None:
+      error, self.error = self.error, None
+      raise error
+
+  def __len__(self):
+    return len(self.pool)
+
+  def latest(self):
+    """ (filename, model) of the newest loaded generation, (None, None) if there is none yet """
+    self._check()
+    with self.lock:
+      if len(self.pool) == 0:
+        return None, None
+      filename = next(reversed(self.pool))
+      return filename, self.pool[filename]
+
+  def sample(self, np_random, latest_prob=1.0):
+    """ the newest generation with probability latest_prob, else one drawn uniformly from the pool """
+    if latest_prob >= 1.0:
+      return self.latest()
+    self._check()
+    with self.lock:
+      if len(self.pool) == 0:
+        return None, None
+      filenames = list(self.pool)
+      if np_random.random() >= latest_prob:
+        filename = filenames[np_random.integers(len(filenames))]
+      else:
+        filename = filenames[-1]
+      return filename, self.pool[filename]
+
+  def close(self):
+    self._stop.set()
+    self._thread.join()
@@ -1,7 +1,10 @@
 import numpy as np
-import json
 import os
+import weight_cache
 from config import ACTION_THRESHOLD
+from precision import PRECISIONS, compute_dtype, cast_weight, matmul as precision_matmul
+
+BASELINE_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'models', 'baseline_policy.json')
 
 class BaselinePolicy:
   """ Tiny RNN policy with only 120 parameters of otoro.net/slimevolley agent """
@@ -18,17 +21,21 @@ class BaselinePolicy:
     self.outputState = np.zeros(self.nOutput)
     self.prevOutputState = np.zeros(self.nOutput)
 
-    # Load weights and biases from JSON file
-    model_path = os.path.join(os.path.dirname(__file__), 'assets', 'models', 'baseline_policy.json')
-    with open(model_path, 'r') as f:
-        model_data = json.load(f)
-    
-    self.weight = np.array(model_data['weight'])
-    self.bias = np.array(model_data['bias'])
+    # Load weights and biases from JSON file (parsed once per process, shared read-only)
+    model_data, _ = weight_cache.load_json(BASELINE_MODEL_PATH)
 
-    # unflatten weight, convert it into 7x15 matrix.
+    self.weight = model_data['weight']
+    self.bias = model_data['bias']
+
+    # unflatten weight, convert it into 7x15 matrix (a view, no copy).
     self.weight = self.weight.reshape(self.nGameOutput + self.nRecurrentState,
       self.nGameInput + self.nGameOutput + self.nRecurrentState)
+
+    # recurrent state of each env when used via predict_batch
+    self.batchState = None
+    self.batchInput = None
+    self.precision = 'float64' # of predict_batch, see precision.py
+    self.batchWeight = None
   def reset(self):
     self.inputState = np.zeros(self.nInput)
     self.outputState = np.zeros(self.nOutput)
@@ -57,3 +64,41 @@ class BaselinePolicy:
     self._setInputState(obs)
     self._forward()
     return self._getAction()
+  def predict_batch(self, obs, state=None):
+    """
+    batched predict for N envs at once.
+    obs: (N, 12) observations, state: (N, 7) recurrent output states (defaults to self.batchState)
+    returns (N, 3) actions and the (N, 7) new state, which is also kept in self.batchState
+    """
+    obs = np.asarray(obs)
+    n = obs.shape[0]
+    if state is None:
+      if self.batchState is None or len(self.batchState) != n:
+        self.batchState = np.zeros((n, self.nOutput))
+      state = self.batchState
+    dtype = compute_dtype(self.precision)
+    if self.batchWeight is None:
+      self.batchWeight = (cast_weight(self.weight.T, self.precision), self.bias.astype(dtype))
+    weight, bias = self.batchWeight
+    if self.batchInput is None or self.batchInput.shape != (n, self.nInput) or self.batchInput.dtype != dtype:
+      self.batchInput = np.zeros((n, self.nInput), dtype=dtype)
+    self.batchInput[:, 0:self.nGameInput] = obs[:, 0:self.nGameInput]
+    self.batchInput[:, self.nGameInput:] = state
+    newState = precision_matmul(self.batchInput, weight, np.empty((n, self.nOutput), dtype=dtype))
+    newState += bias
+    np.tanh(newState, out=newState)
+    self.batchState = newState
+    action = (newState[:, 0:self.nGameOutput] > ACTION_THRESHOLD).astype(np.int8)
+    return action, newState
+  def set_precision(self, precision):
+    """ 'float64' (default), 'float32' or 'int8' weights for predict_batch """
+    assert precision in PRECISIONS, "unknown precision: "+str(precision)
+    self.precision = precision
+    self.batchWeight = None
+  def reset_rows(self, mask, state=None):
+    """ zero the recurrent state of the envs in mask (e.g. the ones that just finished) """
+    if state is None:
+      state = self.batchState
+    if state is not None:
+      state[mask] = 0
+    return state
@@ -0,0 +1,184 @@
+"""
+Local policy inference server with dynamic batching.
+
+The server owns the models. Rollout workers connect over a local socket
+(multiprocessing.connection, a unix socket path or a (host, port) pair) and
+send single observations. Requests for the same model are coalesced into a
+batch until either max_batch requests (or one from every connected client) are
+waiting or the oldest one has waited max_latency seconds, then answered with one batched forward pass
+(predict_batch where the policy has one, per-row predict otherwise).
+
+Recurrent policies (BaselinePolicy) keep one recurrent state per client
+connection on the server, so every worker sees its own episode history.
+
+usage:
+
+  server = PolicyServer({'baseline': BaselinePolicy(), 'ga': Model.makeSlimePolicyLite(path)}, "/tmp/slime.sock")
+  server.start()
+  ...
+  policy = RemotePolicy("/tmp/slime.sock", 'ga') # in a worker, drop-in for policy.predict(obs)
+"""
+
+import time
+import queue
+import threading
+import numpy as np
+from multiprocessing.connection import Listener, Client
+from policy import BaselinePolicy
+
+AUTHKEY = b'slimevolley'
+
+class _ModelWorker:
+  """ batches requests for one model on its own thread """
+  def __init__(self, name, policy, max_batch, max_latency):
+    self.name = name
+    self.policy = policy
+    self.max_batch = max_batch
+    self.max_latency = max_latency
+    self.requests = queue.Queue()
+    self.states = {} # client id -> recurrent state, for BaselinePolicy
+    self.clients = set() # connected clients that use this model
+    self.batches = 0
+    self.served = 0
+    self.thread = threading.Thread(target=self._loop, daemon=True)
+
+  def _gather(self):
+    first = self.requests.get()
+    if first is None:
+      return None
+    batch = [first]
+    deadline = first[3] + self.max_latency
+    # clients block on their reply, so once every client is in the batch no more requests can arrive
+    while len(batch) < min(self.max_batch, len(self.clients)):
+      timeout = deadline - time.perf_counter()
+      try:
+        request = self.requests.get(timeout=timeout) if timeout > 0 else self.requests.get_nowait()
+      except queue.Empty:
+        break
+      if request is None:
+        self.requests.put(None) # stop after answering this batch
+        break
+      batch.append(request)
+    return batch
+
+  def _forward(self, client_ids, obs):
+    policy = self.policy
+    if isinstance(policy, BaselinePolicy):
+      state = np.array([self.states.get(c, np.zeros(policy.nOutput)) for c in client_ids])
+      action, state = policy.predict_batch(obs, state)
+      for c, s in zip(client_ids, state):
+        self.states[c] = s
+      return action
+    if hasattr(policy, 'predict_batch'):
+      return np.array(policy.predict_batch(obs))
+    return np.array([policy.predict(o) for o in obs])
+
+  def _forward_each(self, batch, error):
+    """ the batch failed: retry every request on its own, so a malformed one only fails its own client """
+    if len(batch) == 1:
+      return [error] # RemotePolicy.predict raises it
+    replies = []
+    for request in batch:
+      try:
+        replies.append(self._forward([request[1]], np.array([request[2]]))[0])
+      except Exception as e:
+        replies.append(e)
+    return replies
+
+  def _loop(self):
+    while True:
+      batch = self._gather()
+      if batch is None:
+        return
+      client_ids = [request[1] for request in batch]
+      try:
+        action = self._forward(client_ids, np.array([request[2] for request in batch]))
+      except Exception as e:
+        action = self._forward_each(batch, e)
+      for request, a in zip(batch, action):
+        conn, lock = request[0]
+        try:
+          with lock:
+            conn.send(a)
+        except OSError: # the client is gone, the others still get their replies
+          pass
+      self.batches += 1
+      self.served += len(batch)
+
+class PolicyServer:
+  def __init__(self, models, address, authkey=AUTHKEY, max_batch=256, max_latency=0.002):
+    self.address = address
+    self.authkey = authkey
+    self.workers = {name: _ModelWorker(name, policy, max_batch, max_latency) for name, policy in models.items()}
+    self.listener = None
+    self.running = False
+
+  def start(self):
+    self.listener = Listener(self.address, authkey=self.authkey)
+    self.address = self.listener.address
+    self.running = True
+    for worker in self.workers.values():
+      worker.thread.start()
+    threading.Thread(target=self._accept_loop, daemon=True).start()
+    return self
+
+  def _accept_loop(self):
+    next_id = 0
+    while self.running:
+      try:
+        conn = self.listener.accept()
+      except OSError: # listener closed
+        return
+      threading.Thread(target=self._client_loop, args=(conn, next_id), daemon=True).start()
+      next_id += 1
+
+  def _client_loop(self, conn, client_id):
+    lock = threading.Lock()
+    while True:
+      try:
+        message = conn.recv()
+      except (EOFError, OSError):
+        break
+      kind, name = message[0], message[1]
+      worker = self.workers.get(name)
+      if worker is None:
+        with lock:
+          conn.send(KeyError("unknown model: "+str(name)))
+        continue
+      if kind == 'predict':
+        worker.clients.add(client_id)
+        worker.requests.put(((conn, lock), client_id, message[2], time.perf_counter()))
+      elif kind == 'reset':
+        # the client waits for every reply, so no forward pass of this client is in flight
+        worker.states.pop(client_id, None)
+    for worker in self.workers.values():
+      worker.clients.discard(client_id)
+      worker.states.pop(client_id, None)
+    conn.close()
+
+  def stats(self):
+    """ model name -> (batches run, requests served) """
+    return {name: (w.batches, w.served) for name, w in self.workers.items()}
+
+  def stop(self):
+    self.running = False
+    for worker in self.workers.values():
+      worker.requests.put(None)
+    if self.listener is not None:
+      self.listener.close()
+
+class RemotePolicy:
+  """ drop-in policy (predict / reset) whose forward pass runs on a PolicyServer """
+  def __init__(self, address, name, authkey=AUTHKEY):
+    self.name = name
+    self.conn = Client(address, authkey=authkey)
+  def predict(self, obs):
+    self.conn.send(('predict', self.name, np.asarray(obs)))
+    action = self.conn.recv()
+    if isinstance(action, Exception):
+      raise action
+    return action
+  def reset(self):
+    self.conn.send(('reset', self.name))
+  def close(self):
+    self.conn.close()
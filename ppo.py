@@ -0,0 +1,241 @@
+"""
+PPO (clipped objective, GAE, minibatch epochs) in numpy, for the small MLP policies of this repo.
+vtrace() gives the off-policy targets for learning from trajectories of a lagging policy
+(see training/train_actor_learner.py).
+
+ActorCritic is the stable-baselines MlpPolicy layout: an actor and a separate critic,
+each a 64x64 tanh MLP. the actor outputs one logit per button (MultiBinary(3), a
+Bernoulli per button), the critic one value. all parameters live in one flat
+float64 vector (per-layer w and b are views into it), so Adam and checkpoints work
+on a single array, and the actor's part is laid out exactly as mlp.Model's
+set_model_params expects for mlp.games['ppo']: actor_params() can be saved with
+model_format and played by Model.makePPOPolicy (deterministically: logits > 0).
+
+gradients are computed by hand (forward caches the activations, backward is a few
+matrix products per layer), for minibatches of a rollout collected from many envs.
+
+usage:
+
+  ac = ActorCritic(np_random=np.random.default_rng(0))
+  ppo = PPO(ac)
+  action, logp, value = ac.act(obs, np_random)          # (N, 3), (N,), (N,)
+  ...
+  advantage, returns = gae(reward, value, done, last_value)
+  stats = ppo.update(obs, action, logp, advantage, returns, np_random)
+"""
+
+import numpy as np
+
+def _softplus(x):
+  return np.logaddexp(0.0, x)
+
+def _sigmoid(x):
+  return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+class _MLP:
+  """ tanh hidden layers, linear output, parameters are views of a flat vector """
+  def __init__(self, sizes):
+    self.shapes = list(zip(sizes[:-1], sizes[1:]))
+    self.param_count = sum(i * o + o for i, o in self.shapes)
+
+  def bind(self, flat):
+    """ per-layer (w, b) views into flat, in mlp.Model's order (w row-major, then b) """
+    layers, pointer = [], 0
+    for i, o in self.shapes:
+      w = flat[pointer:pointer+i*o].reshape(i, o)
+      b = flat[pointer+i*o:pointer+i*o+o]
+      layers.append((w, b))
+      pointer += i * o + o
+    return layers
+
+  def init(self, flat, np_random, output_scale):
+    """ orthogonal init (as stable-baselines): sqrt(2) gain for hidden layers, output_scale for the last """
+    for k, (w, b) in enumerate(self.bind(flat)):
+      a = np_random.standard_normal(w.shape)
+      u, _, v = np.linalg.svd(a, full_matrices=False)
+      q = u if u.shape == w.shape else v
+      w[:] = q * (output_scale if k == len(self.shapes) - 1 else np.sqrt(2))
+      b[:] = 0
+
+  def forward(self, layers, x):
+    """ returns the output and the inputs of every layer (for backward) """
+    hs = [x]
+    for k, (w, b) in enumerate(layers):
+      x = x @ w + b
+      if k < len(layers) - 1:
+        x = np.tanh(x)
+      hs.append(x)
+    return x, hs
+
+  def backward(self, layers, grads, hs, dout):
+    """ accumulates into grads (same layout as layers) the gradient of dout . output """
+    for k in reversed(range(len(layers))):
+      w, _ = layers[k]
+      dw, db = grads[k]
+      dw += hs[k].T @ dout
+      db += dout.sum(axis=0)
+      if k > 0:
+        dout = (dout @ w.T) * (1.0 - hs[k] * hs[k])
+
+class ActorCritic:
+  def __init__(self, input_size=12, output_size=3, layers=(64, 64), np_random=None):
+    np_random = np.random.default_rng() if np_random is None else np_random
+    self.actor = _MLP([input_size] + list(layers) + [output_size])
+    self.critic = _MLP([input_size] + list(layers) + [1])
+    self.layers = list(layers)
+    self.param_count = self.actor.param_count + self.critic.param_count
+    self.params = np.zeros(self.param_count)
+    self.actor.init(self.params[:self.actor.param_count], np_random, 0.01)
+    self.critic.init(self.params[self.actor.param_count:], np_random, 1.0)
+    self._bind()
+
+  def _bind(self):
+    self.actor_layers = self.actor.bind(self.params[:self.actor.param_count])
+    self.critic_layers = self.critic.bind(self.params[self.actor.param_count:])
+
+  def set_params(self, params):
+    self.params[:] = params
+
+  def actor_params(self):
+    """ flat actor parameters, in mlp.Model(mlp.games['ppo']) order """
+    return self.params[:self.actor.param_count].copy()
+
+  def logits(self, obs):
+    return self.actor.forward(self.actor_layers, obs)[0]
+
+  def value(self, obs):
+    return self.critic.forward(self.critic_layers, obs)[0][:, 0]
+
+  def act(self, obs, np_random, deterministic=False):
+    """ (N, 3) actions in {0, 1}, their (N,) log-probabilities and (N,) values """
+    logits = self.logits(obs)
+    if deterministic:
+      action = (logits > 0).astype(np.float64)
+    else:
+      action = (np_random.random(logits.shape) < _sigmoid(logits)).astype(np.float64)
+    logp = np.sum(action * logits - _softplus(logits), axis=1)
+    return action, logp, self.value(obs)
+
+def gae(reward, value, done, last_value, gamma=0.99, lam=0.95):
+  """
+  generalized advantage estimation over (T, N) arrays, done[t] marks that the episode
+  ended at step t (the next observation belongs to a new episode).
+  returns (advantage, returns), both (T, N).
+  """
+  advantage = np.zeros_like(reward)
+  running = np.zeros(reward.shape[1])
+  next_value = last_value
+  for t in reversed(range(len(reward))):
+    nonterminal = 1.0 - done[t]
+    delta = reward[t] + gamma * next_value * nonterminal - value[t]
+    running = delta + gamma * lam * nonterminal * running
+    advantage[t] = running
+    next_value = value[t]
+  return advantage, advantage + value
+
+def vtrace(behaviour_logp, target_logp, reward, value, done, bootstrap_value, gamma=0.99, rho_bar=1.0, c_bar=1.0):
+  """
+  V-trace targets (Espeholt et al. 2018) for (T, N) trajectories collected by a behaviour policy
+  that may lag behind the target policy. value and bootstrap_value are the learner's V(x_t) and V(x_T),
+  done[t] cuts the traces at episode ends. returns (vs, policy gradient advantage), both (T, N).
+  """
+  ratio = np.exp(target_logp - behaviour_logp)
+  rho = np.minimum(rho_bar, ratio)
+  c = np.minimum(c_bar, ratio)
+  discount = gamma * (1.0 - done)
+  next_value = np.concatenate([value[1:], bootstrap_value[None]])
+  delta = rho * (reward + discount * next_value - value)
+  vs_minus_value = np.zeros_like(value)
+  running = np.zeros(value.shape[1])
+  for t in reversed(range(len(value))):
+    running = delta[t] + discount[t] * c[t] * running
+    vs_minus_value[t] = running
+  vs = value + vs_minus_value
+  next_vs = np.concatenate([vs[1:], bootstrap_value[None]])
+  return vs, rho * (reward + discount * next_vs - value)
+
+class PPO:
+  def __init__(self, ac, learning_rate=3e-4, clip_param=0.2, ent_coef=0.0, vf_coef=0.5, epochs=10,
+               minibatch_size=1024, max_grad_norm=0.5, beta1=0.9, beta2=0.999):
+    self.ac = ac
+    self.learning_rate = learning_rate
+    self.clip_param = clip_param
+    self.ent_coef = ent_coef
+    self.vf_coef = vf_coef
+    self.epochs = epochs
+    self.minibatch_size = minibatch_size
+    self.max_grad_norm = max_grad_norm
+    self.beta1 = beta1
+    self.beta2 = beta2
+    self.m = np.zeros(ac.param_count)
+    self.v = np.zeros(ac.param_count)
+    self.steps = 0 # Adam steps
+
+  def gradient(self, obs, action, old_logp, advantage, returns):
+    """ (flat gradient of the loss, stats) on one minibatch """
+    ac, n = self.ac, len(obs)
+    grad = np.zeros(ac.param_count)
+    actor_grads = ac.actor.bind(grad[:ac.actor.param_count])
+    critic_grads = ac.critic.bind(grad[ac.actor.param_count:])
+
+    logits, hs = ac.actor.forward(ac.actor_layers, obs)
+    p = _sigmoid(logits)
+    logp = np.sum(action * logits - _softplus(logits), axis=1)
+    ratio = np.exp(logp - old_logp)
+    clipped = np.clip(ratio, 1.0 - self.clip_param, 1.0 + self.clip_param)
+    surrogate = np.minimum(ratio * advantage, clipped * advantage)
+    # the min picks the unclipped term (and passes its gradient) unless the ratio left the trust region
+    active = np.where(advantage >= 0, ratio <= 1.0 + self.clip_param, ratio >= 1.0 - self.clip_param)
+    dlogp = -(advantage * ratio * active) / n
+    entropy = np.sum(_softplus(logits) - logits * p, axis=1)
+    dlogits = dlogp[:, None] * (action - p) + (self.ent_coef / n) * logits * p * (1.0 - p)
+    ac.actor.backward(ac.actor_layers, actor_grads, hs, dlogits)
+
+    value, hs = ac.critic.forward(ac.critic_layers, obs)
+    value = value[:, 0]
+    ac.critic.backward(ac.critic_layers, critic_grads, hs, (2.0 * self.vf_coef / n * (value - returns))[:, None])
+
+    stats = {
+      'policy_loss': -surrogate.mean(),
+      'value_loss': np.mean((value - returns) ** 2),
+      'entropy': entropy.mean(),
+      'approx_kl': np.mean(old_logp - logp),
+      'clip_fraction': np.mean(np.abs(ratio - 1.0) > self.clip_param),
+    }
+    return grad, stats
+
+  def step(self, grad, learning_rate):
+    norm = np.linalg.norm(grad)
+    if self.max_grad_norm is not None and norm > self.max_grad_norm:
+      grad = grad * (self.max_grad_norm / norm)
+    self.steps += 1
+    self.m = self.beta1 * self.m + (1 - self.beta1) * grad
+    self.v = self.beta2 * self.v + (1 - self.beta2) * grad * grad
+    step = learning_rate * np.sqrt(1 - self.beta2 ** self.steps) / (1 - self.beta1 ** self.steps)
+    self.ac.params -= step * self.m / (np.sqrt(self.v) + 1e-8)
+
+  def update(self, obs, action, logp, advantage, returns, np_random, learning_rate=None):
+    """ epochs of minibatch steps over one flattened rollout, returns the mean stats """
+    learning_rate = self.learning_rate if learning_rate is None else learning_rate
+    n = len(obs)
+    history = []
+    for _ in range(self.epochs):
+      order = np_random.permutation(n)
+      for start in range(0, n, self.minibatch_size):
+        i = order[start:start+self.minibatch_size]
+        adv = advantage[i]
+        adv = (adv - adv.mean()) / (adv.std() + 1e-8)
+        grad, stats = self.gradient(obs[i], action[i], logp[i], adv, returns[i])
+        self.step(grad, learning_rate)
+        history.append(stats)
+    return {k: float(np.mean([s[k] for s in history])) for k in history[0]}
+
+  def get_state(self):
+    """ (arrays, meta) for checkpoint.save """
+    return {'params': self.ac.params, 'm': self.m, 'v': self.v}, {'adam_steps': self.steps}
+
+  def set_state(self, arrays, meta):
+    self.ac.set_params(arrays['params'])
+    self.m = np.array(arrays['m'])
+    self.v = np.array(arrays['v'])
+    self.steps = meta['adam_steps']
@@ -0,0 +1,81 @@
+"""
+Reduced-precision inference for the small zoo policies.
+
+float64 is the reference. float32 halves the bytes moved per forward pass.
+int8 rounds every weight matrix to int8 with one float32 scale per layer
+(symmetric, scale = max|w| / 127) and dequantizes it once to float32: numpy has
+no int8 GEMM, so int8 runs at float32 speed and only tells how the actions
+change with 8-bit weights (and a 4x smaller stored model), it saves no
+bandwidth or time at inference.
+
+Since actions are thresholded (ACTION_THRESHOLD in BaselinePolicy, > 0 in
+Agent.setAction) a lower precision only matters when it flips a button.
+action_agreement measures exactly that over recorded trajectories, see
+scripts/eval/eval_precision.py.
+"""
+
+import numpy as np
+
+PRECISIONS = ('float64', 'float32', 'int8')
+
+def compute_dtype(precision):
+  """ dtype activations are computed in """
+  assert precision in PRECISIONS, "unknown precision: "+str(precision)
+  return np.dtype(np.float64) if precision == 'float64' else np.dtype(np.float32)
+
+def quantize_int8(w):
+  """ symmetric per-layer quantization: returns int8 weights and their float32 scale """
+  w = np.asarray(w, dtype=np.float64)
+  scale = np.abs(w).max() / 127.0
+  if scale == 0:
+    scale = 1.0
+  q = np.clip(np.round(w / scale), -127, 127).astype(np.int8)
+  return q, np.float32(scale)
+
+def dequantize_int8(q, scale):
+  return q.astype(np.float32) * scale
+
+def cast_weight(w, precision):
+  """ weight to compute with at precision, made once per model (int8: quantized, then dequantized to float32) """
+  if precision == 'int8':
+    return np.ascontiguousarray(dequantize_int8(*quantize_int8(w)))
+  return np.ascontiguousarray(w, dtype=compute_dtype(precision))
+
+def matmul(h, w, out):
+  """ out = h @ w """
+  return np.matmul(h, w, out=out)
+
+def to_buttons(action):
+  """ which of the 3 buttons Agent.setAction presses """
+  return np.asarray(action) > 0
+
+def split_episodes(obs, dones):
+  """
+  (T, ...) obs with episode ends in dones -> (T_max, E, ...) obs padded with zeros, and a (T_max, E) valid mask,
+  so recurrent policies can run all episodes side by side.
+  """
+  ends = np.nonzero(dones)[0] + 1
+  if len(ends) == 0 or ends[-1] != len(obs):
+    ends = np.append(ends, len(obs))
+  starts = np.concatenate([[0], ends[:-1]])
+  lengths = ends - starts
+  batch = np.zeros((lengths.max(), len(lengths)) + obs.shape[1:], dtype=obs.dtype)
+  valid = np.zeros((lengths.max(), len(lengths)), dtype=bool)
+  for e, (start, length) in enumerate(zip(starts, lengths)):
+    batch[:length, e] = obs[start:start+length]
+    valid[:length, e] = True
+  return batch, valid
+
+def action_agreement(reference, candidate, obs, dones):
+  """
+  runs both policies (same weights, different precision) through the recorded observations.
+  reference / candidate take (E, obs) and return (E, 3) actions; recurrent ones must
+  keep their own state across calls (e.g. lambda o: policy.predict_batch(o)[0]).
+  returns (fraction of steps where all 3 buttons agree, per-button agreement).
+  """
+  batch, valid = split_episodes(np.asarray(obs), np.asarray(dones))
+  same = np.zeros(batch.shape[:2] + (3,), dtype=bool)
+  for t in range(len(batch)):
+    same[t] = to_buttons(reference(batch[t])) == to_buttons(candidate(batch[t]))
+  same = same[valid]
+  return float(same.all(axis=1).mean()), same.mean(axis=0)
@@ -0,0 +1,34 @@
+"""
+Convert json zoo models (estool / GA checkpoints) and stable-baselines PPO zips (actor only)
+into the compact binary model format.
+
+run: python scripts/convert_models.py assets/models/cmaes/slimevolley.cma.64.96.best.json assets/models/ga_sp/ga.json assets/models/ppo/best_model.zip
+
+writes <name>.bin next to each input, see model_format.py for the layout.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import zipfile
+import argparse
+import numpy as np
+import model_format
+
+if __name__=="__main__":
+
+  parser = argparse.ArgumentParser(description='Convert json zoo models to the binary model format.')
+  parser.add_argument('models', nargs='+', help='json model files or stable-baselines zips')
+  parser.add_argument('--float64', action='store_true', help='store float64 instead of float32', default=False)
+
+  args = parser.parse_args()
+
+  dtype = np.float64 if args.float64 else np.float32
+
+  for filename in args.models:
+    if zipfile.is_zipfile(filename):
+      out_filename = model_format.convert_stable_baselines(filename, dtype=dtype)
+    else:
+      out_filename = model_format.convert_json(filename, dtype=dtype)
+    print(filename, os.path.getsize(filename), "bytes ->", out_filename, os.path.getsize(out_filename), "bytes")
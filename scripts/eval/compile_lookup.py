@@ -0,0 +1,74 @@
+"""
+Compile a small zoo MLP (cma, ga, or a model file) into a lookup table policy.
+
+run: python scripts/eval/compile_lookup.py --model ga --episodes 50 --out ga_lookup.npz
+
+observations are recorded by playing the policy against the baseline (or taken
+from a dataset written by dataset.DatasetWriter). the last --holdout fraction of
+episodes is kept aside to report the compiled policy's agreement with the
+original, with a 95% lower confidence bound. see lookup_policy.py.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import time
+import tempfile
+import argparse
+import numpy as np
+from dataset import DatasetReader
+from lookup_policy import compile_policy, agreement
+from eval_agents import makePolicy
+from eval_precision import record
+
+np.set_printoptions(threshold=20, precision=4, suppress=True, linewidth=200)
+
+if __name__=="__main__":
+
+  parser = argparse.ArgumentParser(description='Compile a feedforward policy into a lookup table.')
+  parser.add_argument('--model', help='choice of (cma, ga)', type=str, default="ga")
+  parser.add_argument('--path', help='path to model (leave blank for zoo)', type=str, default="")
+  parser.add_argument('--dataset', help='recorded dataset directory (leave blank to record new episodes)', type=str, default="")
+  parser.add_argument('--episodes', help='episodes to record if no dataset is given', type=int, default=50)
+  parser.add_argument('--holdout', help='fraction of episodes held out for the agreement report', type=float, default=0.2)
+  parser.add_argument('--max-cells', help='largest table size', type=int, default=2**20)
+  parser.add_argument('--seed', help='random seed (integer)', type=int, default=721)
+  parser.add_argument('--out', help='where to save the compiled policy', type=str, default="lookup_policy.npz")
+
+  args = parser.parse_args()
+  assert args.model != "baseline", "the baseline policy is recurrent, only feedforward policies can be compiled"
+
+  data_dir = args.dataset
+  if len(data_dir) == 0:
+    data_dir = tempfile.mkdtemp(prefix="slimevolley_lookup_")
+    record(args.model, args.path, args.episodes, args.seed, data_dir)
+
+  reader = DatasetReader(data_dir)
+  data = reader.get(np.arange(len(reader)), fields=['obs', 'otherObs', 'terminated', 'truncated'])
+  episode = np.concatenate([[0], np.cumsum(data['terminated'] | data['truncated'])[:-1]])
+  split = int(np.ceil(episode.max() * (1 - args.holdout)))
+  # the recorded policy played right, and the baseline's view (otherObs) is reachable too
+  train = np.concatenate([data['obs'][episode < split], data['otherObs'][episode < split]])
+  held_out = data['obs'][episode >= split]
+
+  model = makePolicy(args.model, args.path)
+  predict_batch = lambda obs: model.predict_batch(obs)
+
+  lookup, scores = compile_policy(predict_batch, train, max_cells=args.max_cells)
+  print("sensitivity per obs dimension:", scores)
+  print("kept dimensions:", lookup.dims, "grid:", lookup.shape, "cells:", len(lookup.table))
+
+  rate, lower = agreement(lookup, predict_batch, held_out)
+  print("held-out agreement over", len(held_out), "steps:", np.round(rate, 4), "(95% lower bound", np.round(lower, 4), ")")
+
+  obs = held_out[np.random.default_rng(0).integers(len(held_out), size=4096)]
+  for name, fn in [("mlp", predict_batch), ("lookup", lookup.predict_batch)]:
+    start = time.perf_counter()
+    for _ in range(50):
+      fn(obs)
+    print(name, "throughput:", int(4096 * 50 / (time.perf_counter() - start)), "obs/s")
+
+  lookup.save(args.out)
+  print("saved", args.out)
@@ -11,7 +11,8 @@ Model Choices
 BaselinePolicy: Default built-in opponent policy (trained in earlier 2015 project)
 
 baseline: Baseline Policy (built-in AI). Simple 120-param RNN.
-ppo: PPO trained using 96-cores for a long time vs baseline AI (train_ppo_mpi.py)
+ppo: PPO trained using 96-cores for a long time vs baseline AI (train_ppo_mpi.py), actor run in numpy
+ppo_tf: same PPO agent run through stable-baselines / tensorflow (slow, for cross-checking the export)
 cma: CMA-ES with small network trained vs baseline AI using estool
 ga: Genetic algorithm with tiny network trained using simple tournament selection and self play (input x(train_ga_selfplay.py)
 random: random action agent
@@ -26,13 +27,19 @@ import warnings
 warnings.filterwarnings("ignore", category=FutureWarning, module='tensorflow')
 warnings.filterwarnings("ignore", category=UserWarning, module='gym')
 
-import gym
+import gymnasium as gym
 import os
+import json
 import numpy as np
 import argparse
+import multiprocessing as mp
 import slimevolley
-from mlp import makeSlimePolicy, makeSlimePolicyLite # simple pretrained models
+from mlp import Model # simple pretrained models
 from policy import BaselinePolicy
+from policy_server import RemotePolicy
+from match_cache import MatchCache
+from sequential_eval import SequentialEvaluation
+from utils import multiagent_rollout
 from time import sleep
 
 #import cv2
@@ -57,9 +64,38 @@ class RandomPolicy:
 def makeBaselinePolicy(_):
   return BaselinePolicy()
 
+APPROVED_MODELS = ["baseline", "ppo", "ppo_tf", "ga", "cma", "random"]
+
+ZOO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'assets', 'models'))
+
+PATH = {
+  "baseline": None,
+  "ppo": os.path.join(ZOO, "ppo", "best_model.zip"),
+  "ppo_tf": os.path.join(ZOO, "ppo", "best_model.zip"),
+  "cma": os.path.join(ZOO, "cmaes", "slimevolley.cma.64.96.best.json"),
+  "ga": os.path.join(ZOO, "ga_sp", "ga.json"),
+  "random": None,
+}
+
+MODEL = {
+  "baseline": makeBaselinePolicy,
+  "ppo": Model.makePPOPolicy,
+  "ppo_tf": PPOPolicy,
+  "cma": Model.makeSlimePolicy,
+  "ga": Model.makeSlimePolicyLite,
+  "random": RandomPolicy,
+}
+
+def makePolicy(choice, path=None):
+  """ builds one of APPROVED_MODELS, from the zoo unless path is given """
+  global PPO1
+  if choice == "ppo_tf" and PPO1 is None:
+    from stable_baselines import PPO1
+  return MODEL[choice](path if path else PATH[choice])
+
 def rollout(env, policy0, policy1, render_mode=False):
   """ play one agent vs the other in modified gym-style loop. """
-  obs0 = env.reset()
+  obs0, _ = env.reset()
   obs1 = obs0 # same observation at the very beginning for the other agent
 
   done = False
@@ -73,7 +109,8 @@ def rollout(env, policy0, policy1, render_mode=False):
 
     # uses a 2nd (optional) parameter for step to put in the other action
     # and returns the other observation in the 4th optional "info" param in gym's step()
-    obs0, reward, done, info = env.step(action0, action1)
+    obs0, reward, terminated, truncated, info = env.step(action0, action1)
+    done = terminated or truncated
     obs1 = info['otherObs']
 
     total_reward += reward
@@ -90,18 +127,102 @@ def rollout(env, policy0, policy1, render_mode=False):
 
   return total_reward
 
-def evaluate_multiagent(env, policy0, policy1, render_mode=False, n_trials=1000, init_seed=721):
+def reset_policy(policy, seed):
+  """ start a trial from a clean state: recurrent state cleared, random policies reseeded """
+  if hasattr(policy, 'reset'):
+    policy.reset()
+  if isinstance(policy, RandomPolicy):
+    policy.action_space.seed(seed)
+
+def play_trial(env, policy0, policy1, seed, render_mode=False, cache=None):
+  """ one match from seed, independent of the trials played before it. returns (score of policy0, length) """
+  env.seed(seed=seed)
+  reset_policy(policy0, int(np.random.SeedSequence([seed, 0]).generate_state(1)[0]))
+  reset_policy(policy1, int(np.random.SeedSequence([seed, 1]).generate_state(1)[0]))
+  if render_mode:
+    return rollout(env, policy0, policy1, render_mode=True), None
+  return multiagent_rollout(env, policy0, policy1, cache=cache)
+
+def write_trial(output, trial, seed, score, length):
+  output.write(json.dumps({'trial': trial, 'seed': seed, 'score': float(score), 'length': length})+"\n")
+
+def evaluate_multiagent(env, policy0, policy1, render_mode=False, n_trials=1000, init_seed=721, cache=None, output=None, stop=None):
+  """
+  plays the trials one by one in this process. trial i is seeded with init_seed+i.
+  output: optional open file, receives one json line per trial (printed to stdout otherwise).
+  cache: optional match_cache.MatchCache, trials played before (same models, seed and engine) are looked up
+  stop: optional sequential_eval.SequentialEvaluation, fed every score, no more trials once it is done
+  """
   history = []
   for i in range(n_trials):
-    env.seed(seed=init_seed+i)
-    cumulative_score = rollout(env, policy0, policy1, render_mode=render_mode)
-    print("cumulative score #", i, ":", cumulative_score)
+    cumulative_score, length = play_trial(env, policy0, policy1, init_seed+i, render_mode=render_mode, cache=cache)
+    if output is not None:
+      write_trial(output, i, init_seed+i, cumulative_score, length)
+    else:
+      print("cumulative score #", i, ":", cumulative_score)
     history.append(cumulative_score)
+    if stop is not None and stop.update(cumulative_score) is not None:
+      break
   return history
 
-if __name__=="__main__":
+# worker process state
+_worker = {}
+
+def init_worker(choice0, path0, choice1, path1, cache_path):
+  _worker['env'] = slimevolley.SlimeVolleyEnv()
+  _worker['policies'] = (makePolicy(choice0, path0), makePolicy(choice1, path1))
+  _worker['cache'] = MatchCache(cache_path) if cache_path else None
+  if _worker['cache'] is not None: # closed when the worker exits (pool.close), not on terminate
+    mp.util.Finalize(None, _worker['cache'].close, exitpriority=10)
+
+def play_worker_trial(job):
+  trial, seed = job
+  policy0, policy1 = _worker['policies']
+  score, length = play_trial(_worker['env'], policy0, policy1, seed, cache=_worker['cache'])
+  return trial, seed, score, length
+
+def evaluate_parallel(choice0, path0, choice1, path1, output, n_trials=1000, init_seed=721, workers=None, cache_path=None, stop=None):
+  """
+  evaluate_multiagent over a process pool. every worker builds its own env and policies, trial i is
+  seeded with init_seed+i and starts from reset policies, and results are written to output (an open
+  file, one json line per trial) in trial order, so the file is the same for any number of workers.
+  with stop (a sequential_eval.SequentialEvaluation) the results are fed to it in trial order and the
+  pool is stopped once it is done, so the trials used don't depend on the number of workers either.
+  returns the scores (policy0's perspective).
+  """
+  workers = mp.cpu_count() if workers is None else workers
+  trials = [(i, init_seed+i) for i in range(n_trials)]
+  history = []
+  complete = False
+  if workers <= 1:
+    init_worker(choice0, path0, choice1, path1, cache_path)
+    results = map(play_worker_trial, trials)
+    pool = None
+  else:
+    pool = mp.Pool(workers, initializer=init_worker, initargs=(choice0, path0, choice1, path1, cache_path))
+    results = pool.imap(play_worker_trial, trials, chunksize=max(1, n_trials // (workers * 16)))
+  try:
+    for trial, seed, score, length in results:
+      write_trial(output, trial, seed, score, length)
+      output.flush()
+      history.append(score)
+      if stop is not None and stop.update(score) is not None:
+        break
+    else:
+      complete = True
+  finally:
+    if pool is None:
+      if _worker['cache'] is not None:
+        _worker['cache'].close()
+    elif complete:
+      pool.close() # workers exit normally and close their caches
+      pool.join()
+    else:
+      pool.terminate() # stopped early (or failed), the trials still running are not needed
+      pool.join()
+  return history
 
-  APPROVED_MODELS = ["baseline", "ppo", "ga", "cma", "random"]
+if __name__=="__main__":
 
   def checkchoice(choice):
     choice = choice.lower()
@@ -109,32 +230,22 @@ if __name__=="__main__":
       return False
     return True
 
-  PATH = {
-    "baseline": None,
-    "ppo": "zoo/ppo/best_model.zip",
-    "cma": "zoo/cmaes/slimevolley.cma.64.96.best.json",
-    "ga": "zoo/ga_sp/ga.json",
-    "random": None,
-  }
-
-  MODEL = {
-    "baseline": makeBaselinePolicy,
-    "ppo": PPOPolicy,
-    "cma": makeSlimePolicy,
-    "ga": makeSlimePolicyLite,
-    "random": RandomPolicy,
-  }
-
   parser = argparse.ArgumentParser(description='Evaluate pre-trained agents against each other.')
-  parser.add_argument('--left', help='choice of (baseline, ppo, cma, ga, random)', type=str, default="baseline")
+  parser.add_argument('--left', help='choice of (baseline, ppo, ppo_tf, cma, ga, random)', type=str, default="baseline")
   parser.add_argument('--leftpath', help='path to left model (leave blank for zoo)', type=str, default="")
-  parser.add_argument('--right', help='choice of (baseline, ppo, cma, ga, random)', type=str, default="ga")
+  parser.add_argument('--right', help='choice of (baseline, ppo, ppo_tf, cma, ga, random)', type=str, default="ga")
   parser.add_argument('--rightpath', help='path to right model (leave blank for zoo)', type=str, default="")
   parser.add_argument('--render', action='store_true', help='render to screen?', default=False)
   parser.add_argument('--day', action='store_true', help='daytime colors?', default=False)
   parser.add_argument('--pixel', action='store_true', help='pixel rendering effect? (note: not pixel obs mode)', default=False)
   parser.add_argument('--seed', help='random seed (integer)', type=int, default=721)
   parser.add_argument('--trials', help='number of trials (default 1000)', type=int, default=1000)
+  parser.add_argument('--server', help='address of a running policy server (see serve_policies.py)', type=str, default="")
+  parser.add_argument('--cache', help='sqlite file of cached match results (see match_cache.py)', type=str, default="")
+  parser.add_argument('--workers', help='worker processes playing the trials (default: one per core)', type=int, default=mp.cpu_count())
+  parser.add_argument('--threshold', help='stop as soon as the right agent\'s mean score is significantly above or below this', type=float, default=None)
+  parser.add_argument('--confidence', help='confidence level of the early stopping decision', type=float, default=0.95)
+  parser.add_argument('--output', help='json lines file of the trial results (default eval_<right>_vs_<left>.jsonl)', type=str, default="")
 
   args = parser.parse_args()
 
@@ -168,15 +279,32 @@ if __name__=="__main__":
     path1 = args.leftpath
     print("path of left model", path1)
 
-  if c0.startswith("ppo") or c1.startswith("ppo"):
-    from stable_baselines import PPO1
-
-  policy0 = MODEL[c0](path0) # the right agent
-  policy1 = MODEL[c1](path1) # the left agent
-
-  history = evaluate_multiagent(env, policy0, policy1,
-    render_mode=render_mode, n_trials=args.trials, init_seed=args.seed)
-
-  print("history dump:", history)
+  output = args.output if len(args.output) > 0 else "eval_"+c0+"_vs_"+c1+".jsonl"
+  stop = None
+  if args.threshold is not None:
+    stop = SequentialEvaluation(args.threshold, confidence=args.confidence, max_trials=args.trials)
+
+  if render_mode or len(args.server) > 0: # one process: on screen, or forward passes on the server (shared policy state)
+    if len(args.server) > 0:
+      policy0 = RemotePolicy(args.server, c0) # the right agent
+      policy1 = RemotePolicy(args.server, c1) # the left agent
+    else:
+      policy0 = makePolicy(c0, path0) # the right agent
+      policy1 = makePolicy(c1, path1) # the left agent
+    cache = MatchCache(args.cache) if len(args.cache) > 0 else None
+    with open(output, 'w') as out:
+      history = evaluate_multiagent(env, policy0, policy1,
+        render_mode=render_mode, n_trials=args.trials, init_seed=args.seed, cache=cache, output=out, stop=stop)
+    if cache is not None:
+      print("match cache:", cache.stats())
+      cache.close()
+  else:
+    with open(output, 'w') as out:
+      history = evaluate_parallel(c0, path0, c1, path1, out, n_trials=args.trials, init_seed=args.seed,
+        workers=args.workers, cache_path=args.cache if len(args.cache) > 0 else None, stop=stop)
+
+  print("trial results written to", output)
   print(c0+" scored", np.round(np.mean(history), 3), "±", np.round(np.std(history), 3), "vs",
-    c1, "over", args.trials, "trials.")
+    c1, "over", len(history), "trials.")
+  if stop is not None:
+    print(c0+" is", stop.summary())
@@ -0,0 +1,143 @@
+"""
+Round-robin league over the model zoo and a directory of our own models, with Elo ratings.
+
+every pair of models plays --trials matches (seeds --seed, --seed+1, ...) once. results are stored
+in the league file (league.py) under both models' content hashes, so running the league again after
+adding a checkpoint only plays the new model's pairings, and the rating table is refitted from all
+stored results.
+
+pairs are spread over a process pool, one pair per job. a pair of mlp models, or an mlp model
+against the baseline, plays all its matches at once on a SlimeVolleyVectorEnv (utils.population_rollout),
+other pairs (random) play one match at a time like eval_agents.py.
+
+models: the zoo entries of --zoo (see eval_agents.py) and every .bin, .json and .zip file under the
+directory (named by their path relative to it). files that don't load as a policy are skipped.
+
+run: python scripts/eval/eval_league.py training/ppo_numpy --trials 100
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import time
+import zipfile
+import argparse
+import multiprocessing as mp
+import numpy as np
+import slimevolley
+from mlp import Model
+from policy import BaselinePolicy
+from league import League
+from match_cache import policy_key
+from utils import population_rollout
+from eval_agents import makePolicy, play_trial
+
+# Settings
+ZOO_MODELS = "baseline,ppo,cma,ga,random" # ppo_tf is the same actor as ppo
+EXTENSIONS = (".bin", ".json", ".zip")
+
+def make_entry(choice, path):
+  """ policy of a league entry: a zoo choice, or choice 'file' for a model file """
+  if choice != 'file':
+    return makePolicy(choice)
+  if zipfile.is_zipfile(path):
+    return Model.makePPOPolicy(path)
+  return Model.from_file(path)
+
+def find_models(directory):
+  """ (name, path) of the model files under directory, name is the path relative to it """
+  models = []
+  for root, _, files in os.walk(directory):
+    for filename in sorted(files):
+      if filename.endswith(EXTENSIONS):
+        path = os.path.join(root, filename)
+        models.append((os.path.relpath(path, directory), path))
+  return sorted(models)
+
+def entry_hash(name, policy):
+  # policies policy_key can't hash (random) are named instead, play_trial reseeds them per match
+  key = policy_key(policy)
+  return key if key is not None else "builtin:"+name
+
+def play_pair(job):
+  """ trials matches of the right entry against the left one, returns the league.py result """
+  right, left, right_spec, left_spec, trials, seed = job
+  policy_right, policy_left = make_entry(*right_spec), make_entry(*left_spec)
+  if isinstance(policy_right, Model) and isinstance(policy_left, (Model, BaselinePolicy)):
+    venv = slimevolley.SlimeVolleyVectorEnv(trials)
+    policy_right.set_population(policy_right.get_model_params()[None])
+    opponent = policy_left if isinstance(policy_left, Model) else None # None: the env's batched baseline
+    scores, _ = population_rollout(venv, policy_right, opponent, seeds=seed + np.arange(trials))
+  else:
+    env = slimevolley.SlimeVolleyEnv()
+    scores = np.array([play_trial(env, policy_right, policy_left, seed + i)[0] for i in range(trials)])
+  return {'right': right, 'left': left, 'wins': int(np.sum(scores > 0)), 'draws': int(np.sum(scores == 0)),
+          'losses': int(np.sum(scores < 0)), 'score': float(np.sum(scores))}
+
+def print_table(league, names):
+  hashes = list(names)
+  ratings = league.ratings(hashes)
+  standings = league.standings(hashes)
+  print("%4s  %7s  %6s  %6s  %s" % ("rank", "elo", "score", "games", "model"))
+  for rank, h in enumerate(sorted(hashes, key=lambda h: -ratings[h])):
+    points, games = standings[h]
+    print("%4d  %7.1f  %5.1f%%  %6d  %s" % (rank + 1, ratings[h], 100.0 * points / max(games, 1), games, ", ".join(names[h])))
+
+if __name__=="__main__":
+
+  parser = argparse.ArgumentParser(description='Round-robin league with Elo ratings.')
+  parser.add_argument('directory', help='directory of model files (.bin, .json, .zip) to add to the league', nargs='?', default=None)
+  parser.add_argument('--zoo', help='comma separated zoo models to include (see eval_agents.py)', type=str, default=ZOO_MODELS)
+  parser.add_argument('--league', help='json file of the stored pair results', type=str, default="league.json")
+  parser.add_argument('--trials', help='matches per pair', type=int, default=100)
+  parser.add_argument('--seed', help='seed of the first match of every pair (integer)', type=int, default=721)
+  parser.add_argument('--workers', help='worker processes playing the pairs (default: one per core)', type=int, default=mp.cpu_count())
+
+  args = parser.parse_args()
+
+  entries = [(choice, (choice, None)) for choice in args.zoo.split(',') if len(choice) > 0]
+  if args.directory is not None:
+    entries += [(name, ('file', path)) for name, path in find_models(args.directory)]
+
+  names = {} # hash -> names of the entries with these weights
+  specs = {} # hash -> (choice, path) to build it
+  baselines = set()
+  for name, spec in entries:
+    try:
+      policy = make_entry(*spec)
+    except Exception as e:
+      print("skipping", name+":", e)
+      continue
+    h = entry_hash(name, policy)
+    names.setdefault(h, []).append(name)
+    specs.setdefault(h, spec)
+    if isinstance(policy, BaselinePolicy):
+      baselines.add(h)
+
+  league = League(args.league, trials=args.trials, seed=args.seed)
+  pending = league.pending(list(names))
+  print(len(entries), "models,", len(names), "distinct,", len(pending), "pairs to play")
+
+  jobs = []
+  for a, b in pending:
+    right, left = (b, a) if a in baselines else (a, b) # the batched baseline only plays on the left
+    jobs.append((right, left, specs[right], specs[left], args.trials, args.seed))
+
+  start_time = time.time()
+  pool = mp.Pool(args.workers) if args.workers > 1 and len(jobs) > 1 else None
+  results = map(play_pair, jobs) if pool is None else pool.imap_unordered(play_pair, jobs)
+  try:
+    for i, result in enumerate(results):
+      league.put(result['right'], result['left'], result)
+      league.save() # an interrupted run keeps the pairs played so far
+      print("pair", i + 1, "/", len(jobs), ":", ", ".join(names[result['right']]), "vs", ", ".join(names[result['left']]),
+        "won", result['wins'], "drew", result['draws'], "lost", result['losses'])
+  finally:
+    if pool is not None:
+      pool.terminate()
+      pool.join()
+  if len(jobs) > 0:
+    print("played", len(jobs) * args.trials, "matches in", np.round(time.time() - start_time, 1), "seconds")
+
+  print_table(league, names)
@@ -5,6 +5,8 @@ run: python eval_ppo.py --render
 
 Evaluate PPO1 policy (MLP input_dim x 64 x 64 x output_dim policy) against built-in AI
 
+the actor weights are read straight from the stable-baselines zip (or an exported .bin,
+see scripts/convert_models.py) and run in numpy, pass --tf to run PPO1 itself instead.
 """
 
 import sys
@@ -16,25 +18,33 @@ import warnings
 warnings.filterwarnings("ignore", category=FutureWarning, module='tensorflow')
 warnings.filterwarnings("ignore", category=UserWarning, module='gym')
 
-import gym
 import numpy as np
 import argparse
 
 import slimevolley
-from stable_baselines.common.policies import MlpPolicy
-from stable_baselines import PPO1
+from mlp import Model
+
+class TFPolicy:
+  """ stable-baselines PPO1, deterministic """
+  def __init__(self, path, env):
+    from stable_baselines import PPO1
+    self.model = PPO1.load(path, env=env)
+  def predict(self, obs):
+    action, _states = self.model.predict(obs, deterministic=True)
+    return action
 
 def rollout(env, policy, render_mode=False):
   """ play one agent vs the other in modified gym-style loop. """
-  obs = env.reset()
+  obs, _ = env.reset()
 
   done = False
   total_reward = 0
 
   while not done:
 
-    action, _states = policy.predict(obs, deterministic=True)
-    obs, reward, done, _ = env.step(action)
+    action = policy.predict(obs)
+    obs, reward, terminated, truncated, _ = env.step(action)
+    done = terminated or truncated
 
     total_reward += reward
 
@@ -46,9 +56,11 @@ def rollout(env, policy, render_mode=False):
 if __name__=="__main__":
 
   parser = argparse.ArgumentParser(description='Evaluate pre-trained PPO agent.')
-  parser.add_argument('--model-path', help='path to stable-baselines model.',
-                        type=str, default="zoo/ppo/best_model.zip")
+  parser.add_argument('--model-path', help='path to stable-baselines model (or exported .bin).',
+                        type=str, default=os.path.join(os.path.dirname(__file__), '..', '..', 'assets', 'models', 'ppo', 'best_model.zip'))
   parser.add_argument('--render', action='store_true', help='render to screen?', default=False)
+  parser.add_argument('--tf', action='store_true', help='run through stable-baselines / tensorflow?', default=False)
+  parser.add_argument('--trials', help='number of trials (default 1000)', type=int, default=1000)
 
   args = parser.parse_args()
   render_mode = args.render
@@ -57,10 +69,13 @@ if __name__=="__main__":
 
   # the yellow agent:
   print("Loading", args.model_path)
-  policy = PPO1.load(args.model_path, env=env) # 96-core PPO1 policy
+  if args.tf:
+    policy = TFPolicy(args.model_path, env) # 96-core PPO1 policy
+  else:
+    policy = Model.makePPOPolicy(args.model_path)
 
   history = []
-  for i in range(1000):
+  for i in range(args.trials):
     env.seed(seed=i)
     cumulative_score = rollout(env, policy, render_mode)
     print("cumulative score #", i, ":", cumulative_score)
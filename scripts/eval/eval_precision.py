@@ -0,0 +1,84 @@
+"""
+Check whether reduced-precision inference changes any decisions.
+
+Runs a zoo policy at float64 (reference) and at float32 / int8 (see precision.py)
+over recorded trajectories, and reports how often all 3 buttons agree, plus the
+batched forward pass throughput of each precision.
+
+run: python scripts/eval/eval_precision.py --model ga --episodes 10
+     python scripts/eval/eval_precision.py --model baseline --dataset data/baseline_selfplay
+
+trajectories come from a dataset written by dataset.DatasetWriter, or are recorded
+on the fly by playing the policy against the baseline for --episodes matches.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import time
+import tempfile
+import argparse
+import numpy as np
+import slimevolley
+from utils import multiagent_rollout
+from dataset import DatasetWriter, DatasetReader
+from policy import BaselinePolicy
+from precision import PRECISIONS, action_agreement
+from eval_agents import makePolicy
+
+np.set_printoptions(threshold=20, precision=4, suppress=True, linewidth=200)
+
+def make_batch_fn(choice, path, precision):
+  """ (E, 12) obs -> (E, 3) actions at the given precision, recurrent state kept inside """
+  policy = makePolicy(choice, path)
+  policy.set_precision(precision)
+  if isinstance(policy, BaselinePolicy):
+    return lambda obs: policy.predict_batch(obs)[0]
+  return lambda obs: policy.predict_batch(obs)
+
+def record(choice, path, episodes, seed, data_dir):
+  env = slimevolley.SlimeVolleyEnv()
+  with DatasetWriter(data_dir) as writer:
+    for i in range(episodes):
+      env.seed(seed+i)
+      multiagent_rollout(env, makePolicy(choice, path), BaselinePolicy(), recorder=writer)
+
+def throughput(choice, path, precision, batch_size=1024, repeats=50):
+  fn = make_batch_fn(choice, path, precision)
+  obs = np.random.default_rng(0).normal(size=(batch_size, 12))
+  fn(obs)
+  start = time.perf_counter()
+  for _ in range(repeats):
+    fn(obs)
+  return batch_size * repeats / (time.perf_counter() - start)
+
+if __name__=="__main__":
+
+  parser = argparse.ArgumentParser(description='Measure action agreement of reduced-precision inference.')
+  parser.add_argument('--model', help='choice of (baseline, cma, ga)', type=str, default="ga")
+  parser.add_argument('--path', help='path to model (leave blank for zoo)', type=str, default="")
+  parser.add_argument('--dataset', help='recorded dataset directory (leave blank to record new episodes)', type=str, default="")
+  parser.add_argument('--side', help='which agent acted on the recorded obs (right: obs, left: otherObs)', type=str, default="right")
+  parser.add_argument('--episodes', help='episodes to record if no dataset is given', type=int, default=10)
+  parser.add_argument('--seed', help='random seed (integer)', type=int, default=721)
+
+  args = parser.parse_args()
+
+  data_dir = args.dataset
+  if len(data_dir) == 0:
+    data_dir = tempfile.mkdtemp(prefix="slimevolley_precision_")
+    record(args.model, args.path, args.episodes, args.seed, data_dir)
+
+  reader = DatasetReader(data_dir)
+  data = reader.get(np.arange(len(reader)), fields=['obs', 'otherObs', 'terminated', 'truncated'])
+  obs = data['obs'] if args.side == "right" else data['otherObs']
+  dones = data['terminated'] | data['truncated']
+  print("trajectories:", int(dones.sum()), "episodes,", len(obs), "steps")
+
+  for precision in PRECISIONS:
+    agreement, per_button = action_agreement(make_batch_fn(args.model, args.path, 'float64'),
+      make_batch_fn(args.model, args.path, precision), obs, dones)
+    print(args.model, precision, "action agreement:", np.round(agreement, 5), "per button:", per_button,
+      "throughput:", int(throughput(args.model, args.path, precision)), "obs/s")
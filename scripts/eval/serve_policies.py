@@ -0,0 +1,49 @@
+"""
+Serve zoo policies to many rollout workers from one process.
+
+run: python scripts/eval/serve_policies.py --models baseline,cma,ga --address /tmp/slimevolley.sock
+
+then point workers at it, e.g.
+
+  python scripts/eval/eval_agents.py --left baseline --right ga --server /tmp/slimevolley.sock
+
+observations from all connected workers are coalesced into dynamic batches per model (see policy_server.py).
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import time
+import argparse
+from eval_agents import APPROVED_MODELS, makePolicy
+from policy_server import PolicyServer
+
+if __name__=="__main__":
+
+  parser = argparse.ArgumentParser(description='Serve pre-trained agents to rollout workers.')
+  parser.add_argument('--models', help='comma separated choices of (baseline, ppo, cma, ga, random)', type=str, default="baseline,cma,ga")
+  parser.add_argument('--address', help='unix socket path to listen on', type=str, default="/tmp/slimevolley.sock")
+  parser.add_argument('--max-batch', help='largest batch per forward pass', type=int, default=256)
+  parser.add_argument('--max-latency', help='longest wait (seconds) for a batch to fill up', type=float, default=0.002)
+
+  args = parser.parse_args()
+
+  names = [name.strip().lower() for name in args.models.split(",")]
+  for name in names:
+    assert name in APPROVED_MODELS, "pls enter a valid agent: "+name
+
+  if os.path.exists(args.address):
+    os.remove(args.address) # stale socket from a previous run
+
+  server = PolicyServer({name: makePolicy(name) for name in names}, args.address,
+    max_batch=args.max_batch, max_latency=args.max_latency).start()
+  print("serving", names, "on", server.address)
+
+  try:
+    while True:
+      time.sleep(10)
+      print("batches / requests served:", server.stats())
+  except KeyboardInterrupt:
+    server.stop()
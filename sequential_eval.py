@@ -0,0 +1,83 @@
+"""
+Sequential evaluation: stop playing matches once the comparison with a threshold is decided.
+
+SequentialEvaluation takes match scores one at a time (Welford running mean and
+variance) and every check_every trials, after min_trials, compares a confidence
+interval of the mean score with the threshold: the evaluation stops as soon as the
+whole interval lies above or below it. the confidence level is split evenly over
+all the looks a run of max_trials could take (Bonferroni), so stopping at the
+first decisive look keeps the overall error rate below 1 - confidence (up to the
+normal approximation of the mean). a run that reaches max_trials undecided falls
+back to comparing the mean itself.
+
+usage:
+
+  test = SequentialEvaluation(threshold=0.5, max_trials=1000)
+  while not test.done:
+    test.update(play_one_match())
+  test.decision    # 'above' or 'below'
+  test.n           # trials used
+"""
+
+import math
+from statistics import NormalDist
+
+class SequentialEvaluation:
+  def __init__(self, threshold, confidence=0.95, max_trials=1000, min_trials=30, check_every=10):
+    self.threshold = threshold
+    self.confidence = confidence
+    self.max_trials = max_trials
+    self.min_trials = min(min_trials, max_trials)
+    self.check_every = check_every
+    looks = max(1, math.ceil((max_trials - self.min_trials) / check_every) + 1)
+    self.z = NormalDist().inv_cdf(1 - (1 - confidence) / (2 * looks))
+    self.n = 0
+    self.mean = 0.0
+    self._m2 = 0.0
+    self.decision = None # 'above' / 'below' once done
+    self.significant = False # the interval excluded the threshold (False: max_trials reached, decided by the mean)
+
+  @property
+  def done(self):
+    return self.decision is not None
+
+  @property
+  def std(self):
+    return math.sqrt(self._m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+  def interval(self):
+    """ (low, high) confidence interval of the mean score at the current trial count """
+    radius = self.z * self.std / math.sqrt(self.n) if self.n > 1 else math.inf
+    return self.mean - radius, self.mean + radius
+
+  def update(self, score):
+    """ add one match score, returns the decision (None while undecided). scores after the decision are ignored """
+    if self.done:
+      return self.decision
+    self.n += 1
+    delta = score - self.mean
+    self.mean += delta / self.n
+    self._m2 += delta * (score - self.mean)
+    if self.n >= self.min_trials and ((self.n - self.min_trials) % self.check_every == 0 or self.n >= self.max_trials):
+      low, high = self.interval()
+      if low > self.threshold or high < self.threshold:
+        self.decision, self.significant = 'above' if low > self.threshold else 'below', True
+    if not self.done and self.n >= self.max_trials:
+      self.decision = 'above' if self.mean > self.threshold else 'below'
+    return self.decision
+
+  def extend(self, scores):
+    for score in scores:
+      if self.update(score) is not None:
+        break
+    return self.decision
+
+  @property
+  def stopped_early(self):
+    return self.significant and self.n < self.max_trials
+
+  def summary(self):
+    low, high = self.interval()
+    how = "stopped early" if self.stopped_early else "significant" if self.significant else "not significant, by the mean"
+    return "%s %g after %d trials (%s, %g%% interval [%.3f, %.3f])" % (
+      self.decision, self.threshold, self.n, how, 100 * self.confidence, low, high)
@@ -10,6 +10,9 @@ https://blog.otoro.net/2015/03/28/neural-slime-volleyball/
 https://github.com/hardmaru/neuralslimevolley
 
 No dependencies apart from Numpy and Gym
+
+pygame and cv2 are only imported once something is rendered (human, rgb_array
+or pixel observations), so state-only workers start without them.
 """
 
 import logging
@@ -19,23 +22,23 @@ from gymnasium import spaces
 from gymnasium.utils import seeding
 from gymnasium.envs.registration import register
 import numpy as np
-import cv2 # installed with gym anyways
 from collections import deque
-import pygame
 from config import *
 
-np.set_printoptions(threshold=20, precision=3, suppress=True, linewidth=200)
-
 
 def upsize_image(img):
+  import cv2
   return cv2.resize(img, (PIXEL_WIDTH * PIXEL_SCALE, PIXEL_HEIGHT * PIXEL_SCALE), interpolation=cv2.INTER_NEAREST)
 def downsize_image(img):
+  import cv2
   return cv2.resize(img, (PIXEL_WIDTH, PIXEL_HEIGHT), interpolation=cv2.INTER_AREA)
 
 
 
 from game import Game
 
+from vector_game import VectorGame
+
 from agent import Agent
 
 from policy import BaselinePolicy
@@ -240,7 +243,7 @@ class SlimeVolleyEnv(gym.Env):
     otherObs = None
     if self.multiagent:
       if self.from_pixels:
-        otherObs = cv2.flip(obs, 1) # horizontal flip
+        otherObs = obs[:, ::-1].copy() # horizontal flip
       else:
         otherObs = self.game.agent_left.getObservation()
 
@@ -262,9 +265,12 @@ class SlimeVolleyEnv(gym.Env):
 
   def reset(self, **kwargs):
     self.init_game_state()
+    if hasattr(self.policy, 'refresh'): # e.g. weight_broadcast.BroadcastPolicy picks up new weights
+      self.policy.refresh()
     return self.getObs(), {}
 
   def render(self, mode='human', close=False):
+    import pygame
     if self.screen is None:
         pygame.init()
         self.screen = pygame.display.set_mode((self.window_width, self.window_height))
@@ -286,6 +292,7 @@ class SlimeVolleyEnv(gym.Env):
 
   def close(self):
     if self.screen is not None:
+      import pygame
       pygame.quit()
     
   def get_action_meanings(self):
@@ -303,6 +310,95 @@ class SlimeVolleySurvivalAtariEnv(SlimeVolleyEnv):
   atari_mode = True
   survival_bonus = True
 
+class SlimeVolleyVectorEnv:
+  """
+  num_envs state-observation SlimeVolleyEnv's stepped in lockstep on a VectorGame.
+
+  same rules, rewards and termination as SlimeVolleyEnv, with a leading num_envs axis:
+  step(action, otherAction=None) takes (N, 3) actions and returns (N, 12) obs,
+  (N,) reward / terminated / truncated, and info with (N, 12) 'otherObs'.
+  without otherAction the left agents are driven by one batched BaselinePolicy,
+  with a recurrent state per env that is cleared when that env is reset
+  (self.policy can be replaced by anything with predict_batch(obs, state)).
+  a policy that also has refresh() and snapshot(), like weight_broadcast.BroadcastPolicy,
+  is refreshed on every reset: the reset envs play its latest version, the others
+  keep the snapshot they were reset with until their own next reset.
+
+  envs are not reset automatically: call reset(rows) for finished envs (rows that
+  keep stepping after their game is over just keep playing).
+  seed(seeds) seeds each env the way SlimeVolleyEnv.seed does, so env i replays
+  SlimeVolleyEnv().seed(seeds[i]) exactly.
+  """
+
+  def __init__(self, num_envs):
+    self.num_envs = num_envs
+    self.t = np.zeros(num_envs, dtype=np.int64)
+    self.t_limit = 3000
+    self.action_space = spaces.MultiBinary(3)
+    high = np.array([np.finfo(np.float32).max] * 12)
+    self.observation_space = spaces.Box(-high, high)
+    self.game = VectorGame(num_envs)
+    self.policy = BaselinePolicy() # the “bad guy”
+    self.policyState = np.zeros((num_envs, self.policy.nOutput))
+    self.opponents = None # per env snapshot of a refreshable policy
+
+  def seed(self, seeds, rows=None):
+    rows = np.arange(self.num_envs) if rows is None else np.atleast_1d(rows)
+    self.game.seed(rows, seeds)
+    return list(np.atleast_1d(seeds))
+
+  def reset(self, rows=None, seeds=None):
+    """ resets the given rows (all by default), seeding them first if seeds are given """
+    rows = np.arange(self.num_envs) if rows is None else np.atleast_1d(rows)
+    if seeds is not None:
+      self.game.seed(rows, seeds)
+    self.t[rows] = 0
+    self.game.reset(rows)
+    self.policyState[rows] = 0
+    if hasattr(self.policy, 'snapshot'): # e.g. weight_broadcast.BroadcastPolicy, switches the reset envs only
+      if self.opponents is None:
+        self.opponents = [self.policy.snapshot()] * self.num_envs # what every env has played so far
+      self.policy.refresh()
+      current = self.policy.snapshot()
+      for row in rows:
+        self.opponents[row] = current
+    else:
+      self.opponents = None
+    obs = self.game.observation()
+    return obs[:, 1], {'otherObs': obs[:, 0]}
+
+  def step(self, action, otherAction=None):
+    self.t += 1
+    obs = self.game.observation()
+    if otherAction is None: # batched baseline policy for the left agents
+      otherAction = self._opponent_action(obs[:, 0])
+    self.game.set_action(np.stack([np.asarray(otherAction), np.asarray(action)], axis=1))
+    reward = self.game.step()
+
+    obs = self.game.observation()
+    truncated = self.t >= self.t_limit
+    terminated = (self.game.life <= 0).any(axis=1)
+    info = {
+      'ale.lives': self.game.life[:, 1].copy(),
+      'ale.otherLives': self.game.life[:, 0].copy(),
+      'otherObs': obs[:, 0],
+    }
+    return obs[:, 1], reward, terminated, truncated, info
+
+  def _opponent_action(self, obs):
+    """ one predict_batch per distinct opponent, usually just self.policy """
+    if self.opponents is None or all(p is self.opponents[0] for p in self.opponents):
+      policy = self.policy if self.opponents is None else self.opponents[0]
+      action, self.policyState = policy.predict_batch(obs, self.policyState)
+      return action
+    groups = {}
+    for row, policy in enumerate(self.opponents):
+      groups.setdefault(id(policy), (policy, []))[1].append(row)
+    action = np.zeros((self.num_envs, 3))
+    for policy, rows in groups.values():
+      action[rows], self.policyState[rows] = policy.predict_batch(obs[rows], self.policyState[rows])
+    return action
+
 class SurvivalRewardEnv(gym.RewardWrapper):
   def __init__(self, env):
     """
@@ -0,0 +1,40 @@
+import os
+import pytest
+import numpy as np
+import checkpoint
+
+def test_writer_roundtrip_restores_rng_states(tmp_path):
+    """
+    Test that a background-written checkpoint restores arrays and both kinds of RNG state exactly.
+    """
+    np.random.seed(3)
+    generator = np.random.default_rng(4)
+    population = np.random.normal(size=(4, 5))
+    generator.normal()
+    meta = {'tournament': 7, 'np_random': checkpoint.rng_state(), 'env_random': checkpoint.rng_state(generator)}
+    expected = (np.random.normal(size=3), generator.uniform(size=3))
+
+    writer = checkpoint.CheckpointWriter(keep=1)
+    writer.submit(str(tmp_path / "ckpt_00000001.npz"), {'population': population}, meta)
+    population[:] = 0 # submit took a snapshot
+    writer.submit(str(tmp_path / "ckpt_00000002.npz"), {'population': population}, meta)
+    writer.close()
+    assert sorted(os.listdir(tmp_path)) == ["ckpt_00000002.npz"]
+
+    arrays, loaded = checkpoint.load(checkpoint.latest(str(tmp_path)))
+    assert not arrays['population'].any() and loaded['tournament'] == 7
+    checkpoint.set_rng_state(loaded['np_random'])
+    checkpoint.set_rng_state(loaded['env_random'], generator)
+    assert np.array_equal(np.random.normal(size=3), expected[0])
+    assert np.array_equal(generator.uniform(size=3), expected[1])
+
+def test_resume_file_without_checkpoints(tmp_path):
+    """
+    Test that a bare --resume starts fresh when there is no checkpoint yet, and that a missing explicit file stops the run.
+    """
+    assert checkpoint.resume_file(str(tmp_path / "missing_dir"), 'latest') is None
+    assert checkpoint.resume_file(str(tmp_path), 'latest') is None
+    checkpoint.save(str(tmp_path / "ckpt_00000003.npz"), {'x': np.zeros(2)}, {})
+    assert checkpoint.resume_file(str(tmp_path), 'latest') == str(tmp_path / "ckpt_00000003.npz")
+    with pytest.raises(SystemExit):
+        checkpoint.resume_file(str(tmp_path), str(tmp_path / "ckpt_00000009.npz"))
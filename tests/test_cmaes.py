@@ -0,0 +1,18 @@
+import numpy as np
+from cmaes import CMAES
+
+def test_cmaes_solves_ill_conditioned_quadratic():
+    """
+    Test that CMA-ES maximizes a scaled quadratic and that a restored state continues identically.
+    """
+    scale = np.arange(1, 11)
+    fitness = lambda x: -np.sum((x * scale) ** 2, axis=1)
+    es = CMAES(np.ones(10) * 3, sigma=1.0, np_random=np.random.default_rng(0))
+    for _ in range(300):
+        x = es.ask()
+        es.tell(x, fitness(x))
+    assert es.best_fitness > -1e-6
+
+    other = CMAES(np.zeros(10), np_random=np.random.default_rng(1))
+    other.set_state(*es.get_state())
+    assert np.array_equal(es.ask(), other.ask())
@@ -0,0 +1,32 @@
+import numpy as np
+from dataset import DatasetWriter, DatasetReader, pack_action, unpack_action
+
+def test_pack_action_roundtrip():
+    """
+    Test that packed actions unpack to the buttons Agent.setAction would press.
+    """
+    actions = np.array([[0, 0, 0], [1, 0, 1], [0.3, -1, 2], [1, 1, 1]])
+    packed = pack_action(actions)
+    assert packed.dtype == np.uint8
+    assert np.array_equal(unpack_action(packed), (actions > 0).astype(np.float32))
+
+def test_writer_spans_shards(tmp_path):
+    """
+    Test that rows written across several shards are read back in order.
+    """
+    n = 25
+    obs = np.arange(n * 12, dtype=np.float32).reshape(n, 12)
+    with DatasetWriter(str(tmp_path), shard_size=10) as writer:
+        for i in range(n):
+            writer.write(obs[i], [i % 2, 0, 1], float(i), i == n - 1, False, -obs[i], [0, 1, 0])
+
+    reader = DatasetReader(str(tmp_path))
+    assert len(reader) == n
+    assert len(reader.shards) == 3
+    batch = reader.get(np.arange(n)[::-1])
+    assert np.array_equal(batch['obs'], obs[::-1])
+    assert np.array_equal(batch['otherObs'], -obs[::-1])
+    assert np.array_equal(batch['reward'], np.arange(n, dtype=np.float32)[::-1])
+    assert batch['terminated'][0] and not batch['terminated'][1:].any()
+    sample = reader.sample(7, np.random.default_rng(0))
+    assert sample['obs'].shape == (7, 12)
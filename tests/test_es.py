@@ -0,0 +1,23 @@
+import numpy as np
+from es import NoiseTable, OpenES, centered_ranks
+
+def test_openes_climbs_quadratic_from_shared_noise():
+    """
+    Test that OpenES maximizes a quadratic using antithetic samples read from an attached noise table.
+    """
+    assert np.allclose(centered_ranks(np.array([[3.0, 1.0], [2.0, 5.0]])), [[1/6, -0.5], [-1/6, 0.5]])
+    noise = NoiseTable(100000, seed=0)
+    try:
+        worker = NoiseTable(noise.size, name=noise.name)
+        assert np.array_equal(worker.get(123, 10), noise.get(123, 10))
+        worker.close()
+        target = np.linspace(-1, 1, 10)
+        es = OpenES(np.zeros(10), noise, sigma=0.1, popsize=50, learning_rate=0.05, weight_decay=0,
+            np_random=np.random.default_rng(0))
+        for _ in range(200):
+            indices = es.ask()
+            fitness = np.array([[-np.sum((es.perturbation(i, s) - target) ** 2) for s in (1, -1)] for i in indices])
+            es.tell(indices, fitness)
+        assert np.sum((es.theta - target) ** 2) < 0.05
+    finally:
+        noise.close()
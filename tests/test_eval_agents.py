@@ -0,0 +1,32 @@
+import os
+import io
+import sys
+import numpy as np
+import slimevolley
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts', 'eval'))
+from eval_agents import evaluate_parallel, makePolicy, play_trial
+
+def test_output_does_not_depend_on_the_number_of_workers():
+    """
+    Test that the json lines written by one worker and by two are byte-identical.
+    """
+    outputs = []
+    for workers in (1, 2):
+        out = io.StringIO()
+        evaluate_parallel('ga', None, 'random', None, out, n_trials=6, init_seed=3, workers=workers)
+        outputs.append(out.getvalue())
+    assert outputs[0] == outputs[1] and len(outputs[0].splitlines()) == 6
+
+def test_trials_start_from_reset_policies():
+    """
+    Test that a trial plays the same whatever ran before it: the random policy is reseeded and the baseline's state cleared.
+    """
+    env = slimevolley.SlimeVolleyEnv()
+    baseline, random = makePolicy('baseline'), makePolicy('random')
+    first = play_trial(env, baseline, random, seed=8)
+    baseline.predict(np.ones(12)) # leave some recurrent state behind
+    random.predict(np.ones(12)) # and advance the random stream
+    play_trial(env, baseline, random, seed=9)
+    assert play_trial(env, baseline, random, seed=8) == first
+    assert play_trial(env, makePolicy('baseline'), makePolicy('random'), seed=8) == first
@@ -0,0 +1,91 @@
+import os
+import numpy as np
+import slimevolley
+import mlp
+from mlp import Model
+from policy import BaselinePolicy
+from dataset import DatasetWriter, DatasetReader
+from events import EventRecorder, EventIndex, RALLY_DTYPE, TOUCH, STUB_BOUNCE, FENCE_BOUNCE, NET_CROSS, SCORE
+from utils import multiagent_rollout
+
+ZOO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'models')
+
+class Tracker:
+    """ wraps a policy, records the ball's x position before every step """
+    def __init__(self, env, policy):
+        self.env, self.policy, self.ball_x = env, policy, []
+    def predict(self, obs):
+        self.ball_x.append(self.env.game.ball.x)
+        return self.policy.predict(obs)
+
+def reference_rallies(events, reward, ball_x, lengths):
+    """ rallies rebuilt frame by frame: scores from the rewards, crossings from the ball's side of the net """
+    rallies, row = [], 0
+    for match, length in enumerate(lengths):
+        frame_events = {}
+        for m, frame, kind, _ in events:
+            if m == match:
+                frame_events.setdefault(frame, []).append(kind)
+        start, touches, crossings, last_contact, side = 0, 0, 0, 0, 0
+        for frame in range(1, length + 1):
+            for kind in frame_events.get(frame, []):
+                touches += kind == TOUCH
+                if kind in (TOUCH, STUB_BOUNCE, FENCE_BOUNCE):
+                    last_contact = kind
+            x = ball_x[match][frame]
+            if x != 0:
+                crossings += side != 0 and np.sign(x) != side
+                side = np.sign(x)
+            r = reward[row + frame - 1]
+            if r != 0:
+                rallies.append((match, start, frame, r, touches, crossings, last_contact))
+                start, touches, crossings, last_contact, side = frame, 0, 0, 0, 0
+        if length > start:
+            rallies.append((match, start, length, 0, touches, crossings, last_contact))
+        row += length
+    return np.array(rallies, dtype=RALLY_DTYPE)
+
+def test_rallies_match_a_step_by_step_count(tmp_path):
+    """
+    Test that the vectorized rally table and its queries agree with a frame by frame count of the same matches.
+    """
+    env = slimevolley.SlimeVolleyEnv()
+    env.seed(30)
+    recorder = EventRecorder()
+    writer = DatasetWriter(str(tmp_path / "data"), shard_size=1000)
+    ball_x, lengths = [], []
+    policies = [Model(mlp.games['slimevolleylite']) for _ in range(2)] # random weights: short rallies, every point scored
+    for seed, policy in enumerate(policies):
+        policy.set_model_params(np.random.default_rng(seed).standard_normal(policy.param_count))
+    policies.insert(1, Model.makeSlimePolicyLite(os.path.join(ZOO, 'ga_sp', 'ga.json'))) # long rallies, up to the time limit
+    for policy in policies:
+        right = Tracker(env, policy)
+        _, length = multiagent_rollout(env, right, BaselinePolicy(), recorder=writer, events=recorder)
+        ball_x.append(right.ball_x + [env.game.ball.x])
+        lengths.append(length)
+    writer.close()
+    reward = DatasetReader(str(tmp_path / "data")).get(np.arange(sum(lengths)), ['reward'])['reward']
+
+    index = recorder.build()
+    index.save(str(tmp_path / "events.npz"))
+    index = EventIndex.load(str(tmp_path / "events.npz"))
+    expected = reference_rallies(recorder.events, reward, ball_x, lengths)
+    rallies = index.rallies()
+    assert len(rallies) > 10 and (rallies['winner'] == 0).sum() <= 3
+    assert rallies.tolist() == expected.tolist()
+    assert np.sum(rallies['crossings']) == len(index.of_type(NET_CROSS)) > 0
+
+    length = expected['end'] - expected['start']
+    median = int(np.median(length))
+    assert index.long_rallies(median).tolist() == expected[length > median].tolist()
+    assert len(index.points_lost_to(STUB_BOUNCE)) + len(index.points_lost_to(FENCE_BOUNCE)) > 0
+    for contact in (STUB_BOUNCE, FENCE_BOUNCE, TOUCH):
+        assert index.points_lost_to(contact).tolist() == expected[(expected['winner'] != 0) & (expected['last_contact'] == contact)].tolist()
+    crossings = int(np.median(expected['crossings']))
+    assert index.rallies_with_crossings(crossings).tolist() == expected[expected['crossings'] > crossings].tolist()
+
+    # rows of score events and rally ends point at the transitions that carried the reward
+    scores = index.of_type(SCORE)
+    assert np.array_equal(reward[index.rows(scores)], scores['value'])
+    scored = rallies[rallies['winner'] != 0]
+    assert np.array_equal(reward[index.rows(scored)], scored['winner'])
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# generous per-process budget for a fresh interpreter importing headless modules
+# (dominated by numpy, and gymnasium for slimevolley). rendering stacks alone cost more.
+IMPORT_BUDGET_SECONDS = 1.0
+
+def _import_in_fresh_process(modules):
+    code = (
+        "import sys, time\n"
+        "t = time.perf_counter()\n"
+        "import " + modules + "\n"
+        "print(time.perf_counter() - t, 'pygame' in sys.modules, 'cv2' in sys.modules)\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    seconds, pygame_loaded, cv2_loaded = out.stdout.split()
+    return float(seconds), pygame_loaded == "True", cv2_loaded == "True"
+
+@pytest.mark.parametrize("modules", ["game, agent, config", "policy", "mlp", "utils", "slimevolley"])
+def test_headless_imports(modules):
+    """
+    Test that physics, observation and policy modules import without the rendering stack, within budget.
+    """
+    seconds, pygame_loaded, cv2_loaded = _import_in_fresh_process(modules)
+    assert not pygame_loaded
+    assert not cv2_loaded
+    assert seconds < IMPORT_BUDGET_SECONDS
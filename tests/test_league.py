@@ -0,0 +1,29 @@
+import os
+from league import League
+
+def result(right, left, wins, draws, losses):
+    return {'right': right, 'left': left, 'wins': wins, 'draws': draws, 'losses': losses, 'score': float(wins - losses)}
+
+def test_ratings_follow_results_and_only_new_pairs_are_pending(tmp_path):
+    """
+    Test that stronger models rate higher, that stored pairs survive a reload, and that adding a model only leaves its own pairs to play.
+    """
+    path = os.path.join(tmp_path, "league.json")
+    league = League(path, trials=10)
+    assert league.pending(["a", "b", "c"]) == [("a", "b"), ("a", "c"), ("b", "c")]
+    league.put("a", "b", result("a", "b", 7, 2, 1))
+    league.put("c", "a", result("c", "a", 0, 1, 9)) # stored from either side
+    league.put("b", "c", result("b", "c", 6, 4, 0))
+    league.save()
+
+    league = League(path, trials=10)
+    assert league.pending(["a", "b", "c", "a"]) == []
+    assert sorted(league.pending(["a", "b", "c", "d"])) == [("a", "d"), ("b", "d"), ("c", "d")]
+    assert League(path, trials=20).pending(["a", "b"]) == [("a", "b")] # other settings, other results
+
+    ratings = league.ratings(["a", "b", "c"])
+    assert ratings["a"] > ratings["b"] > ratings["c"]
+    assert league.standings(["a", "b", "c"])["a"] == (7 + 9 + 0.5 * 3, 20)
+    # an unbeaten model gets a finite rating, and a model without games the virtual opponent's
+    ratings = league.ratings(["a", "b", "c", "d"])
+    assert ratings["a"] < 2000 and abs(ratings["d"] - 1000) < 1e-6
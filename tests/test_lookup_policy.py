@@ -0,0 +1,38 @@
+import os
+import numpy as np
+import slimevolley
+from mlp import Model
+from dataset import pack_action
+from lookup_policy import LookupPolicy, compile_policy, agreement
+
+GA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'models', 'ga_sp', 'ga.json')
+
+def recorded_obs(policy, steps=3000):
+    """ observations of the right agent while policy plays the baseline """
+    env = slimevolley.SlimeVolleyEnv()
+    env.seed(3)
+    obs, _ = env.reset()
+    history = []
+    for _ in range(steps):
+        history.append(obs)
+        obs, _, terminated, truncated, _ = env.step(policy.predict(obs))
+        if terminated or truncated:
+            obs, _ = env.reset()
+    return np.array(history)
+
+def test_compiled_policy_survives_save_and_load(tmp_path):
+    """
+    Test that a compiled policy beats always playing the most common action, and that loading it back gives float64 edges and the same actions.
+    """
+    model = Model.makeSlimePolicyLite(GA_PATH)
+    obs = recorded_obs(model)
+    policy, _ = compile_policy(model.predict_batch, obs[::2], max_cells=2**12)
+    held_out = pack_action(model.predict_batch(obs[1::2]))
+    assert agreement(policy, model.predict_batch, obs[1::2])[0] > np.bincount(held_out).max() / len(held_out)
+
+    filename = str(tmp_path / "lookup.npz")
+    policy.save(filename)
+    loaded = LookupPolicy.load(filename)
+    assert all(e.dtype == np.float64 for e in loaded.edges)
+    assert np.array_equal(loaded.predict_batch(obs), policy.predict_batch(obs))
+    assert np.array_equal(loaded.predict(obs[0]), policy.predict(obs[0]))
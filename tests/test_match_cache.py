@@ -0,0 +1,46 @@
+import os
+import io
+import sys
+import slimevolley
+from mlp import Model
+from policy import BaselinePolicy
+from match_cache import MatchCache
+from utils import multiagent_rollout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GA_PATH = os.path.join(ROOT, 'assets', 'models', 'ga_sp', 'ga.json')
+sys.path.insert(0, os.path.join(ROOT, 'scripts', 'eval'))
+
+def play(cache, matches=3):
+    env = slimevolley.SlimeVolleyEnv()
+    env.seed(5)
+    policy_right, policy_left = Model.makeSlimePolicyLite(GA_PATH), BaselinePolicy()
+    return [multiagent_rollout(env, policy_right, policy_left, cache=cache) for _ in range(matches)]
+
+def test_cached_matches_replay_the_simulated_sequence(tmp_path):
+    """
+    Test that hits return the simulated outcomes and leave RNG / recurrent state where the simulation did.
+    """
+    expected = play(None)
+    cache = MatchCache(str(tmp_path / "matches.sqlite"))
+    assert play(cache) == expected
+    cache.close()
+    cache = MatchCache(str(tmp_path / "matches.sqlite")) # a fresh process would only see the sqlite file
+    assert play(cache) == expected
+    assert cache.stats() == {'hits': 3, 'misses': 0}
+
+def test_cache_is_shared_by_pool_workers(tmp_path):
+    """
+    Test that several workers can fill the sqlite file and then replay a fully cached run from it.
+    """
+    from eval_agents import evaluate_parallel
+    path = str(tmp_path / "matches.sqlite")
+    outputs = []
+    for _ in range(2):
+        out = io.StringIO()
+        evaluate_parallel('baseline', None, 'ga', None, out, n_trials=12, workers=3, cache_path=path)
+        outputs.append(out.getvalue())
+    assert outputs[0] == outputs[1] and len(outputs[0].splitlines()) == 12
+    cache = MatchCache(path)
+    assert cache.db.execute("SELECT COUNT(*) FROM matches").fetchone()[0] == 12
+    cache.close()
@@ -0,0 +1,97 @@
+import os
+import json
+import numpy as np
+import model_format
+from mlp import Model, games
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CMA_PATH = os.path.join(ROOT, 'assets', 'models', 'cmaes', 'slimevolley.cma.64.96.best.json')
+GA_PATH = os.path.join(ROOT, 'assets', 'models', 'ga_sp', 'ga.json')
+PPO_PATH = os.path.join(ROOT, 'assets', 'models', 'ppo', 'best_model.zip')
+
+def test_predict_batch_matches_predict():
+    """
+    Test that the batched path gives the same outputs as predict, row by row.
+    """
+    rng = np.random.default_rng(0)
+    obs = rng.normal(size=(64, 12))
+    for model in [Model.makeSlimePolicy(CMA_PATH), Model.makeSlimePolicyLite(GA_PATH)]:
+        expected = np.array([model.predict(o) for o in obs])
+        assert np.allclose(model.predict_batch(obs), expected)
+        assert np.allclose(model.predict_batch(obs, precision='float32'), expected, atol=1e-3)
+
+def test_predict_batch_reuses_buffers():
+    """
+    Test that repeated calls with the same batch size write into the same output buffer, and that smaller batches reuse the largest one.
+    """
+    model = Model.makeSlimePolicyLite(GA_PATH)
+    obs = np.zeros((8, 12))
+    first = model.predict_batch(obs)
+    second = model.predict_batch(obs)
+    assert first is second
+    expected = model.predict_batch(obs[:3]).copy()
+    for n in (3, 5, 8, 2):
+        small = model.predict_batch(obs[:n])
+        assert small.shape == (n, 3) and np.shares_memory(small, first)
+    assert np.array_equal(model.predict_batch(obs[:3]), expected)
+    assert len(model.batch_buffers) == 1
+
+def test_predict_population_matches_individual_models():
+    """
+    Test that forwarding a whole population at once matches setting each row's parameters in turn.
+    """
+    rng = np.random.default_rng(1)
+    model = Model(games['slimevolleylite'])
+    population = rng.normal(size=(16, model.param_count)) * 0.5
+    model.set_population(population)
+    assert all(np.shares_memory(w, population) for w in model.population[0])
+    obs = rng.normal(size=(16, 3, 12))
+    outputs = model.predict_population(obs)
+    assert outputs.shape == (16, 3, 3)
+    for i in range(16):
+        model.set_model_params(population[i])
+        assert np.allclose(outputs[i], [model.predict(o) for o in obs[i]])
+
+def test_binary_model_roundtrip(tmp_path):
+    """
+    Test that a json zoo model converted to the binary format loads memory-mapped with the same layout.
+    """
+    filename = model_format.convert_json(GA_PATH, str(tmp_path / 'ga.bin'))
+    assert os.path.getsize(filename) < os.path.getsize(GA_PATH)
+    params, game_config, _ = model_format.load(filename)
+    assert isinstance(params, np.memmap)
+    assert game_config == games['slimevolleylite']
+    binary = Model.from_file(filename)
+    original = Model.makeSlimePolicyLite(GA_PATH)
+    obs = np.random.default_rng(2).normal(size=(32, 12))
+    assert np.allclose(binary.predict_batch(obs), original.predict_batch(obs), atol=1e-4)
+    assert binary.data == original.data # the same extra from either format
+
+def test_cached_extra_keeps_no_weights():
+    """
+    Test that models loaded from the same json file get their own small extra, without the weight lists.
+    """
+    a, b = Model.makeSlimePolicyLite(GA_PATH), Model.makeSlimePolicyLite(GA_PATH)
+    assert np.shares_memory(a.weight[0], b.weight[0])
+    assert a.data == b.data and a.data is not b.data
+    with open(GA_PATH) as f:
+        assert a.data == {'json': json.load(f)[1:]} # [params, ...] minus the params
+    a.data['json'].append('changed')
+    assert Model.makeSlimePolicyLite(GA_PATH).data == b.data
+
+def test_ppo_export_matches_actor_forward_pass(tmp_path):
+    """
+    Test that the exported PPO actor computes the MlpPolicy logits (tanh 64x64, linear output).
+    """
+    import io, zipfile
+    with zipfile.ZipFile(PPO_PATH) as archive:
+        p = np.load(io.BytesIO(archive.read('parameters')))
+        w = {k.replace('model/', '').replace(':0', ''): p[k] for k in p.files}
+    obs = np.random.default_rng(2).normal(size=(32, 12))
+    h = np.tanh(obs @ w['pi_fc0/w'] + w['pi_fc0/b'])
+    h = np.tanh(h @ w['pi_fc1/w'] + w['pi_fc1/b'])
+    logits = h @ w['pi/w'] + w['pi/b']
+
+    exported = Model.from_file(model_format.convert_stable_baselines(PPO_PATH, str(tmp_path / 'ppo.bin')))
+    assert np.allclose(Model.makePPOPolicy(PPO_PATH).predict_batch(obs), logits)
+    assert np.allclose(exported.predict_batch(obs), logits, atol=1e-4)
@@ -0,0 +1,34 @@
+import os
+import time
+import numpy as np
+from opponent_registry import OpponentRegistry
+
+def test_registry_loads_new_generations_in_background(tmp_path):
+    """
+    Test that generations written after start-up are loaded off-thread and that the pool keeps the newest ones.
+    """
+    def write(generation): # complete files only, as the trainers do
+        filename = os.path.join(tmp_path, "history_"+str(generation).zfill(8)+".zip")
+        with open(filename+".tmp", "w") as f:
+            f.write(str(generation))
+        os.replace(filename+".tmp", filename)
+    def loader(filename):
+        with open(filename) as f:
+            return int(f.read())
+
+    write(1)
+    registry = OpponentRegistry(str(tmp_path), loader, pool_size=2, poll_interval=0.01)
+    try:
+        assert registry.latest()[1] == 1
+        for generation in (2, 3):
+            write(generation)
+            time.sleep(0.01) # distinct directory mtimes
+        deadline = time.time() + 5
+        while registry.latest()[1] != 3 and time.time() < deadline:
+            time.sleep(0.01)
+        assert registry.latest()[1] == 3
+        assert sorted(registry.pool.values()) == [2, 3]
+        rng = np.random.default_rng(0)
+        assert {registry.sample(rng, latest_prob=0.0)[1] for _ in range(50)} == {2, 3}
+    finally:
+        registry.close()
@@ -0,0 +1,43 @@
+import numpy as np
+from policy import BaselinePolicy
+
+def test_predict_batch_matches_predict():
+    """
+    Test that each row of predict_batch follows the same trajectory as its own sequential policy.
+    """
+    rng = np.random.default_rng(0)
+    n, steps = 5, 20
+    obs = rng.normal(size=(steps, n, 12))
+    sequential = [BaselinePolicy() for _ in range(n)]
+    batched = BaselinePolicy()
+    for t in range(steps):
+        action, state = batched.predict_batch(obs[t])
+        assert state.shape == (n, 7)
+        for i in range(n):
+            assert list(action[i]) == sequential[i].predict(obs[t, i])
+
+def test_reset_rows():
+    """
+    Test that reset_rows restarts only the masked envs from a zero recurrent state.
+    """
+    rng = np.random.default_rng(1)
+    obs = rng.normal(size=(3, 12))
+    policy = BaselinePolicy()
+    policy.predict_batch(obs)
+    policy.predict_batch(obs)
+    mask = np.array([True, False, True])
+    policy.reset_rows(mask)
+    assert not policy.batchState[mask].any()
+    assert policy.batchState[~mask].any()
+    fresh = BaselinePolicy()
+    action, _ = policy.predict_batch(obs)
+    assert list(action[0]) == fresh.predict(obs[0])
+
+def test_weights_are_shared_and_read_only():
+    """
+    Test that policies built from the same file share one read-only copy of the weights.
+    """
+    a, b = BaselinePolicy(), BaselinePolicy()
+    assert np.shares_memory(a.weight, b.weight)
+    assert not a.weight.flags.writeable
+    assert a.weight.shape == (7, 15)
@@ -0,0 +1,73 @@
+import os
+import threading
+import pytest
+import numpy as np
+from mlp import Model
+from policy import BaselinePolicy
+from policy_server import PolicyServer, RemotePolicy
+
+GA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'models', 'ga_sp', 'ga.json')
+
+def play(policy, observations, actions):
+    for obs in observations:
+        actions.append(np.asarray(policy.predict(obs)))
+
+def test_batched_actions_match_direct_predictions(tmp_path):
+    """
+    Test that two concurrent clients get the actions of direct predict calls, with their own recurrent state and resets.
+    """
+    address = str(tmp_path / "slime.sock")
+    server = PolicyServer({'baseline': BaselinePolicy(), 'ga': Model.makeSlimePolicyLite(GA_PATH)}, address, max_latency=0.01).start()
+    np_random = np.random.default_rng(0)
+    observations = [np_random.uniform(-2, 2, size=(40, 12)) for _ in range(2)]
+    try:
+        for name, make in [('baseline', BaselinePolicy), ('ga', lambda: Model.makeSlimePolicyLite(GA_PATH))]:
+            clients = [RemotePolicy(address, name) for _ in range(2)]
+            # a different history on each client first, then a reset: both must start over from a fresh state
+            for client, obs in zip(clients, observations):
+                play(client, obs[::-1], [])
+                client.reset()
+            actions = [[], []]
+            threads = [threading.Thread(target=play, args=(c, obs, a)) for c, obs, a in zip(clients, observations, actions)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for obs, remote in zip(observations, actions):
+                direct = []
+                play(make(), obs, direct)
+                remote, direct = np.array(remote), np.array(direct)
+                # a batched matmul rounds differently from a single row, the pressed buttons are the same
+                assert np.allclose(remote, direct, rtol=0, atol=1e-9) and np.array_equal(remote > 0, direct > 0)
+            for client in clients:
+                client.close()
+        batches, served = server.stats()['baseline']
+        assert served == 2 * 2 * 40 and batches < served # some requests shared a forward pass
+    finally:
+        server.stop()
+    assert not os.path.exists(address) # the listener is closed and its socket removed
+    for worker in server.workers.values():
+        worker.thread.join(timeout=5)
+        assert not worker.thread.is_alive()
+
+def test_malformed_request_only_fails_its_client(tmp_path):
+    """
+    Test that a request the model can't run raises in its own client, while the model keeps serving others.
+    """
+    address = str(tmp_path / "slime.sock")
+    server = PolicyServer({'baseline': BaselinePolicy()}, address).start()
+    try:
+        bad, good = RemotePolicy(address, 'baseline'), RemotePolicy(address, 'baseline')
+        with pytest.raises(ValueError):
+            bad.predict(np.zeros(5))
+        # a client that leaves before its reply is sent must not stop the model either
+        bad.conn.send(('predict', 'baseline', np.zeros(12)))
+        bad.close()
+        obs = np.random.default_rng(0).uniform(-2, 2, size=12)
+        assert np.array_equal(good.predict(obs), BaselinePolicy().predict(obs))
+        good.close()
+        # in a batch with valid requests, only the malformed one gets the error
+        replies = server.workers['baseline']._forward_each([(None, 10, np.zeros(5), 0), (None, 11, obs, 0)], ValueError())
+        assert isinstance(replies[0], ValueError) and np.array_equal(replies[1], BaselinePolicy().predict(obs))
+    finally:
+        server.stop()
@@ -0,0 +1,68 @@
+import numpy as np
+import mlp
+from mlp import Model
+from ppo import ActorCritic, PPO, gae, vtrace, _softplus, _sigmoid
+
+def test_ppo_gradient_matches_finite_differences():
+    """
+    Test that the hand-written PPO gradient matches a numerical gradient of the clipped loss.
+    """
+    rng = np.random.default_rng(0)
+    ac = ActorCritic(layers=(5, 4), np_random=rng)
+    ac.params[:] += rng.normal(size=ac.param_count) * 0.3
+    ppo = PPO(ac, ent_coef=0.05)
+    n = 7
+    obs = rng.normal(size=(n, 12))
+    action = (rng.random((n, 3)) < 0.5) * 1.0
+    logits = ac.logits(obs)
+    old_logp = np.sum(action * logits - _softplus(logits), axis=1) + rng.normal(size=n) * 0.1
+    advantage, returns = rng.normal(size=n), rng.normal(size=n)
+
+    def loss():
+        logits = ac.logits(obs)
+        ratio = np.exp(np.sum(action * logits - _softplus(logits), axis=1) - old_logp)
+        surrogate = np.minimum(ratio * advantage, np.clip(ratio, 0.8, 1.2) * advantage)
+        entropy = np.sum(_softplus(logits) - logits * _sigmoid(logits), axis=1)
+        return -surrogate.mean() - 0.05 * entropy.mean() + 0.5 * np.mean((ac.value(obs) - returns) ** 2)
+
+    grad, _ = ppo.gradient(obs, action, old_logp, advantage, returns)
+    numerical = np.zeros_like(grad)
+    for i in range(len(grad)):
+        ac.params[i] += 1e-6
+        up = loss()
+        ac.params[i] -= 2e-6
+        numerical[i] = (up - loss()) / 2e-6
+        ac.params[i] += 1e-6
+    assert np.allclose(grad, numerical, atol=1e-7)
+
+def test_actor_exports_to_ppo_model_layout():
+    """
+    Test that actor_params plays identically in mlp.Model(mlp.games['ppo']) and that GAE stops at episode ends.
+    """
+    ac = ActorCritic(np_random=np.random.default_rng(1))
+    ac.params[:] += np.random.default_rng(2).normal(size=ac.param_count) * 0.1
+    model = Model(mlp.games['ppo'])
+    model.set_model_params(ac.actor_params())
+    obs = np.random.default_rng(3).normal(size=(16, 12))
+    assert np.allclose(model.predict_batch(obs), ac.logits(obs))
+
+    reward = np.array([[0.0], [1.0], [0.0]])
+    value = np.array([[0.5], [0.5], [0.5]])
+    done = np.array([[0.0], [1.0], [0.0]])
+    advantage, returns = gae(reward, value, done, np.array([2.0]), gamma=1.0, lam=1.0)
+    assert np.allclose(returns[:, 0], [1.0, 1.0, 2.0])
+
+def test_vtrace_on_policy_reduces_to_lambda_one_returns():
+    """
+    Test that V-trace with identical behaviour and target policies gives the lambda=1 GAE returns and advantages.
+    """
+    rng = np.random.default_rng(4)
+    T, n = 20, 5
+    reward, value = rng.normal(size=(T, n)), rng.normal(size=(T, n))
+    done = (rng.random((T, n)) < 0.1) * 1.0
+    logp, bootstrap = rng.normal(size=(T, n)), rng.normal(size=n)
+    vs, advantage = vtrace(logp, logp, reward, value, done, bootstrap, gamma=0.9)
+    gae_advantage, returns = gae(reward, value, done, bootstrap, gamma=0.9, lam=1.0)
+    assert np.allclose(vs, returns)
+    next_vs = np.concatenate([vs[1:], bootstrap[None]])
+    assert np.allclose(advantage, reward + 0.9 * (1 - done) * next_vs - value)
@@ -0,0 +1,44 @@
+import numpy as np
+from policy import BaselinePolicy
+from precision import split_episodes, action_agreement, cast_weight, quantize_int8
+
+def test_split_episodes_pads_every_episode_from_its_start():
+    """
+    Test that episodes are laid side by side from t=0 with a mask, including a final episode without a done.
+    """
+    obs = np.arange(7, dtype=np.float64)[:, None] * np.ones((7, 2))
+    dones = np.array([0, 1, 0, 0, 1, 0, 0], dtype=bool)
+    batch, valid = split_episodes(obs, dones)
+    assert batch.shape == (3, 3, 2)
+    assert valid.tolist() == [[True, True, True], [True, True, True], [False, True, False]]
+    assert batch[:, :, 0].tolist() == [[0, 2, 5], [1, 3, 6], [0, 4, 0]]
+
+def test_action_agreement_of_reduced_precision_baseline():
+    """
+    Test that a policy agrees with itself everywhere, and that float32 / int8 baselines (own recurrent state) mostly agree.
+    """
+    np_random = np.random.default_rng(0)
+    obs = np_random.uniform(-2, 2, size=(300, 12))
+    dones = np.zeros(300, dtype=bool)
+    dones[[99, 199]] = True
+
+    def batched(precision):
+        policy = BaselinePolicy()
+        policy.set_precision(precision)
+        return lambda o: policy.predict_batch(o)[0]
+
+    rate, per_button = action_agreement(batched('float64'), batched('float64'), obs, dones)
+    assert rate == 1.0 and np.all(per_button == 1.0)
+    for precision in ('float32', 'int8'):
+        rate, per_button = action_agreement(batched('float64'), batched(precision), obs, dones)
+        assert 0.9 < rate <= per_button.min()
+
+def test_int8_weights_are_dequantized_once():
+    """
+    Test that the int8 compute weight is a float32 matrix holding the quantized values.
+    """
+    w = np.random.default_rng(1).standard_normal((12, 7))
+    q, scale = quantize_int8(w)
+    compute = cast_weight(w, 'int8')
+    assert compute.dtype == np.float32 and np.array_equal(compute, q.astype(np.float32) * scale)
+    assert np.abs(compute - w).max() <= scale / 2 + 1e-6
@@ -0,0 +1,38 @@
+import numpy as np
+from sequential_eval import SequentialEvaluation
+
+def run(np_random, mean, threshold=0.5, max_trials=500):
+    """ one evaluation on matches scoring mean +- ~1.5 (clipped to the game's -5..5) """
+    test = SequentialEvaluation(threshold, max_trials=max_trials)
+    while not test.done:
+        test.update(np.clip(np.round(np_random.normal(mean, 1.5)), -5, 5))
+    return test
+
+def test_clear_results_stop_early():
+    """
+    Test that a clearly better or worse agent is decided well before max_trials, in the right direction.
+    """
+    np_random = np.random.default_rng(0)
+    above, below = run(np_random, 2.0), run(np_random, -1.0)
+    assert above.decision == 'above' and above.stopped_early and above.n < 100
+    assert below.decision == 'below' and below.stopped_early and below.n < 100
+
+def test_close_results_fall_back_to_the_mean():
+    """
+    Test that an agent right at the threshold uses every trial and is decided by the mean, not significantly.
+    """
+    test = SequentialEvaluation(0.5, max_trials=60)
+    test.extend([0.0, 1.0] * 40)
+    assert test.n == 60 and not test.significant
+    assert test.decision == ('above' if test.mean > 0.5 else 'below')
+    assert test.update(5.0) == test.decision and test.n == 60
+
+def test_false_decisions_are_rare():
+    """
+    Test that early stops in the wrong direction stay below 1 - confidence for an agent slightly above the threshold.
+    """
+    np_random = np.random.default_rng(1)
+    wrong = sum(run(np_random, 0.55, max_trials=300).decision == 'below' for _ in range(200))
+    tests = [run(np_random, 0.5, max_trials=300) for _ in range(200)]
+    assert wrong < 200 * 0.5 # most runs are undecided at 300 trials, decided by the mean
+    assert sum(t.significant for t in tests) <= 200 * 0.05
@@ -0,0 +1,36 @@
+import multiprocessing as mp
+import numpy as np
+from trajectory_ring import TrajectoryRing
+
+SPEC = {'obs': ((4, 2), np.float64), 'step': ((1,), np.int64)}
+
+def produce(name, count):
+    ring = TrajectoryRing(SPEC, slots=3, name=name)
+    for i in range(count):
+        chunk = ring.wait_reserve()
+        chunk['obs'][:] = i
+        chunk['step'][0] = i
+        ring.commit()
+    ring.close()
+
+def test_ring_delivers_chunks_in_order_across_processes():
+    """
+    Test that a producer process streams more chunks than there are slots and the consumer sees each once, in order.
+    """
+    ring = TrajectoryRing(SPEC, slots=3)
+    try:
+        assert ring.peek() is None
+        producer = mp.Process(target=produce, args=(ring.name, 50))
+        producer.start()
+        received = 0
+        while received < 50:
+            chunk = ring.peek()
+            if chunk is None:
+                continue
+            assert chunk['step'][0] == received and np.all(chunk['obs'] == received)
+            ring.release()
+            received += 1
+        producer.join()
+        assert len(ring) == 0
+    finally:
+        ring.close()
@@ -0,0 +1,27 @@
+import numpy as np
+import slimevolley
+
+def test_vector_env_matches_scalar_env():
+    """
+    Test that every row of SlimeVolleyVectorEnv replays a seeded SlimeVolleyEnv exactly.
+    """
+    n, steps = 8, 1500
+    seeds = list(range(10, 10 + n))
+    envs = [slimevolley.SlimeVolleyEnv() for _ in range(n)]
+    for env, seed in zip(envs, seeds):
+        env.seed(seed)
+        env.reset()
+    venv = slimevolley.SlimeVolleyVectorEnv(n)
+    venv.seed(seeds)
+    venv.reset()
+    rng = np.random.default_rng(0)
+    for t in range(steps):
+        action = rng.integers(0, 2, size=(n, 2, 3))
+        obs, reward, terminated, truncated, info = venv.step(action[:, 1], action[:, 0])
+        for i, env in enumerate(envs):
+            o, r, te, tr, inf = env.step(action[i, 1], action[i, 0])
+            assert np.array_equal(o, obs[i]) and np.array_equal(inf['otherObs'], info['otherObs'][i])
+            assert r == reward[i] and te == terminated[i] and tr == truncated[i]
+            if te or tr:
+                env.reset()
+                venv.reset(i)
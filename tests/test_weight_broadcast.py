@@ -0,0 +1,73 @@
+import multiprocessing as mp
+import numpy as np
+import mlp
+import slimevolley
+from mlp import Model
+from weight_broadcast import WeightBroadcast, BroadcastPolicy
+
+def publish_versions(name, size, count):
+    slot = WeightBroadcast(name=name)
+    for v in range(1, count + 1):
+        slot.publish(np.full(size, float(v)), mlp.games['slimevolleylite'])
+    slot.close()
+
+def test_vector_env_opponent_switches_at_reset():
+    """
+    Test that a vector env opponent subscribed by name picks up a published version at the next reset,
+    and that reads racing a publisher in another process only ever see complete versions.
+    """
+    slot = WeightBroadcast(capacity=1 << 16)
+    try:
+        venv = slimevolley.SlimeVolleyVectorEnv(4)
+        venv.policy = BroadcastPolicy(WeightBroadcast(name=slot.name))
+        assert venv.policy.model is None # baseline until something is published
+        config = mlp.games['slimevolleylite']
+        params = np.random.default_rng(0).normal(size=Model(config).param_count).astype(np.float32)
+        slot.publish(params, config)
+        assert venv.policy.version == 0
+        venv.reset()
+        assert venv.policy.version == 1 and np.array_equal(venv.policy.model.get_model_params(), params)
+        venv.step(np.zeros((4, 3)))
+
+        writer = mp.Process(target=publish_versions, args=(slot.name, params.size, 2000))
+        writer.start()
+        try:
+            while True:
+                version, read, _, _ = venv.policy.broadcast.read()
+                assert version == 1 or np.all(read == version - 1)
+                if version == 2001:
+                    break
+        finally:
+            writer.join()
+    finally:
+        slot.close()
+
+def test_vector_env_switches_each_env_at_its_own_reset():
+    """
+    Test that a new version only reaches the envs reset after it was published, the others keep the version they started with.
+    """
+    slot = WeightBroadcast(capacity=1 << 16)
+    try:
+        venv = slimevolley.SlimeVolleyVectorEnv(4)
+        venv.policy = BroadcastPolicy(WeightBroadcast(name=slot.name))
+        config = mlp.games['slimevolleylite']
+        np_random = np.random.default_rng(1)
+        params = [np_random.normal(size=Model(config).param_count).astype(np.float32) for _ in range(2)]
+        slot.publish(params[0], config)
+        venv.reset()
+        venv.step(np.zeros((4, 3)))
+        slot.publish(params[1], config)
+        venv.reset(rows=[0, 2])
+        assert [p.version for p in venv.opponents] == [2, 1, 2, 1]
+        assert np.array_equal(venv.opponents[1].model.get_model_params(), params[0])
+        other_obs = venv.game.observation()[:, 0]
+        expected = []
+        for row in range(4):
+            model = Model(config)
+            model.set_model_params(params[1] if row % 2 == 0 else params[0])
+            expected.append(model.predict(other_obs[row]))
+        assert np.allclose(venv._opponent_action(other_obs), expected)
+        venv.reset(rows=[1, 3])
+        assert all(p is venv.policy.snapshot() for p in venv.opponents)
+    finally:
+        slot.close()
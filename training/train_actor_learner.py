@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+# Asynchronous actor-learner training (IMPALA-style) for slimevolley, without MPI or tensorflow
+#
+# --actors processes each step a SlimeVolleyVectorEnv of --envs envs against the baseline, sampling
+# from their copy of the actor (an mlp.Model of the mlp.games['ppo'] layout). every --unroll steps an
+# actor writes the trajectory chunk into its own shared-memory ring (trajectory_ring.py) and goes on;
+# it only waits when its ring is full, i.e. when the learner is --slots chunks behind.
+#
+# the learner (this process) takes --batch-chunks chunks at a time, corrects for the actors' policy lag
+# with V-trace (ppo.vtrace) and takes one Adam step on the ppo.ActorCritic, then publishes the new actor
+# weights to a weight_broadcast.WeightBroadcast slot; actors pick them up before their next chunk.
+#
+# every --eval-freq updates the deterministic actor plays --eval-episodes matches against the baseline,
+# the best one is saved to LOGDIR/best_model.bin (see Model.makePPOPolicy).
+#
+# run: python training/train_actor_learner.py --actors 8
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import argparse
+import multiprocessing as mp
+import numpy as np
+import slimevolley
+import mlp
+import model_format
+import checkpoint
+from mlp import Model
+from ppo import ActorCritic, PPO, vtrace, _softplus
+from trajectory_ring import TrajectoryRing
+from weight_broadcast import WeightBroadcast, BroadcastPolicy
+from utils import population_rollout
+
+# Settings
+SEED = 721
+LOGDIR = "actor_learner"
+
+def chunk_spec(envs, unroll):
+  return {
+    'obs': ((unroll + 1, envs, 12), np.float64),
+    'action': ((unroll, envs, 3), np.uint8),
+    'logp': ((unroll, envs), np.float64), # behaviour policy log-probabilities
+    'reward': ((unroll, envs), np.float64),
+    'done': ((unroll, envs), np.float64),
+    'version': ((1,), np.int64), # weight version the chunk was played with
+    'episodes': ((2,), np.float64), # episodes finished in the chunk and their total score
+  }
+
+def run_actor(seed, envs, unroll, slots, ring_name, slot_name):
+  """ actor process: plays chunks with the latest published actor until the ring is closed """
+  ring = TrajectoryRing(chunk_spec(envs, unroll), slots, name=ring_name)
+  broadcast = WeightBroadcast(name=slot_name)
+  policy = BroadcastPolicy(broadcast)
+  np_random = np.random.default_rng(seed)
+  venv = slimevolley.SlimeVolleyVectorEnv(envs)
+  venv.seed(seed + np.arange(envs))
+  obs, _ = venv.reset()
+  score = np.zeros(envs)
+  try:
+    while True:
+      chunk = ring.wait_reserve()
+      if chunk is None:
+        break
+      policy.refresh()
+      chunk['version'][0] = policy.version
+      finished, total = 0, 0.0
+      for t in range(unroll):
+        chunk['obs'][t] = obs
+        logits = policy.model.predict_batch(obs)
+        action = np_random.random(logits.shape) < 1.0 / (1.0 + np.exp(-logits))
+        chunk['action'][t] = action
+        chunk['logp'][t] = np.sum(action * logits - _softplus(logits), axis=1)
+        obs, reward, terminated, truncated, info = venv.step(action)
+        done = terminated | truncated
+        chunk['reward'][t], chunk['done'][t] = reward, done
+        score += reward
+        if done.any():
+          rows = np.nonzero(done)[0]
+          finished += len(rows)
+          total += score[rows].sum()
+          score[rows] = 0
+          reset_obs, _ = venv.reset(rows)
+          obs = obs.copy()
+          obs[rows] = reset_obs[rows]
+      chunk['obs'][unroll] = obs
+      chunk['episodes'][:] = finished, total
+      ring.commit()
+  finally:
+    ring.close()
+    broadcast.close()
+
+def evaluate(eval_venv, policy, actor_params):
+  """ mean score of the deterministic actor against the baseline over eval_venv.num_envs matches """
+  policy.set_population(actor_params[None])
+  reward, _ = population_rollout(eval_venv, policy)
+  return reward.mean()
+
+def gather(rings, count, start):
+  """ copies of the next count chunks, taken round robin from the rings starting at start """
+  chunks = []
+  i = start
+  while len(chunks) < count:
+    chunk = rings[i % len(rings)].peek()
+    if chunk is not None:
+      chunks.append({k: v.copy() for k, v in chunk.items()})
+      rings[i % len(rings)].release()
+    elif i % len(rings) == (start - 1) % len(rings):
+      time.sleep(1e-4) # nothing anywhere, give the actors the core
+    i += 1
+  return chunks, i % len(rings)
+
+def train(args):
+  if not os.path.exists(LOGDIR):
+    os.makedirs(LOGDIR)
+
+  np_random = np.random.default_rng(args.seed)
+  ac = ActorCritic(np_random=np_random)
+  ppo = PPO(ac, learning_rate=args.lr, ent_coef=args.ent_coef)
+  game_config = mlp.games['ppo']
+  update, timesteps, best_score = 0, 0, -np.inf
+  filename = checkpoint.resume_file(LOGDIR, args.resume) if args.resume is not None else None
+  if filename is not None:
+    arrays, meta = checkpoint.load(filename)
+    ppo.set_state(arrays, meta)
+    update, timesteps, best_score = meta['update'], meta['timesteps'], meta['best_score']
+    checkpoint.set_rng_state(meta['np_random'], np_random)
+    print("resuming from", filename, "at update", update)
+
+  broadcast = WeightBroadcast()
+  broadcast.publish(ac.actor_params(), game_config)
+  spec = chunk_spec(args.envs, args.unroll)
+  rings = [TrajectoryRing(spec, args.slots) for _ in range(args.actors)]
+  actors = [mp.Process(target=run_actor, daemon=True,
+    args=(int(np.random.SeedSequence([args.seed, update, i]).generate_state(1)[0]), args.envs, args.unroll, args.slots, rings[i].name, broadcast.name))
+    for i in range(args.actors)]
+  for actor in actors:
+    actor.start()
+
+  eval_venv = slimevolley.SlimeVolleyVectorEnv(args.eval_episodes)
+  eval_venv.seed(args.seed + np.arange(args.eval_episodes))
+  eval_policy = Model(game_config)
+  writer = checkpoint.CheckpointWriter(keep=3)
+  start_time = time.time()
+  start_timesteps = timesteps
+  next_ring = 0
+  lag, finished, total = [], 0, 0.0
+  try:
+    while timesteps < args.timesteps:
+      chunks, next_ring = gather(rings, args.batch_chunks, next_ring)
+      # chunks side by side on the env axis: (T+1, B*envs, 12) etc.
+      obs, action, behaviour_logp, reward, done = [np.concatenate([c[k] for c in chunks], axis=1)
+        for k in ['obs', 'action', 'logp', 'reward', 'done']]
+      action = action.astype(np.float64)
+      T, n = reward.shape
+      logits = ac.logits(obs[:T].reshape(T * n, -1))
+      target_logp = np.sum(action.reshape(T * n, -1) * logits - _softplus(logits), axis=1).reshape(T, n)
+      value = ac.value(obs.reshape((T + 1) * n, -1)).reshape(T + 1, n)
+      vs, advantage = vtrace(behaviour_logp, target_logp, reward, value[:T], done, value[T],
+        args.gamma, args.rho_bar, args.c_bar)
+      # with old_logp = target_logp the clipped objective is the plain policy gradient of the advantage
+      grad, stats = ppo.gradient(obs[:T].reshape(T * n, -1), action.reshape(T * n, -1), target_logp.ravel(),
+        advantage.ravel(), vs.ravel())
+      ppo.step(grad, args.lr * max(1.0 - timesteps / args.timesteps, 0.0))
+      broadcast.publish(ac.actor_params(), game_config)
+      update += 1
+      timesteps += T * n
+      lag.extend(broadcast.version - 1 - c['version'][0] for c in chunks)
+      finished += sum(c['episodes'][0] for c in chunks)
+      total += sum(c['episodes'][1] for c in chunks)
+
+      if update % args.log_freq == 0:
+        print("update:", update, "timesteps:", timesteps,
+              "mean_score:", np.round(total / finished, 3) if finished else None,
+              "episodes:", int(finished),
+              "entropy:", np.round(stats['entropy'], 3),
+              "value_loss:", np.round(stats['value_loss'], 4),
+              "policy_lag:", np.round(np.mean(lag), 1),
+              "steps/sec:", int((timesteps - start_timesteps) / (time.time() - start_time)),
+             )
+        lag, finished, total = [], 0, 0.0
+
+      if update % args.eval_freq == 0:
+        actor = ac.actor_params()
+        score = evaluate(eval_venv, eval_policy, actor)
+        print("eval vs baseline:", np.round(score, 3), "best:", np.round(best_score, 3))
+        if score > best_score:
+          best_score = score
+          writer.submit_call(model_format.save, os.path.join(LOGDIR, "best_model"+model_format.EXTENSION),
+            actor, game_config, {'timesteps': timesteps, 'score': float(score)})
+
+      if update % args.checkpoint_freq == 0:
+        arrays, meta = ppo.get_state()
+        meta.update({'update': update, 'timesteps': timesteps, 'best_score': float(best_score),
+                     'np_random': checkpoint.rng_state(np_random)})
+        writer.submit(os.path.join(LOGDIR, "ckpt_"+str(update).zfill(8)+".npz"), arrays, meta)
+    model_format.save(os.path.join(LOGDIR, "final_model"+model_format.EXTENSION), ac.actor_params(), game_config)
+  finally:
+    for ring in rings:
+      ring.close_producers()
+    for actor in actors:
+      actor.join(timeout=10)
+      if actor.is_alive():
+        actor.terminate()
+    writer.close()
+    for ring in rings:
+      ring.close()
+    broadcast.close()
+
+if __name__=="__main__":
+
+  parser = argparse.ArgumentParser(description='Asynchronous actor-learner with V-trace.')
+  parser.add_argument('--actors', help='actor processes', type=int, default=max(1, mp.cpu_count() - 1))
+  parser.add_argument('--envs', help='envs per actor (one vectorized env)', type=int, default=16)
+  parser.add_argument('--unroll', help='steps per trajectory chunk', type=int, default=32)
+  parser.add_argument('--slots', help='chunks an actor may run ahead of the learner', type=int, default=4)
+  parser.add_argument('--batch-chunks', help='chunks per learner update', type=int, default=1)
+  parser.add_argument('--seed', help='random seed (integer)', type=int, default=SEED)
+  parser.add_argument('--timesteps', help='total timesteps', type=float, default=2e7)
+  parser.add_argument('--lr', help='Adam step size (linearly annealed to 0)', type=float, default=1e-3)
+  parser.add_argument('--ent-coef', help='entropy bonus', type=float, default=0.0)
+  parser.add_argument('--gamma', help='discount', type=float, default=0.99)
+  parser.add_argument('--rho-bar', help='V-trace importance weight clip', type=float, default=1.0)
+  parser.add_argument('--c-bar', help='V-trace trace cutting clip', type=float, default=1.0)
+  parser.add_argument('--log-freq', help='updates between log lines', type=int, default=100)
+  parser.add_argument('--eval-freq', help='updates between evaluations', type=int, default=1000)
+  parser.add_argument('--eval-episodes', help='evaluation matches (played in one batch)', type=int, default=128)
+  parser.add_argument('--checkpoint-freq', help='updates between checkpoints', type=int, default=1000)
+  parser.add_argument('--resume', help='continue from a checkpoint (leave the value out for the latest in LOGDIR)', nargs='?', const='latest', default=None)
+
+  args = parser.parse_args()
+
+  train(args)
@@ -0,0 +1,94 @@
+# Trains the estool-style CMA-ES agent (mlp.games['slimevolley'], 20x20 tanh) in this repo
+#
+# every generation plays popsize x episodes matches in one lockstep batch on SlimeVolleyVectorEnv
+# (utils.population_rollout): all candidates are forwarded with one population-tensor pass per step,
+# against the batched BaselinePolicy (default) or a fixed opponent model (--opponent, e.g. a previous
+# best for self-play). all candidates of a generation play the same seeds. fitness is the mean score plus
+# --survival-bonus per timestep survived (as SurvivalRewardEnv), which breaks ties while every candidate still loses 0-5.
+#
+# the CMA-ES state (cmaes.py) and RNG are checkpointed to logdir/ckpt_*.npz in the background, see
+# checkpoint.py; --resume [file] continues from one.
+#
+# run: python training/train_cmaes.py --popsize 64 --episodes 8
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import argparse
+import numpy as np
+import slimevolley
+import mlp
+import model_format
+import checkpoint
+from mlp import Model
+from cmaes import CMAES
+from utils import population_rollout
+
+# Settings
+random_seed = 721
+logdir = "cmaes"
+
+def evaluate(venv, policy, solutions, episodes, generation, opponent=None, survival_bonus=0.0):
+  """ mean fitness of every candidate over the same episodes seeds, one batched rollout """
+  policy.set_population(solutions)
+  seeds = np.tile(random_seed + generation * episodes + np.arange(episodes), len(solutions))
+  reward, length = population_rollout(venv, policy, opponent, seeds)
+  fitness = reward + survival_bonus * length
+  return fitness.reshape(len(solutions), episodes).mean(axis=1), reward, length
+
+if __name__=="__main__":
+
+  parser = argparse.ArgumentParser(description='CMA-ES on the batched simulator.')
+  parser.add_argument('--game', help='mlp.games entry (slimevolley, slimevolleylite)', type=str, default="slimevolley")
+  parser.add_argument('--popsize', help='candidates per generation', type=int, default=64)
+  parser.add_argument('--episodes', help='episodes per candidate', type=int, default=8)
+  parser.add_argument('--sigma', help='initial step size', type=float, default=0.5)
+  parser.add_argument('--generations', help='number of generations', type=int, default=2000)
+  parser.add_argument('--survival-bonus', help='fitness bonus per timestep survived', type=float, default=0.01)
+  parser.add_argument('--opponent', help='model file of a fixed opponent (leave blank for the baseline)', type=str, default="")
+  parser.add_argument('--checkpoint-freq', help='generations between checkpoints', type=int, default=10)
+  parser.add_argument('--resume', help='continue from a checkpoint (leave the value out for the latest in logdir)', nargs='?', const='latest', default=None)
+
+  args = parser.parse_args()
+
+  if not os.path.exists(logdir):
+    os.makedirs(logdir)
+
+  game_config = mlp.games[args.game]
+  policy = Model(game_config)
+  print("Number of parameters of the neural net policy:", policy.param_count)
+  opponent = Model.from_file(args.opponent) if len(args.opponent) > 0 else None
+
+  es = CMAES(np.zeros(policy.param_count), sigma=args.sigma, popsize=args.popsize,
+    np_random=np.random.default_rng(random_seed))
+  filename = checkpoint.resume_file(logdir, args.resume) if args.resume is not None else None
+  if filename is not None:
+    es.set_state(*checkpoint.load(filename))
+    print("resuming from", filename, "at generation", es.generation)
+
+  venv = slimevolley.SlimeVolleyVectorEnv(args.popsize * args.episodes)
+  writer = checkpoint.CheckpointWriter(keep=3)
+  while es.generation < args.generations:
+    start_time = time.time()
+    solutions = es.ask()
+    fitness, reward, length = evaluate(venv, policy, solutions, args.episodes, es.generation, opponent, args.survival_bonus)
+    es.tell(solutions, fitness)
+
+    print("generation:", es.generation,
+          "mean_fitness:", np.round(fitness.mean(), 3),
+          "best_fitness:", np.round(fitness.max(), 3),
+          "mean_score:", np.round(reward.mean(), 3),
+          "sigma:", np.round(es.sigma, 4),
+          "mean_duration:", np.round(length.mean(), 1),
+          "steps/sec:", int(length.sum() / (time.time() - start_time)),
+         )
+
+    # the distribution mean is the agent we keep (as estool's "best" file did)
+    writer.submit_call(model_format.save, os.path.join(logdir, "slimevolley.cma.best"+model_format.EXTENSION),
+      es.mean.copy(), game_config, {'generation': es.generation, 'fitness': float(fitness.mean()), 'score': float(reward.mean())})
+    if es.generation % args.checkpoint_freq == 0:
+      arrays, meta = es.get_state()
+      writer.submit(os.path.join(logdir, "ckpt_"+str(es.generation).zfill(8)+".npz"), arrays, meta)
+  writer.close()
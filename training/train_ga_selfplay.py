@@ -1,19 +1,32 @@
 # Trains an agent from scratch (no existing AI) using evolution
 # GA with no cross-over, just mutation, and random tournament selection
 # Not optimized for speed, and just uses a single CPU (mainly for simplicity)
+#
+# --batch B plays B tournaments at once in lockstep on the vectorized simulator (SlimeVolleyVectorEnv),
+# forwarding all 2B agents with one population-tensor pass per step. Pairs in flight never share an
+# agent; when a match finishes its result is applied right away and its slot starts a new tournament.
+# --benchmark N times N tournaments of the sequential loop against N batched ones, and exits.
+#
+# every --checkpoint-freq tournaments the full state (population, winning streaks, tournament counter,
+# np.random and env RNG states) is written to logdir/ckpt_*.npz by a background thread (see checkpoint.py),
+# and --resume [file] continues from it. the sequential loop resumes bit-exactly; in --batch mode the
+# matches that were in flight at checkpoint time are not saved, the resumed run starts fresh ones
+# (on simulators seeded from the tournament it resumes at, not a replay of the first start).
 
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import os
-import json
+import time
+import argparse
 import numpy as np
-import gym
 import slimevolley
 import mlp
+import model_format
+import checkpoint
 from mlp import Model
-from slimevolley import multiagent_rollout as rollout
+from utils import multiagent_rollout as rollout
 
 # Settings
 random_seed = 612
@@ -29,6 +42,14 @@ def mutate(length, mutation_rate, mutation_sigma):
   noise = np.random.normal(size=length) * mutation_sigma
   return mask * noise
 
+parser = argparse.ArgumentParser(description='GA self-play with random tournament selection.')
+parser.add_argument('--batch', help='tournaments played at once in lockstep (0: one at a time)', type=int, default=0)
+parser.add_argument('--benchmark', help='time this many sequential vs batched tournaments, then exit', type=int, default=0)
+parser.add_argument('--tournaments', help='total number of tournaments', type=int, default=total_tournaments)
+parser.add_argument('--checkpoint-freq', help='tournaments between full-state checkpoints', type=int, default=10000)
+parser.add_argument('--resume', help='continue from a checkpoint (leave the value out for the latest in logdir)', nargs='?', const='latest', default=None)
+args = parser.parse_args()
+
 # Log results
 logdir = "ga_selfplay"
 if not os.path.exists(logdir):
@@ -41,27 +62,17 @@ policy_right = Model(mlp.games['slimevolleylite'])
 param_count = policy_left.param_count
 print("Number of parameters of the neural net policy:", param_count) # 273 for slimevolleylite
 
-# store our population here
-population = np.random.normal(size=(population_size, param_count)) * 0.5 # each row is an agent.
-winning_streak = [0] * population_size # store the number of wins for this agent (including mutated ones)
-
-# create the gym environment, and seed it
+# create the gym environment, and seed it (before the population is drawn, so runs are reproducible)
 env = slimevolley.SlimeVolleyEnv()
 env.seed(random_seed)
 np.random.seed(random_seed)
 
-history = []
-for tournament in range(1, total_tournaments+1):
-
-  m, n = np.random.choice(population_size, 2, replace=False)
-
-  policy_left.set_model_params(population[m])
-  policy_right.set_model_params(population[n])
-
-  # the match between the mth and nth member of the population
-  score, length = rollout(env, policy_right, policy_left)
+# store our population here
+population = np.random.normal(size=(population_size, param_count)) * 0.5 # each row is an agent.
+winning_streak = [0] * population_size # store the number of wins for this agent (including mutated ones)
 
-  history.append(length)
+def update(m, n, score):
+  """ mutation rule for a finished match between the mth (left) and nth (right) agent """
   # if score is positive, it means policy_right won.
   if score == 0: # if the game is tied, add noise to the left agent.
     population[m] += np.random.normal(size=param_count) * 0.1
@@ -74,19 +85,130 @@ for tournament in range(1, total_tournaments+1):
     winning_streak[n] = winning_streak[m]
     winning_streak[m] += 1
 
-  if tournament % save_freq == 0:
-    model_filename = os.path.join(logdir, "ga_"+str(tournament).zfill(8)+".json")
-    with open(model_filename, 'wt') as out:
+def play_sequential(tournaments):
+  """ one match at a time, yields (m, n, score, length) """
+  for _ in range(tournaments):
+    m, n = np.random.choice(population_size, 2, replace=False)
+
+    policy_left.set_model_params(population[m])
+    policy_right.set_model_params(population[n])
+
+    # the match between the mth and nth member of the population
+    score, length = rollout(env, policy_right, policy_left)
+    yield m, n, score, length
+
+def play_batched(tournaments, batch_size, first_tournament=1):
+  """ batch_size matches at a time in lockstep, yields (m, n, score, length) as matches finish """
+  assert 2 * batch_size <= population_size, "pairs in flight must not share agents"
+  venv = slimevolley.SlimeVolleyVectorEnv(batch_size)
+  venv.seed(np.random.SeedSequence([random_seed, first_tournament]).generate_state(batch_size))
+  policy = Model(mlp.games['slimevolleylite'])
+  params = np.zeros((2 * batch_size, param_count)) # rows [0, B): right agents, [B, 2B): left agents
+  policy.set_population(params) # views into params, refreshed in place below
+  pair = np.zeros((batch_size, 2), dtype=np.int64) # (m, n) of every slot
+  score = np.zeros(batch_size)
+  length = np.zeros(batch_size, dtype=np.int64)
+  obs = np.zeros((2 * batch_size, 12))
+
+  def start(slot):
+    free = np.setdiff1d(np.arange(population_size), pair[np.arange(batch_size) != slot])
+    m, n = np.random.choice(free, 2, replace=False)
+    pair[slot] = m, n
+    params[slot] = population[n]
+    params[batch_size + slot] = population[m]
+    obs_right, _ = venv.reset(slot)
+    obs[slot] = obs_right[slot]
+    obs[batch_size + slot] = obs_right[slot] # same observation at the very beginning for the other agent
+    score[slot] = 0
+    length[slot] = 0
+
+  pair[:] = -1 # empty slot
+  started = 0
+  for slot in range(min(batch_size, tournaments)):
+    start(slot)
+    started += 1
+  active = np.arange(batch_size) < started
+  finished = 0
+  while finished < tournaments:
+    action = policy.predict_population(obs)
+    obs_right, reward, terminated, truncated, info = venv.step(action[:batch_size], action[batch_size:])
+    obs[:batch_size] = obs_right
+    obs[batch_size:] = info['otherObs']
+    score += reward * active
+    length += active
+    for slot in np.nonzero((terminated | truncated) & active)[0]:
+      m, n = pair[slot]
+      yield m, n, score[slot], length[slot]
+      finished += 1
+      if started < tournaments:
+        start(slot)
+        started += 1
+      else:
+        active[slot] = False
+        pair[slot] = -1
+
+def save_checkpoint(writer, tournament, history):
+  filename = os.path.join(logdir, "ckpt_"+str(tournament).zfill(8)+".npz")
+  writer.submit(filename, {'population': population, 'winning_streak': np.array(winning_streak), 'history': np.array(history)},
+    {'tournament': tournament, 'np_random': checkpoint.rng_state(), 'env_random': checkpoint.rng_state(env.np_random)})
+
+def load_checkpoint(filename):
+  """ restores the state saved by save_checkpoint, returns (tournament, history) """
+  global winning_streak
+  arrays, meta = checkpoint.load(filename)
+  population[:] = arrays['population']
+  winning_streak = [int(w) for w in arrays['winning_streak']]
+  checkpoint.set_rng_state(meta['np_random'])
+  checkpoint.set_rng_state(meta['env_random'], env.np_random)
+  print("resuming from", filename, "at tournament", meta['tournament'])
+  return meta['tournament'], [int(h) for h in arrays['history']]
+
+def train(matches, first_tournament=1, history=None):
+  history = [] if history is None else history
+  writer = checkpoint.CheckpointWriter(keep=3)
+  start_time = time.time()
+  for tournament, (m, n, score, length) in enumerate(matches, first_tournament):
+    history.append(length)
+    update(m, n, score)
+
+    if tournament % save_freq == 0:
+      model_filename = os.path.join(logdir, "ga_"+str(tournament).zfill(8)+model_format.EXTENSION)
+      record_holder = np.argmax(winning_streak)
+      record = winning_streak[record_holder]
+      writer.submit_call(model_format.save, model_filename, population[record_holder].copy(), policy_left.game_config, {'record': int(record)})
+
+    if (tournament ) % 100 == 0:
       record_holder = np.argmax(winning_streak)
       record = winning_streak[record_holder]
-      json.dump([population[record_holder].tolist(), record], out, sort_keys=True, indent=0, separators=(',', ': '))
-
-  if (tournament ) % 100 == 0:
-    record_holder = np.argmax(winning_streak)
-    record = winning_streak[record_holder]
-    print("tournament:", tournament,
-          "best_winning_streak:", record,
-          "mean_duration", np.mean(history),
-          "stdev:", np.std(history),
-         )
-    history = []
\ No newline at end of file
+      print("tournament:", tournament,
+            "best_winning_streak:", record,
+            "mean_duration", np.mean(history),
+            "stdev:", np.std(history),
+            "tournaments/sec:", np.round((tournament - first_tournament + 1) / (time.time() - start_time), 2),
+           )
+      history = []
+
+    if tournament % args.checkpoint_freq == 0:
+      save_checkpoint(writer, tournament, history)
+  writer.close()
+
+if args.benchmark > 0:
+  rates = {}
+  for name, matches in [("sequential", play_sequential(args.benchmark)),
+                        ("batched x"+str(max(args.batch, 1)), play_batched(args.benchmark, max(args.batch, 1)))]:
+    start_time = time.time()
+    for m, n, score, length in matches:
+      update(m, n, score)
+    rates[name] = args.benchmark / (time.time() - start_time)
+    print(name, "tournaments/sec:", np.round(rates[name], 2))
+  sequential_rate, batched_rate = rates.values()
+  print("speedup:", np.round(batched_rate / sequential_rate, 2))
+else:
+  done, history = 0, []
+  filename = checkpoint.resume_file(logdir, args.resume) if args.resume is not None else None
+  if filename is not None:
+    done, history = load_checkpoint(filename)
+  if args.batch > 0:
+    train(play_batched(args.tournaments - done, args.batch, done + 1), done + 1, history)
+  else:
+    train(play_sequential(args.tournaments - done), done + 1, history)
@@ -0,0 +1,171 @@
+# Multiprocess version of train_ga_selfplay.py (same GA: no cross-over, mutation, random tournament selection)
+#
+# The population and winning streaks live in shared memory. Worker processes read the two
+# agents of a tournament straight from it and play the match, the main process applies the
+# mutation rule as each result returns (it is the only writer).
+#
+# Tournaments are sampled in the same sequence as the single CPU script and only tournaments
+# whose agents are not in flight are dispatched, and never ahead of an earlier tournament that
+# involves one of the same agents. Every tournament has its own seed for the match and the
+# mutation noise, so a run gives the same population as playing those tournaments one by one,
+# for any number of workers.
+#
+# run: python training/train_ga_selfplay_parallel.py --workers 64
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import queue
+import argparse
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import slimevolley
+import mlp
+import model_format
+from mlp import Model
+from utils import multiagent_rollout as rollout
+
+# Settings
+random_seed = 612
+population_size = 128
+total_tournaments = 500000
+save_freq = 1000
+mutation_sigma = 0.1
+
+logdir = "ga_selfplay"
+
+def tournament_seed(seed, tournament):
+  """ seed for the match and mutation of one tournament, independent of which worker plays it """
+  return int(np.random.SeedSequence([seed, tournament]).generate_state(1)[0])
+
+def attach(name, shape, dtype):
+  shm = shared_memory.SharedMemory(name=name)
+  return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+# worker process state
+_worker = {}
+
+def init_worker(population_name, shape):
+  shm, population = attach(population_name, shape, np.float64)
+  _worker['shm'] = shm # keep the mapping alive
+  _worker['population'] = population
+  _worker['env'] = slimevolley.SlimeVolleyEnv()
+  _worker['left'] = Model(mlp.games['slimevolleylite'])
+  _worker['right'] = Model(mlp.games['slimevolleylite'])
+
+def play(tournament, m, n, seed):
+  """ the match between the mth (left) and nth (right) member of the population """
+  env, policy_left, policy_right = _worker['env'], _worker['left'], _worker['right']
+  policy_left.set_model_params(_worker['population'][m])
+  policy_right.set_model_params(_worker['population'][n])
+  env.seed(seed)
+  score, length = rollout(env, policy_right, policy_left)
+  return tournament, m, n, score, length
+
+def apply_result(population, winning_streak, m, n, score, seed):
+  """ the mutation rule of train_ga_selfplay.py, noise drawn from the tournament's own seed """
+  noise = np.random.default_rng(seed).normal(size=population.shape[1]) * mutation_sigma
+  # if score is positive, it means policy_right won.
+  if score == 0: # if the game is tied, add noise to the left agent.
+    population[m] += noise
+  if score > 0:
+    population[m] = population[n] + noise
+    winning_streak[m] = winning_streak[n]
+    winning_streak[n] += 1
+  if score < 0:
+    population[n] = population[m] + noise
+    winning_streak[n] = winning_streak[m]
+    winning_streak[m] += 1
+
+def train(workers, seed, tournaments):
+  if not os.path.exists(logdir):
+    os.makedirs(logdir)
+
+  game_config = mlp.games['slimevolleylite']
+  param_count = Model(game_config).param_count
+  print("Number of parameters of the neural net policy:", param_count) # 273 for slimevolleylite
+
+  np.random.seed(seed)
+  shape = (population_size, param_count)
+  population_shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+  streak_shm = shared_memory.SharedMemory(create=True, size=population_size * 8)
+  population = np.ndarray(shape, dtype=np.float64, buffer=population_shm.buf)
+  winning_streak = np.ndarray(population_size, dtype=np.int64, buffer=streak_shm.buf)
+  population[:] = np.random.normal(size=shape) * 0.5 # each row is an agent.
+  winning_streak[:] = 0
+
+  results = queue.Queue()
+  pending = [] # sampled, not yet dispatched: (tournament, m, n)
+  busy = set() # agents of the tournaments in flight
+  sampled = 0
+  applied = 0
+  history = []
+  start = time.time()
+  pool = mp.Pool(workers, initializer=init_worker, initargs=(population_shm.name, shape))
+  try:
+    while applied < tournaments:
+      # sample ahead, in the same order as the sequential trainer
+      while sampled < tournaments and len(pending) < 4 * workers:
+        sampled += 1
+        m, n = np.random.choice(population_size, 2, replace=False)
+        pending.append((sampled, m, n))
+      # dispatch every tournament whose agents are free, without overtaking an earlier one that shares an agent
+      blocked = set()
+      remaining = []
+      for tournament, m, n in pending:
+        if len(busy) < 4 * workers and not ({m, n} & (busy | blocked)):
+          busy.update((m, n))
+          pool.apply_async(play, (tournament, m, n, tournament_seed(seed, tournament)),
+            callback=results.put, error_callback=results.put)
+        else:
+          blocked.update((m, n))
+          remaining.append((tournament, m, n))
+      pending = remaining
+
+      result = results.get()
+      if isinstance(result, BaseException):
+        raise result
+      tournament, m, n, score, length = result
+      apply_result(population, winning_streak, m, n, score, tournament_seed(seed, tournament))
+      busy.difference_update((m, n))
+      applied += 1
+      history.append(length)
+
+      if applied % save_freq == 0:
+        model_filename = os.path.join(logdir, "ga_"+str(applied).zfill(8)+model_format.EXTENSION)
+        record_holder = np.argmax(winning_streak)
+        record = winning_streak[record_holder]
+        model_format.save(model_filename, population[record_holder], game_config, extra={'record': int(record)})
+
+      if applied % 100 == 0:
+        record_holder = np.argmax(winning_streak)
+        record = winning_streak[record_holder]
+        print("tournament:", applied,
+              "best_winning_streak:", record,
+              "mean_duration", np.mean(history),
+              "stdev:", np.std(history),
+              "tournaments/hour:", int(applied / (time.time() - start) * 3600),
+             )
+        history = []
+    return population.copy(), winning_streak.copy()
+  finally:
+    pool.terminate()
+    pool.join()
+    del population, winning_streak
+    for shm in (population_shm, streak_shm):
+      shm.close()
+      shm.unlink()
+
+if __name__=="__main__":
+
+  parser = argparse.ArgumentParser(description='GA self-play with a process pool.')
+  parser.add_argument('--workers', help='number of worker processes', type=int, default=mp.cpu_count())
+  parser.add_argument('--seed', help='random seed (integer)', type=int, default=random_seed)
+  parser.add_argument('--tournaments', help='number of tournaments', type=int, default=total_tournaments)
+
+  args = parser.parse_args()
+
+  train(args.workers, args.seed, args.tournaments)
@@ -0,0 +1,158 @@
+# Trains an agent (mlp.games['slimevolley'] by default) against the baseline with OpenAI-ES on a process pool
+#
+# the Gaussian noise table (es.NoiseTable) and the current parameters theta live in shared memory.
+# every generation the main process writes theta once, then sends each worker a chunk of noise
+# indices; a worker evaluates theta +/- sigma * noise[index:index+n] for its chunk and returns
+# only the (chunk, 2) fitnesses, so a generation costs O(popsize) scalars of communication.
+# fitness is the mean score over --episodes matches (same seeds for every candidate of a
+# generation) plus --survival-bonus per timestep, as in train_cmaes.py.
+#
+# without --batch a worker plays its matches one by one with utils.multiagent_rollout; with --batch
+# it plays all of them in one lockstep SlimeVolleyVectorEnv rollout (utils.population_rollout).
+#
+# run: python training/train_openes.py --workers 8 --popsize 256 --batch
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import argparse
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import slimevolley
+import mlp
+import model_format
+import checkpoint
+from mlp import Model
+from es import NoiseTable, OpenES
+from policy import BaselinePolicy
+from utils import multiagent_rollout, population_rollout
+
+# Settings
+random_seed = 831
+noise_size = 2**25 # 128MB of float32 noise
+logdir = "openes"
+
+def generation_seeds(seed, generation, episodes):
+  """ episode seeds shared by every candidate of a generation """
+  return np.random.SeedSequence([seed, generation]).generate_state(episodes).astype(np.int64)
+
+# worker process state
+_worker = {}
+
+def init_worker(game, noise_name, theta_name, survival_bonus):
+  policy = Model(mlp.games[game])
+  noise = NoiseTable(noise_size, name=noise_name)
+  theta_shm = shared_memory.SharedMemory(name=theta_name)
+  _worker['noise'] = noise
+  _worker['theta_shm'] = theta_shm # keep the mapping alive
+  _worker['theta'] = np.ndarray(policy.param_count, dtype=np.float64, buffer=theta_shm.buf)
+  _worker['policy'] = policy
+  _worker['env'] = slimevolley.SlimeVolleyEnv()
+  _worker['baseline'] = BaselinePolicy()
+  _worker['venvs'] = {} # num_envs -> SlimeVolleyVectorEnv
+  _worker['survival_bonus'] = survival_bonus
+
+def perturbations(indices, sigma):
+  """ (2k, n) parameters: rows 2i and 2i+1 are theta + and - sigma * noise[indices[i]] """
+  theta, n = _worker['theta'], len(_worker['theta'])
+  epsilon = _worker['noise'].noise[np.asarray(indices)[:, None] + np.arange(n)]
+  return (theta[None, None, :] + np.array([1.0, -1.0])[None, :, None] * sigma * epsilon[:, None, :]).reshape(-1, n)
+
+def evaluate(indices, sigma, seeds, batch):
+  """ (len(indices), 2) fitness of the antithetic pairs of indices """
+  solutions = perturbations(indices, sigma)
+  policy, bonus = _worker['policy'], _worker['survival_bonus']
+  if batch:
+    num_envs = len(solutions) * len(seeds)
+    if num_envs not in _worker['venvs']:
+      _worker['venvs'][num_envs] = slimevolley.SlimeVolleyVectorEnv(num_envs)
+    policy.set_population(solutions)
+    reward, length = population_rollout(_worker['venvs'][num_envs], policy, None, np.tile(seeds, len(solutions)))
+    fitness = (reward + bonus * length).reshape(len(solutions), len(seeds)).mean(axis=1)
+  else:
+    env, baseline = _worker['env'], _worker['baseline']
+    fitness = np.zeros(len(solutions))
+    for i, params in enumerate(solutions):
+      policy.set_model_params(params)
+      for seed in seeds:
+        env.seed(int(seed))
+        baseline.reset()
+        reward, length = multiagent_rollout(env, policy, baseline)
+        fitness[i] += (reward + bonus * length) / len(seeds)
+  return fitness.reshape(-1, 2)
+
+def train(args):
+  if not os.path.exists(logdir):
+    os.makedirs(logdir)
+
+  game_config = mlp.games[args.game]
+  param_count = Model(game_config).param_count
+  print("Number of parameters of the neural net policy:", param_count)
+
+  noise = NoiseTable(noise_size, seed=args.seed)
+  theta_shm = shared_memory.SharedMemory(create=True, size=param_count * 8)
+  theta = np.ndarray(param_count, dtype=np.float64, buffer=theta_shm.buf)
+  es = OpenES(np.zeros(param_count), noise, sigma=args.sigma, popsize=args.popsize,
+    learning_rate=args.learning_rate, np_random=np.random.default_rng(args.seed))
+  filename = checkpoint.resume_file(logdir, args.resume) if args.resume is not None else None
+  if filename is not None:
+    es.set_state(*checkpoint.load(filename))
+    print("resuming from", filename, "at generation", es.generation)
+
+  writer = checkpoint.CheckpointWriter(keep=3)
+  pool = mp.Pool(args.workers, initializer=init_worker,
+    initargs=(args.game, noise.name, theta_shm.name, args.survival_bonus))
+  try:
+    while es.generation < args.generations:
+      start_time = time.time()
+      theta[:] = es.theta # the only O(n) transfer, read by every worker through shared memory
+      indices = es.ask()
+      seeds = generation_seeds(args.seed, es.generation, args.episodes)
+      chunks = np.array_split(indices, args.workers)
+      results = pool.starmap(evaluate, [(chunk, es.sigma, seeds, args.batch) for chunk in chunks if len(chunk) > 0])
+      fitness = np.concatenate(results)
+      es.tell(indices, fitness)
+
+      print("generation:", es.generation,
+            "mean_fitness:", np.round(fitness.mean(), 3),
+            "best_fitness:", np.round(fitness.max(), 3),
+            "evaluations/sec:", int(fitness.size * args.episodes / (time.time() - start_time)),
+           )
+
+      writer.submit_call(model_format.save, os.path.join(logdir, "slimevolley.openes.best"+model_format.EXTENSION),
+        es.theta.copy(), game_config, {'generation': es.generation, 'fitness': float(fitness.mean())})
+      if es.generation % args.checkpoint_freq == 0:
+        arrays, meta = es.get_state()
+        writer.submit(os.path.join(logdir, "ckpt_"+str(es.generation).zfill(8)+".npz"), arrays, meta)
+    return es.theta.copy()
+  finally:
+    pool.terminate()
+    pool.join()
+    writer.close()
+    del theta
+    theta_shm.close()
+    theta_shm.unlink()
+    noise.close()
+
+if __name__=="__main__":
+
+  parser = argparse.ArgumentParser(description='OpenAI-ES with a shared noise table.')
+  parser.add_argument('--game', help='mlp.games entry (slimevolley, slimevolleylite)', type=str, default="slimevolley")
+  parser.add_argument('--workers', help='number of worker processes', type=int, default=mp.cpu_count())
+  parser.add_argument('--seed', help='random seed (integer)', type=int, default=random_seed)
+  parser.add_argument('--popsize', help='candidates per generation (even, antithetic pairs)', type=int, default=256)
+  parser.add_argument('--episodes', help='episodes per candidate', type=int, default=4)
+  parser.add_argument('--sigma', help='noise standard deviation', type=float, default=0.1)
+  parser.add_argument('--learning-rate', help='Adam step size', type=float, default=0.01)
+  parser.add_argument('--generations', help='number of generations', type=int, default=2000)
+  parser.add_argument('--survival-bonus', help='fitness bonus per timestep survived', type=float, default=0.01)
+  parser.add_argument('--batch', help='play each worker\'s matches on one vectorized simulator', action='store_true')
+  parser.add_argument('--checkpoint-freq', help='generations between checkpoints', type=int, default=10)
+  parser.add_argument('--resume', help='continue from a checkpoint (leave the value out for the latest in logdir)', nargs='?', const='latest', default=None)
+
+  args = parser.parse_args()
+
+  train(args)
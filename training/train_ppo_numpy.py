@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+# Train PPO on slimevolley with the numpy implementation in ppo.py (no tensorflow / stable_baselines / MPI)
+#
+# rollouts are collected from one SlimeVolleyVectorEnv: every step is one batched forward pass of the
+# actor and critic for all --envs envs, finished envs are reset in place. the update is the usual clipped
+# PPO objective with GAE over minibatch epochs, hyperparameters follow train_ppo.py (clip 0.2, 10 epochs,
+# 3e-4 linearly annealed, gamma 0.99, lambda 0.95, no entropy bonus) except for larger minibatches.
+# numpy's BLAS spreads the matrix products over the available cores.
+#
+# the opponent is the built-in BaselinePolicy, or with --selfplay a frozen copy of the actor that is
+# replaced (and saved to history_*.bin) whenever the current actor beats it by more than BEST_THRESHOLD
+# on average, as in train_ppo_selfplay.py. the self-play evaluation plays waves of --selfplay-wave
+# matches and stops once the comparison with BEST_THRESHOLD is decided (sequential_eval.py), so a
+# clear win or loss costs a wave or two instead of --eval-episodes matches.
+#
+# every --eval-freq updates the deterministic actor plays --eval-episodes matches against the baseline,
+# the best one is saved to LOGDIR/best_model.bin (mlp.games['ppo'] layout, see Model.makePPOPolicy).
+#
+# run: python training/train_ppo_numpy.py [--selfplay]
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import argparse
+import numpy as np
+import slimevolley
+import mlp
+import model_format
+import checkpoint
+from mlp import Model
+from ppo import ActorCritic, PPO, gae
+from utils import population_rollout
+from sequential_eval import SequentialEvaluation
+
+# Settings
+SEED = 721
+BEST_THRESHOLD = 0.5 # selfplay: must achieve a mean score above this to replace the frozen opponent
+LOGDIR = "ppo_numpy"
+
+def sample(logits, np_random):
+  """ stochastic MultiBinary action from the logits of an mlp.games['ppo'] model """
+  return (np_random.random(logits.shape) < 1.0 / (1.0 + np.exp(-logits))).astype(np.float64)
+
+def evaluate(eval_venv, policy, actor_params, opponent=None):
+  """ mean score of the deterministic actor over eval_venv.num_envs matches """
+  policy.set_population(actor_params[None])
+  reward, _ = population_rollout(eval_venv, policy, opponent)
+  return reward.mean()
+
+def selfplay_test(wave_venv, policy, actor_params, opponent, max_trials, seed):
+  """ waves of wave_venv.num_envs matches against the opponent until the comparison with BEST_THRESHOLD is decided """
+  wave = wave_venv.num_envs
+  test = SequentialEvaluation(BEST_THRESHOLD, max_trials=max_trials, min_trials=wave, check_every=wave)
+  policy.set_population(actor_params[None])
+  while not test.done:
+    reward, _ = population_rollout(wave_venv, policy, opponent, seeds=seed + test.n + np.arange(wave))
+    test.extend(reward)
+  return test
+
+def collect(venv, ac, state, steps, np_random, opponent=None):
+  """
+  steps x num_envs transitions. state carries obs, otherObs and the running episode scores across calls,
+  returns the (steps, num_envs, ...) rollout, the value of the last observation and the finished episodes' scores.
+  """
+  n = venv.num_envs
+  obs_buf = np.zeros((steps, n, 12))
+  action_buf = np.zeros((steps, n, 3))
+  logp_buf = np.zeros((steps, n))
+  value_buf = np.zeros((steps, n))
+  reward_buf = np.zeros((steps, n))
+  done_buf = np.zeros((steps, n))
+  finished = []
+  obs, obs_left = state['obs'], state['otherObs']
+  for t in range(steps):
+    action, logp, value = ac.act(obs, np_random)
+    action_left = None if opponent is None else sample(opponent.predict_batch(obs_left), np_random)
+    obs_buf[t], action_buf[t], logp_buf[t], value_buf[t] = obs, action, logp, value
+    obs, reward, terminated, truncated, info = venv.step(action, action_left)
+    obs_left = info['otherObs']
+    done = terminated | truncated
+    reward_buf[t], done_buf[t] = reward, done
+    state['score'] += reward
+    if done.any():
+      rows = np.nonzero(done)[0]
+      finished.extend(state['score'][rows])
+      state['score'][rows] = 0
+      reset_obs, reset_info = venv.reset(rows)
+      obs, obs_left = obs.copy(), obs_left.copy()
+      obs[rows], obs_left[rows] = reset_obs[rows], reset_info['otherObs'][rows]
+  state['obs'], state['otherObs'] = obs, obs_left
+  return (obs_buf, action_buf, logp_buf, value_buf, reward_buf, done_buf), ac.value(obs), finished
+
+def train(args):
+  if not os.path.exists(LOGDIR):
+    os.makedirs(LOGDIR)
+
+  np_random = np.random.default_rng(args.seed)
+  ac = ActorCritic(np_random=np_random)
+  ppo = PPO(ac, learning_rate=args.lr, epochs=args.epochs, minibatch_size=args.minibatch, ent_coef=args.ent_coef)
+  game_config = mlp.games['ppo']
+  print("Number of parameters of the actor:", ac.actor.param_count, "critic:", ac.critic.param_count)
+
+  venv = slimevolley.SlimeVolleyVectorEnv(args.envs)
+  venv.seed(args.seed + np.arange(args.envs))
+  eval_venv = slimevolley.SlimeVolleyVectorEnv(args.eval_episodes)
+  eval_venv.seed(args.seed + args.envs + np.arange(args.eval_episodes))
+  eval_policy = Model(game_config)
+  opponent = Model(game_config) if args.selfplay else None
+  wave_venv = slimevolley.SlimeVolleyVectorEnv(args.selfplay_wave) if args.selfplay else None
+  if opponent is not None:
+    opponent.set_model_params(ac.actor_params())
+
+  update, timesteps, generation, best_score = 0, 0, 0, -np.inf
+  filename = checkpoint.resume_file(LOGDIR, args.resume) if args.resume is not None else None
+  if filename is not None:
+    arrays, meta = checkpoint.load(filename)
+    ppo.set_state(arrays, meta)
+    if opponent is not None:
+      opponent.set_model_params(arrays['opponent'])
+    update, timesteps, generation, best_score = meta['update'], meta['timesteps'], meta['generation'], meta['best_score']
+    checkpoint.set_rng_state(meta['np_random'], np_random)
+    print("resuming from", filename, "at update", update)
+    # the episodes in progress are not saved, every env starts a fresh one
+    venv.seed(args.seed + update * args.envs + np.arange(args.envs))
+
+  obs, info = venv.reset()
+  state = {'obs': obs, 'otherObs': info['otherObs'], 'score': np.zeros(args.envs)}
+  writer = checkpoint.CheckpointWriter(keep=3)
+  history = []
+  batch = args.envs * args.steps
+  while timesteps < args.timesteps:
+    start_time = time.time()
+    rollout, last_value, finished = collect(venv, ac, state, args.steps, np_random, opponent)
+    obs, action, logp, value, reward, done = rollout
+    advantage, returns = gae(reward, value, done, last_value, args.gamma, args.lam)
+    collect_time = time.time() - start_time
+    learning_rate = args.lr * max(1.0 - timesteps / args.timesteps, 0.0)
+    stats = ppo.update(obs.reshape(batch, -1), action.reshape(batch, -1), logp.ravel(), advantage.ravel(),
+      returns.ravel(), np_random, learning_rate)
+    update += 1
+    timesteps += batch
+    history.extend(finished)
+
+    if update % args.log_freq == 0:
+      print("update:", update, "timesteps:", timesteps,
+            "mean_score:", np.round(np.mean(history), 3) if history else None,
+            "episodes:", len(history),
+            "entropy:", np.round(stats['entropy'], 3),
+            "approx_kl:", np.round(stats['approx_kl'], 4),
+            "value_loss:", np.round(stats['value_loss'], 4),
+            "steps/sec:", int(batch / (time.time() - start_time)),
+            "(collect", str(int(batch / collect_time))+")",
+           )
+      history = []
+
+    if update % args.eval_freq == 0:
+      actor = ac.actor_params()
+      score = evaluate(eval_venv, eval_policy, actor)
+      print("eval vs baseline:", np.round(score, 3), "best:", np.round(best_score, 3))
+      if score > best_score:
+        best_score = score
+        writer.submit_call(model_format.save, os.path.join(LOGDIR, "best_model"+model_format.EXTENSION),
+          actor, game_config, {'timesteps': timesteps, 'score': float(score)})
+      if opponent is not None:
+        test = selfplay_test(wave_venv, eval_policy, actor, opponent, args.eval_episodes,
+          args.seed + args.envs + args.eval_episodes + update * args.eval_episodes)
+        print("eval vs opponent:", test.summary())
+        if test.decision == 'above':
+          generation += 1
+          print("SELFPLAY: mean_reward achieved:", np.round(test.mean, 3), "over", test.n, "matches")
+          print("SELFPLAY: new best model, bumping up generation to", generation)
+          opponent.set_model_params(actor)
+          writer.submit_call(model_format.save, os.path.join(LOGDIR, "history_"+str(generation).zfill(8)+model_format.EXTENSION),
+            actor, game_config, {'timesteps': timesteps, 'generation': generation})
+
+    if update % args.checkpoint_freq == 0:
+      arrays, meta = ppo.get_state()
+      if opponent is not None:
+        arrays['opponent'] = opponent.get_model_params()
+      meta.update({'update': update, 'timesteps': timesteps, 'generation': generation,
+                   'best_score': float(best_score), 'np_random': checkpoint.rng_state(np_random)})
+      writer.submit(os.path.join(LOGDIR, "ckpt_"+str(update).zfill(8)+".npz"), arrays, meta)
+  writer.close()
+  model_format.save(os.path.join(LOGDIR, "final_model"+model_format.EXTENSION), ac.actor_params(), game_config)
+
+if __name__=="__main__":
+
+  parser = argparse.ArgumentParser(description='NumPy PPO on the vectorized env.')
+  parser.add_argument('--selfplay', help='train against frozen copies of itself instead of the baseline', action='store_true')
+  parser.add_argument('--seed', help='random seed (integer)', type=int, default=SEED)
+  parser.add_argument('--timesteps', help='total timesteps', type=float, default=2e7)
+  parser.add_argument('--envs', help='parallel envs in the vectorized env', type=int, default=64)
+  parser.add_argument('--steps', help='steps per env per update', type=int, default=128)
+  parser.add_argument('--epochs', help='optimization epochs per update', type=int, default=10)
+  parser.add_argument('--minibatch', help='minibatch size', type=int, default=512)
+  parser.add_argument('--lr', help='Adam step size (linearly annealed to 0)', type=float, default=3e-4)
+  parser.add_argument('--ent-coef', help='entropy bonus', type=float, default=0.0)
+  parser.add_argument('--gamma', help='discount', type=float, default=0.99)
+  parser.add_argument('--lam', help='GAE lambda', type=float, default=0.95)
+  parser.add_argument('--log-freq', help='updates between log lines', type=int, default=1)
+  parser.add_argument('--eval-freq', help='updates between evaluations', type=int, default=25)
+  parser.add_argument('--eval-episodes', help='evaluation matches (played in one batch)', type=int, default=128)
+  parser.add_argument('--selfplay-wave', help='selfplay: matches per wave of the early-stopping evaluation against the opponent', type=int, default=32)
+  parser.add_argument('--checkpoint-freq', help='updates between checkpoints', type=int, default=25)
+  parser.add_argument('--resume', help='continue from a checkpoint (leave the value out for the latest in LOGDIR)', nargs='?', const='latest', default=None)
+
+  args = parser.parse_args()
+
+  train(args)
@@ -7,14 +7,22 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import os
+import argparse
 import gym
 import slimevolley
+import checkpoint
+import mlp
+import model_format
 import numpy as np
+from opponent_registry import OpponentRegistry
+from weight_broadcast import WeightBroadcast
+from sequential_eval import SequentialEvaluation
 
 from stable_baselines.ppo1 import PPO1
 from stable_baselines.common.policies import MlpPolicy
 from stable_baselines import logger
-from stable_baselines.common.callbacks import EvalCallback
+from stable_baselines.common.callbacks import BaseCallback, EvalCallback
+from stable_baselines.common.evaluation import evaluate_policy
 
 from shutil import copyfile # keep track of generations
 
@@ -22,20 +30,31 @@ from shutil import copyfile # keep track of generations
 SEED = 17
 NUM_TIMESTEPS = int(1e9)
 EVAL_FREQ = int(1e5)
-EVAL_EPISODES = int(1e2)
+EVAL_EPISODES = int(1e2) # at most, see EVAL_CHECK
+EVAL_CHECK = 10 # episodes between looks at the evaluation, it stops once the comparison with BEST_THRESHOLD is decided
 BEST_THRESHOLD = 0.5 # must achieve a mean score above this to replace prev best self
+CHECKPOINT_FREQ = int(1e6) # timesteps between full-state checkpoints (see SelfPlayCheckpoint)
+OPPONENT_POOL = 8 # past generations kept in memory
+LATEST_OPPONENT_PROB = 1.0 # chance to face the latest generation each episode, else one from the pool
 
 RENDER_MODE = False # set this to false if you plan on running for full 1000 trials.
 
 LOGDIR = "ppo1_selfplay"
 
 class SlimeVolleySelfPlayEnv(slimevolley.SlimeVolleyEnv):
-  # wrapper over the normal single player env, but loads the best self play model
+  # wrapper over the normal single player env, plays against generations of the best self play model.
+  # new generations are picked up and loaded in the background by an OpponentRegistry, reset only
+  # chooses one of the models already in memory.
   def __init__(self):
     super(SlimeVolleySelfPlayEnv, self).__init__()
     self.policy = self
     self.best_model = None
     self.best_model_filename = None
+    self.opponent_random = np.random.default_rng(SEED)
+    self.registry = OpponentRegistry(LOGDIR, self.load_opponent, pool_size=OPPONENT_POOL)
+  def load_opponent(self, filename):
+    print("loading model: ", filename)
+    return PPO1.load(filename)
   def predict(self, obs): # the policy
     if self.best_model is None:
       return self.action_space.sample() # return a random action
@@ -43,37 +62,100 @@ class SlimeVolleySelfPlayEnv(slimevolley.SlimeVolleyEnv):
       action, _ = self.best_model.predict(obs)
       return action
   def reset(self):
-    # load model if it's there
-    modellist = [f for f in os.listdir(LOGDIR) if f.startswith("history")]
-    modellist.sort()
-    if len(modellist) > 0:
-      filename = os.path.join(LOGDIR, modellist[-1]) # the latest best model
-      if filename != self.best_model_filename:
-        print("loading model: ", filename)
-        self.best_model_filename = filename
-        if self.best_model is not None:
-          del self.best_model
-        self.best_model = PPO1.load(filename, env=self)
+    filename, model = self.registry.sample(self.opponent_random, LATEST_OPPONENT_PROB)
+    if model is not None:
+      self.best_model_filename, self.best_model = filename, model
     return super(SlimeVolleySelfPlayEnv, self).reset()
+  def close(self):
+    self.registry.close()
+    super(SlimeVolleySelfPlayEnv, self).close()
+
+def publish(broadcast, filename, generation):
+  """ put the actor of a history zip into the shared-memory slot (mlp.games['ppo'] layout, plays deterministically) """
+  params, layers = model_format.read_stable_baselines(filename)
+  broadcast.publish(params, mlp.games['ppo']._replace(layers=layers), extra={'generation': generation})
 
 class SelfPlayCallback(EvalCallback):
   # hacked it to only save new version of best model if beats prev self by BEST_THRESHOLD score
-  # after saving model, resets the best score to be BEST_THRESHOLD
-  def __init__(self, *args, **kwargs):
+  # the evaluation plays EVAL_CHECK episodes at a time and stops as soon as the mean score is
+  # significantly above or below BEST_THRESHOLD (sequential_eval.py), at most n_eval_episodes.
+  # with a broadcast (weight_broadcast.WeightBroadcast) every promotion is also published to it,
+  # workers playing against a BroadcastPolicy switch at their next reset.
+  def __init__(self, *args, broadcast=None, **kwargs):
     super(SelfPlayCallback, self).__init__(*args, **kwargs)
     self.best_mean_reward = BEST_THRESHOLD
     self.generation = 0
+    self.broadcast = broadcast
   def _on_step(self) -> bool:
-    result = super(SelfPlayCallback, self)._on_step()
-    if result and self.best_mean_reward > BEST_THRESHOLD:
+    if self.eval_freq <= 0 or self.n_calls % self.eval_freq != 0:
+      return True
+    test = SequentialEvaluation(BEST_THRESHOLD, max_trials=self.n_eval_episodes, min_trials=EVAL_CHECK, check_every=EVAL_CHECK)
+    while not test.done:
+      rewards, _ = evaluate_policy(self.model, self.eval_env, n_eval_episodes=EVAL_CHECK,
+        deterministic=self.deterministic, return_episode_rewards=True)
+      test.extend(rewards)
+    self.last_mean_reward = test.mean
+    if self.verbose > 0:
+      print("Eval num_timesteps={}, mean_reward={:.2f} +/- {:.2f}, {}".format(self.num_timesteps, test.mean, test.std, test.summary()))
+    if test.decision == 'above':
+      self.model.save(os.path.join(self.best_model_save_path, "best_model"))
       self.generation += 1
-      print("SELFPLAY: mean_reward achieved:", self.best_mean_reward)
+      print("SELFPLAY: mean_reward achieved:", test.mean, "over", test.n, "episodes")
       print("SELFPLAY: new best model, bumping up generation to", self.generation)
       source_file = os.path.join(LOGDIR, "best_model.zip")
       backup_file = os.path.join(LOGDIR, "history_"+str(self.generation).zfill(8)+".zip")
-      copyfile(source_file, backup_file)
-      self.best_mean_reward = BEST_THRESHOLD
-    return result
+      copyfile(source_file, backup_file+".tmp") # the opponent registry only sees complete files
+      os.replace(backup_file+".tmp", backup_file)
+      if self.broadcast is not None:
+        publish(self.broadcast, backup_file, self.generation)
+    return True
+
+class SelfPlayCheckpoint(BaseCallback):
+  """
+  every CHECKPOINT_FREQ timesteps saves the PPO model (ckpt_*.zip) and the rest of the run's
+  state next to it (ckpt_*.npz, written by a background thread): the env's RNG, the opponent
+  it is playing, the self-play generation and best score of the eval callback, and np.random.
+  resume() restores all of it. the episode in progress at checkpoint time is not saved,
+  learning resumes from a fresh episode.
+  """
+  def __init__(self, env, selfplay_callback, freq=CHECKPOINT_FREQ):
+    super(SelfPlayCheckpoint, self).__init__()
+    self.env = env
+    self.selfplay_callback = selfplay_callback
+    self.freq = freq
+    self.writer = checkpoint.CheckpointWriter(keep=3)
+  def _on_step(self) -> bool:
+    if self.num_timesteps % self.freq == 0:
+      name = os.path.join(LOGDIR, "ckpt_"+str(self.num_timesteps).zfill(12))
+      self.model.save(name+".tmp.zip") # tensorflow session, has to stay on this thread
+      os.replace(name+".tmp.zip", name+".zip")
+      self.writer.submit(name+".npz", {}, {
+        'num_timesteps': self.num_timesteps,
+        'generation': self.selfplay_callback.generation,
+        'best_mean_reward': float(self.selfplay_callback.best_mean_reward),
+        'best_model_filename': self.env.best_model_filename,
+        'env_random': checkpoint.rng_state(self.env.np_random),
+        'opponent_random': checkpoint.rng_state(self.env.opponent_random),
+        'np_random': checkpoint.rng_state(),
+      })
+    return True
+  def _on_training_end(self) -> None:
+    self.writer.close()
+  def resume(self, filename):
+    """ restore the state saved with filename (ckpt_*.npz), returns the model to keep training """
+    _, meta = checkpoint.load(filename)
+    model = PPO1.load(os.path.splitext(filename)[0]+".zip", env=self.env)
+    self.selfplay_callback.generation = meta['generation']
+    self.selfplay_callback.best_mean_reward = meta['best_mean_reward']
+    checkpoint.set_rng_state(meta['env_random'], self.env.np_random)
+    if 'opponent_random' in meta:
+      checkpoint.set_rng_state(meta['opponent_random'], self.env.opponent_random)
+    checkpoint.set_rng_state(meta['np_random'])
+    opponent = meta.get('best_model_filename')
+    if opponent is not None and os.path.exists(opponent):
+      self.env.best_model_filename, self.env.best_model = opponent, self.env.load_opponent(opponent)
+    print("resuming from", filename, "at timestep", meta['num_timesteps'], "generation", meta['generation'])
+    return model
 
 def rollout(env, policy):
   """ play one agent vs the other in modified gym-style loop. """
@@ -94,10 +176,15 @@ def rollout(env, policy):
 
   return total_reward
 
-def train():
+def train(resume=None, broadcast=False):
   # train selfplay agent
   logger.configure(folder=LOGDIR)
 
+  slot = None
+  if broadcast:
+    slot = WeightBroadcast()
+    print("publishing promoted models to shared memory slot:", slot.name)
+
   env = SlimeVolleySelfPlayEnv()
   env.seed(SEED)
 
@@ -110,14 +197,31 @@ def train():
     log_path=LOGDIR,
     eval_freq=EVAL_FREQ,
     n_eval_episodes=EVAL_EPISODES,
-    deterministic=False)
+    deterministic=False,
+    broadcast=slot)
 
-  model.learn(total_timesteps=NUM_TIMESTEPS, callback=eval_callback)
+  checkpoint_callback = SelfPlayCheckpoint(env, eval_callback)
+  filename = checkpoint.resume_file(LOGDIR, resume) if resume is not None else None
+  if filename is not None:
+    model = checkpoint_callback.resume(filename)
+    # the slot is new, put the newest promoted generation back into it
+    newest = os.path.join(LOGDIR, "history_"+str(eval_callback.generation).zfill(8)+".zip")
+    if slot is not None and os.path.exists(newest):
+      publish(slot, newest, eval_callback.generation)
+
+  model.learn(total_timesteps=NUM_TIMESTEPS, callback=[eval_callback, checkpoint_callback], reset_num_timesteps=filename is None)
 
   model.save(os.path.join(LOGDIR, "final_model")) # probably never get to this point.
 
   env.close()
+  if slot is not None:
+    slot.close()
 
 if __name__=="__main__":
 
-  train()
+  parser = argparse.ArgumentParser(description='Self-play PPO.')
+  parser.add_argument('--resume', help='continue from a checkpoint (leave the value out for the latest in LOGDIR)', nargs='?', const='latest', default=None)
+  parser.add_argument('--broadcast', help='also publish promoted models to a shared memory slot (weight_broadcast.py)', action='store_true')
+  args = parser.parse_args()
+
+  train(args.resume, args.broadcast)
@@ -0,0 +1,104 @@
+"""
+Single-producer single-consumer ring buffer of trajectory chunks in shared memory.
+
+every slot holds one chunk: a fixed set of named arrays (spec: name -> (shape, dtype)),
+laid out back to back in one shared-memory block. the producer (an actor process)
+fills the slot at head and bumps head, the consumer (the learner) reads the slot at
+tail and bumps tail. head and tail are the only shared state, each written by one
+side only, so neither side takes a lock; the producer only waits when all slots are
+full, i.e. when the consumer is `slots` chunks behind.
+
+usage:
+
+  ring = TrajectoryRing(spec, slots=4)                   # learner
+  ring = TrajectoryRing(spec, slots=4, name=name)        # actor, attached by name
+
+  chunk = ring.reserve()       # actor: dict of writable views, None if full
+  chunk['obs'][:] = ...
+  ring.commit()
+
+  chunk = ring.peek()          # learner: dict of views, None if empty
+  ...
+  ring.release()
+"""
+
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+_HEADER = 64 # head, tail and closed flag, padded to a cache line
+
+class TrajectoryRing:
+  def __init__(self, spec, slots=4, name=None):
+    self.spec = {k: (tuple(shape), np.dtype(dtype)) for k, (shape, dtype) in spec.items()}
+    self.slots = slots
+    offsets, size = {}, 0
+    for k, (shape, dtype) in self.spec.items():
+      offsets[k] = size
+      size += int(np.prod(shape)) * dtype.itemsize
+      size += (-size) % 64
+    self.slot_size = size
+    if name is None:
+      self.shm = shared_memory.SharedMemory(create=True, size=_HEADER + slots * size)
+      self.owner = True
+    else:
+      self.shm = shared_memory.SharedMemory(name=name)
+      self.owner = False
+    self._counters = np.ndarray(3, dtype=np.uint64, buffer=self.shm.buf) # [head, tail, closed]
+    if self.owner:
+      self._counters[:] = 0
+    self._views = [{k: np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=_HEADER + i * size + offsets[k])
+                    for k, (shape, dtype) in self.spec.items()} for i in range(slots)]
+
+  @property
+  def name(self):
+    return self.shm.name
+
+  def __len__(self):
+    """ chunks committed and not yet released """
+    return int(self._counters[0]) - int(self._counters[1])
+
+  @property
+  def closed(self):
+    return bool(self._counters[2])
+
+  def close_producers(self):
+    """ ask the producer to stop (it sees closed at its next reserve / wait) """
+    self._counters[2] = 1
+
+  def reserve(self):
+    """ producer: the slot to fill next, None if the ring is full """
+    head = int(self._counters[0])
+    if head - int(self._counters[1]) >= self.slots:
+      return None
+    return self._views[head % self.slots]
+
+  def wait_reserve(self, poll_interval=1e-4):
+    """ producer: reserve(), waiting while the ring is full. None once the ring is closed """
+    while not self.closed:
+      chunk = self.reserve()
+      if chunk is not None:
+        return chunk
+      time.sleep(poll_interval)
+    return None
+
+  def commit(self):
+    """ producer: publish the reserved slot """
+    self._counters[0] += 1
+
+  def peek(self):
+    """ consumer: the oldest committed chunk, None if there is none """
+    tail = int(self._counters[1])
+    if int(self._counters[0]) == tail:
+      return None
+    return self._views[tail % self.slots]
+
+  def release(self):
+    """ consumer: hand the peeked slot back to the producer """
+    self._counters[1] += 1
+
+  def close(self):
+    del self._counters, self._views
+    self.shm.close()
+    if self.owner:
+      self.shm.unlink()
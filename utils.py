@@ -1,12 +1,25 @@
 import numpy as np
-import cv2
 
-def multiagent_rollout(env, policy_right, policy_left, render_mode=False):
+def multiagent_rollout(env, policy_right, policy_left, render_mode=False, recorder=None, events=None, cache=None):
   """
   play one agent vs the other in modified gym-style loop.
   important: returns the score from perspective of policy_right.
+
+  recorder: optional dataset.DatasetWriter, receives every transition.
+  events: optional events.EventRecorder, logs game events of this match.
+  cache: optional match_cache.MatchCache, consulted before simulating (only when
+  nothing is rendered or recorded).
   """
+  key = None
+  if cache is not None and not render_mode and recorder is None and events is None:
+    key, result = cache.lookup(env, policy_right, policy_left)
+    if result is not None:
+      return result
+
   obs_right, info = env.reset()
+  if events is not None:
+    events.begin_match(offset=len(recorder) if recorder is not None else None)
+    env.game.events = events
   obs_left = obs_right # same observation at the very beginning for the other agent
 
   done = False
@@ -20,8 +33,16 @@ def multiagent_rollout(env, policy_right, policy_left, render_mode=False):
 
     # uses a 2nd (optional) parameter for step to put in the other action
     # and returns the other observation in the 4th optional "info" param in gym's step()
-    obs_right, reward, terminated, truncated, info = env.step(action_right, action_left)
+    next_obs_right, reward, terminated, truncated, info = env.step(action_right, action_left)
     done = terminated or truncated
+
+    if recorder is not None:
+      if env.atari_mode:
+        action_right = env.discreteToBox(action_right)
+        action_left = env.discreteToBox(action_left)
+      recorder.write(obs_right, action_right, reward, terminated, truncated, obs_left, action_left)
+
+    obs_right = next_obs_right
     obs_left = info['otherObs']
 
     total_reward += reward
@@ -30,14 +51,48 @@ def multiagent_rollout(env, policy_right, policy_left, render_mode=False):
     if render_mode:
       env.render()
 
+  if events is not None:
+    events.end_match(t)
+    env.game.events = None
+
+  if key is not None:
+    cache.store(key, env, policy_right, policy_left, total_reward, t)
+
   return total_reward, t
 
+def population_rollout(venv, policy, opponent=None, seeds=None):
+  """
+  play venv.num_envs matches at once on a slimevolley.SlimeVolleyVectorEnv.
+  policy is an mlp.Model holding P candidates (set_population), it plays the right agents:
+  candidate p gets envs [p*E, (p+1)*E) with E = num_envs / P.
+  opponent: None for the env's batched BaselinePolicy, or a stateless policy with
+  predict_batch (e.g. an mlp.Model) playing every left agent.
+  seeds: optional (num_envs,) seeds, see SlimeVolleyVectorEnv.reset.
+  returns (num_envs,) total rewards from the right agents' perspective and (num_envs,) lengths.
+  """
+  n = venv.num_envs
+  obs, info = venv.reset(seeds=seeds)
+  obs_left = info['otherObs']
+  done = np.zeros(n, dtype=bool)
+  total_reward = np.zeros(n)
+  length = np.zeros(n, dtype=np.int64)
+  while not done.all():
+    action = policy.predict_population(obs.reshape(policy.population_size, -1, obs.shape[-1])).reshape(n, -1)
+    action_left = None if opponent is None else opponent.predict_batch(obs_left)
+    obs, reward, terminated, truncated, info = venv.step(action, action_left)
+    obs_left = info['otherObs']
+    total_reward += reward * ~done # finished envs keep stepping until every match is over
+    length += ~done
+    done |= terminated | truncated
+  return total_reward, length
+
 def render_atari(obs):
   """
   Helper function that takes in a processed obs (84,84,4)
   Useful for visualizing what an Atari agent actually *sees*
   Outputs in Atari visual format (Top: resized to orig dimensions, buttom: 4 frames)
   """
+  import cv2
   tempObs = []
   obs = np.copy(obs)
   for i in range(4):
@@ -0,0 +1,238 @@
+"""
+Vectorized slime volley simulator: N independent games stepped in lockstep.
+
+Every game.py rule (Agent.update, DelayScreen, Particle.applyAcceleration,
+limitSpeed, move, bounce, checkEdges) is applied to numpy arrays with one row
+per game, in the same order and with the same float operations, so a row
+evolves exactly like a Game driven by the same actions. Each row owns its own
+np.random.Generator for the serve (see Game._create_ball), seeded the same
+way SlimeVolleyEnv.seed seeds a Game.
+
+agent arrays are (N, 2): column 0 is the left agent (dir -1), column 1 the
+right agent (dir 1). rendering and event logging are left to game.Game.
+"""
+
+import numpy as np
+from gymnasium.utils import seeding
+from config import *
+
+AGENT_R = 1.5
+BALL_R = 0.5
+STUB_R = REF_WALL_WIDTH / 2
+STUB_X = 0
+STUB_Y = REF_WALL_HEIGHT
+DIR = np.array([-1.0, 1.0])
+
+class VectorGame:
+  """ N games, stepped with (N, 2, 3) actions (left, right) """
+  def __init__(self, num_games, np_randoms=None):
+    self.num_games = num_games
+    n = num_games
+    self.x = np.zeros((n, 2))
+    self.y = np.zeros((n, 2))
+    self.vx = np.zeros((n, 2))
+    self.vy = np.zeros((n, 2))
+    self.desired_vx = np.zeros((n, 2))
+    self.desired_vy = np.zeros((n, 2))
+    self.life = np.zeros((n, 2), dtype=np.int64)
+    self.bx = np.zeros(n)
+    self.by = np.zeros(n)
+    self.bvx = np.zeros(n)
+    self.bvy = np.zeros(n)
+    self.prev_bx = np.zeros(n)
+    self.prev_by = np.zeros(n)
+    self.delay = np.zeros(n, dtype=np.int64) # DelayScreen.life
+    self.frame = np.zeros(n, dtype=np.int64)
+    self.state = np.zeros((n, 2, 12)) # RelativeState of each agent, unscaled
+    if np_randoms is None:
+      np_randoms = [np.random.default_rng() for _ in range(n)]
+    self.np_randoms = list(np_randoms)
+    self.reset()
+
+  def seed(self, rows, seeds):
+    """ same as SlimeVolleyEnv.seed(seed) for every row: a fresh generator, and a game built from it """
+    rows = np.atleast_1d(rows)
+    for row, seed in zip(rows, np.atleast_1d(seeds)):
+      self.np_randoms[row], _ = seeding.np_random(None if seed is None else int(seed))
+    self.reset(rows)
+
+  def _create_ball(self, rows):
+    for row in rows:
+      np_random = self.np_randoms[row]
+      self.bvx[row] = np_random.uniform(low=-20, high=20)
+      self.bvy[row] = np_random.uniform(low=10, high=25)
+    self.bx[rows] = 0
+    self.by[rows] = REF_W / 4
+    self.prev_bx[rows] = self.bx[rows]
+    self.prev_by[rows] = self.by[rows]
+
+  def reset(self, rows=None):
+    """ Game.reset for the given rows (all by default) """
+    rows = np.arange(self.num_games) if rows is None else np.atleast_1d(rows)
+    self._create_ball(rows)
+    self.x[rows] = DIR * (REF_W / 4)
+    self.y[rows] = 1.5
+    self.vx[rows] = 0
+    self.vy[rows] = 0
+    self.desired_vx[rows] = 0
+    self.desired_vy[rows] = 0
+    self.life[rows] = MAXLIVES
+    self.delay[rows] = INIT_DELAY_FRAMES
+    self.frame[rows] = 0
+    self._update_state(rows)
+
+  def set_action(self, action):
+    """ Agent.setAction for (N, 2, 3) actions, buttons are pressed when > 0 """
+    pressed = np.asarray(action) > 0
+    forward, backward, jump = pressed[..., 0], pressed[..., 1], pressed[..., 2]
+    self.desired_vx[:] = 0
+    self.desired_vx[forward & ~backward] = -PLAYER_SPEED_X
+    self.desired_vx[backward & ~forward] = PLAYER_SPEED_X
+    self.desired_vy[:] = np.where(jump, PLAYER_SPEED_Y, 0)
+
+  def step(self):
+    """ Game.step for every row, returns the (N,) scores """
+    self.frame += 1
+    self._update_agents()
+    self._update_ball()
+    self._collide(self.x[:, 0], self.y[:, 0], self.vx[:, 0], self.vy[:, 0], AGENT_R)
+    self._collide(self.x[:, 1], self.y[:, 1], self.vx[:, 1], self.vy[:, 1], AGENT_R)
+    self._collide(STUB_X, STUB_Y, 0, 0, STUB_R)
+    score = -self._check_edges()
+
+    scored = np.nonzero(score)[0]
+    if len(scored) > 0:
+      # newMatch, and the loser drops a life. agent states are not updated on a scoring frame.
+      self._create_ball(scored)
+      self.delay[scored] = INIT_DELAY_FRAMES
+      self.life[scored, 1] -= score[scored] < 0
+      self.life[scored, 0] -= score[scored] > 0
+    self._update_state(np.nonzero(score == 0)[0] if len(scored) > 0 else None)
+    return score
+
+  def _update_agents(self):
+    self.vy += GRAVITY * TIMESTEP
+    on_ground = self.y <= REF_U + NUDGE * TIMESTEP
+    self.vy[on_ground] = self.desired_vy[on_ground]
+    self.vx[:] = self.desired_vx * DIR
+    self.x += self.vx * TIMESTEP
+    self.y += self.vy * TIMESTEP
+    below = self.y <= REF_U
+    self.y[below] = REF_U
+    self.vy[below] = 0
+    fence = self.x * DIR <= (REF_WALL_WIDTH / 2 + AGENT_R)
+    self.vx[fence] = 0
+    self.x[fence] = np.broadcast_to(DIR * (REF_WALL_WIDTH / 2 + AGENT_R), self.x.shape)[fence]
+    wall = self.x * DIR >= (REF_W / 2 - AGENT_R)
+    self.vx[wall] = 0
+    self.x[wall] = np.broadcast_to(DIR * (REF_W / 2 - AGENT_R), self.x.shape)[wall]
+
+  def _update_ball(self):
+    moving = self.delay == 0
+    self.delay[~moving] -= 1
+    rows = np.nonzero(moving)[0]
+    # applyAcceleration(0, GRAVITY)
+    vx = self.bvx[rows] + 0 * TIMESTEP
+    vy = self.bvy[rows] + GRAVITY * TIMESTEP
+    # limitSpeed(0, MAX_BALL_SPEED)
+    mag2 = vx*vx+vy*vy
+    fast = mag2 > (MAX_BALL_SPEED*MAX_BALL_SPEED)
+    mag = np.sqrt(mag2[fast])
+    vx[fast] = vx[fast] / mag * MAX_BALL_SPEED
+    vy[fast] = vy[fast] / mag * MAX_BALL_SPEED
+    self.bvx[rows] = vx
+    self.bvy[rows] = vy
+    self.prev_bx[rows] = self.bx[rows]
+    self.prev_by[rows] = self.by[rows]
+    self.bx[rows] += vx * TIMESTEP
+    self.by[rows] += vy * TIMESTEP
+
+  def _collide(self, ox, oy, ovx, ovy, other_r):
+    """ Particle.isColliding / bounce of the ball against circles at (ox, oy) moving at (ovx, ovy), (N,) arrays or scalars """
+    r = BALL_R + other_r
+    dy = oy - self.by
+    dx = ox - self.bx
+    rows = np.nonzero(r*r > (dx*dx+dy*dy))[0]
+    if len(rows) == 0:
+      return
+    pick = lambda a: a[rows] if np.ndim(a) else a
+    ox, oy, ovx, ovy = pick(ox), pick(oy), pick(ovx), pick(ovy)
+    bx, by = self.bx[rows], self.by[rows]
+    delta_x = bx - ox
+    delta_y = by - oy
+    distance = np.sqrt(delta_x**2 + delta_y**2)
+    normal_x = delta_x / distance
+    normal_y = delta_y / distance
+    nudge_x = normal_x * NUDGE
+    nudge_y = normal_y * NUDGE
+    # move the ball out of the other circle
+    inside = np.ones(len(rows), dtype=bool)
+    while inside.any():
+      bx[inside] += nudge_x[inside]
+      by[inside] += nudge_y[inside]
+      dy = oy - by
+      dx = ox - bx
+      inside &= r*r > (dx*dx+dy*dy)
+    self.bx[rows] = bx
+    self.by[rows] = by
+    relative_vx = self.bvx[rows] - ovx
+    relative_vy = self.bvy[rows] - ovy
+    dot_product = relative_vx * normal_x + relative_vy * normal_y
+    impulse_x = normal_x * (dot_product * 2.0)
+    impulse_y = normal_y * (dot_product * 2.0)
+    self.bvx[rows] = (relative_vx - impulse_x) + ovx
+    self.bvy[rows] = (relative_vy - impulse_y) + ovy
+
+  def _check_edges(self):
+    """ Particle.checkEdges for the ball, returns (N,) BALL_SCORE_LEFT / BALL_SCORE_RIGHT / NO_SCORE """
+    left = self.bx <= (BALL_R - REF_W / 2)
+    self.bvx[left] *= -FRICTION
+    self.bx[left] = BALL_R - REF_W / 2 + NUDGE * TIMESTEP
+    right = self.bx >= (REF_W / 2 - BALL_R)
+    self.bvx[right] *= -FRICTION
+    self.bx[right] = REF_W / 2 - BALL_R - NUDGE * TIMESTEP
+
+    score = np.full(self.num_games, NO_SCORE, dtype=np.int64)
+    ground = self.by <= (BALL_R + REF_U)
+    self.bvy[ground] *= -FRICTION
+    self.by[ground] = BALL_R + REF_U + NUDGE * TIMESTEP
+    score[ground] = np.where(self.bx[ground] <= 0, BALL_SCORE_LEFT, BALL_SCORE_RIGHT)
+    ceiling = ~ground & (self.by >= (REF_H - BALL_R))
+    self.bvy[ceiling] *= -FRICTION
+    self.by[ceiling] = REF_H - BALL_R - NUDGE * TIMESTEP
+
+    # fence, only checked when nobody scored
+    edge = REF_WALL_WIDTH / 2 + BALL_R
+    low = ~ground & (self.by <= REF_WALL_HEIGHT)
+    from_right = low & (self.bx <= edge) & (self.prev_bx > edge)
+    self.bvx[from_right] *= -FRICTION
+    self.bx[from_right] = edge + NUDGE * TIMESTEP
+    from_left = low & (self.bx >= -edge) & (self.prev_bx < -edge)
+    self.bvx[from_left] *= -FRICTION
+    self.bx[from_left] = -edge - NUDGE * TIMESTEP
+    return score
+
+  def _update_state(self, rows=None):
+    """ Agent.updateState for both agents of the given rows (all by default) """
+    d = DIR
+    s = np.empty_like(self.state)
+    s[:, :, 0] = self.x*d
+    s[:, :, 1] = self.y
+    s[:, :, 2] = self.vx*d
+    s[:, :, 3] = self.vy
+    s[:, :, 4] = self.bx[:, None]*d
+    s[:, :, 5] = self.by[:, None]
+    s[:, :, 6] = self.bvx[:, None]*d
+    s[:, :, 7] = self.bvy[:, None]
+    s[:, :, 8] = self.x[:, ::-1]*(-d)
+    s[:, :, 9] = self.y[:, ::-1]
+    s[:, :, 10] = self.vx[:, ::-1]*(-d)
+    s[:, :, 11] = self.vy[:, ::-1]
+    if rows is None:
+      self.state = s
+    else:
+      self.state[rows] = s[rows]
+
+  def observation(self):
+    """ (N, 2, 12) observations (left, right), as Agent.getObservation """
+    return self.state / 10.0
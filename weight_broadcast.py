@@ -0,0 +1,132 @@
+"""
+Publish / subscribe of opponent weights through one shared-memory slot.
+
+the learner publishes a model (flat params + GameConfig, serialized with
+model_format.dumps, the same bytes as a .bin file) into a named shared-memory
+slot. the slot is guarded by a seqlock: the writer makes the sequence counter
+odd, copies the payload, then makes it even again; a reader copies the payload
+and retries if the counter was odd or changed meanwhile. readers never block
+the writer and never take a lock, and the version (counter / 2) is a single
+integer read, so polling it is free.
+
+there must be only one publisher per slot. BroadcastPolicy is the subscriber
+side: an env opponent (SlimeVolleyEnv.policy or the batched opponent of
+SlimeVolleyVectorEnv) that checks the version when its env resets and swaps in
+the new weights without any disk I/O.
+
+usage:
+
+  slot = WeightBroadcast(capacity=1<<20)              # learner
+  slot.publish(params, mlp.games['ppo'])
+
+  env.policy = BroadcastPolicy(WeightBroadcast(name=slot.name)) # any worker process
+"""
+
+import copy
+import time
+import numpy as np
+from multiprocessing import shared_memory
+import model_format
+from mlp import Model
+from policy import BaselinePolicy
+
+_HEADER = 64 # sequence counter and payload length, padded to a cache line
+
+class WeightBroadcast:
+  def __init__(self, name=None, capacity=1 << 22):
+    if name is None:
+      self.shm = shared_memory.SharedMemory(create=True, size=_HEADER + capacity)
+      self.owner = True
+    else:
+      self.shm = shared_memory.SharedMemory(name=name)
+      self.owner = False
+    self.capacity = self.shm.size - _HEADER
+    self._counters = np.ndarray(2, dtype=np.uint64, buffer=self.shm.buf) # [sequence, payload length]
+    self._payload = np.ndarray(self.capacity, dtype=np.uint8, buffer=self.shm.buf, offset=_HEADER)
+
+  @property
+  def name(self):
+    return self.shm.name
+
+  @property
+  def version(self):
+    """ number of models published so far (0: none yet) """
+    return int(self._counters[0]) // 2
+
+  def publish(self, params, game_config, extra=None, dtype=np.float32):
+    """ write a new version, returns its number """
+    data = np.frombuffer(model_format.dumps(params, game_config, extra, dtype), dtype=np.uint8)
+    if data.size > self.capacity:
+      raise ValueError("model of %d bytes does not fit in a %d byte slot" % (data.size, self.capacity))
+    self._counters[0] += 1 # odd: write in progress
+    self._payload[:data.size] = data
+    self._counters[1] = data.size
+    self._counters[0] += 1
+    return self.version
+
+  def read(self):
+    """ (version, params, GameConfig, extra) of a consistent snapshot, version 0 and None's when empty """
+    attempt = 0
+    while True:
+      attempt += 1
+      sequence = int(self._counters[0])
+      if sequence == 0:
+        return 0, None, None, None
+      if sequence % 2 == 1:
+        time.sleep(0 if attempt < 100 else 1e-4) # back off if the writer is slow (or descheduled)
+        continue
+      data = self._payload[:int(self._counters[1])].tobytes()
+      if int(self._counters[0]) == sequence:
+        params, game_config, extra = model_format.loads(data)
+        return sequence // 2, params, game_config, extra
+
+  def close(self):
+    del self._counters, self._payload
+    self.shm.close()
+    if self.owner:
+      self.shm.unlink()
+
+class BroadcastPolicy:
+  """
+  opponent that plays the latest model of a WeightBroadcast, picked up by refresh().
+  slimevolley envs call refresh() on reset, so a new version takes effect at the next
+  episode. SlimeVolleyVectorEnv keeps a snapshot() per env, so each env switches at its
+  own next reset and the others finish their episode against the version they started with.
+  fallback plays until the first version is published.
+  """
+  def __init__(self, broadcast, fallback=None):
+    self.broadcast = broadcast
+    self.fallback = BaselinePolicy() if fallback is None else fallback
+    self.model = None
+    self.version = 0
+    self._snapshot = None
+    self.refresh()
+
+  def refresh(self):
+    """ load the published model if it is newer than ours, returns True if it changed """
+    if self.broadcast.version == self.version:
+      return False
+    self.version, params, game_config, extra = self.broadcast.read()
+    model = Model(game_config) # a new one, snapshots keep playing the previous model
+    model.set_model_params(params)
+    self.model = model
+    return True
+
+  def snapshot(self):
+    """ a BroadcastPolicy that keeps playing the current version whatever refresh() loads later (one per version) """
+    if self._snapshot is None or self._snapshot.version != self.version:
+      snapshot = copy.copy(self)
+      snapshot._snapshot = snapshot
+      self._snapshot = snapshot
+    return self._snapshot
+
+  def predict(self, obs):
+    if self.model is None:
+      return self.fallback.predict(obs)
+    return self.model.predict(obs)
+
+  def predict_batch(self, obs, state=None):
+    """ same (action, state) contract as BaselinePolicy.predict_batch, the state is unused by mlp models """
+    if self.model is None:
+      return self.fallback.predict_batch(obs, state)
+    return self.model.predict_batch(obs), state
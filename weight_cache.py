@@ -0,0 +1,79 @@
+"""
+Process-wide cache of policy weights.
+
+Each model file is parsed once per process (keyed by path and mtime), and its
+arrays are copied into an anonymous shared mmap and handed out as read-only
+numpy views. Every BaselinePolicy / mlp.Model built from the same file shares
+those arrays, and workers forked after the file was loaded (e.g. after
+preload()) share the same physical pages instead of parsing their own copy.
+"""
+
+import os
+import copy
+import mmap
+import json
+import threading
+import numpy as np
+
+_lock = threading.Lock()
+_cache = {} # abspath -> (mtime_ns, arrays, extra)
+
+def _to_shared(arrays):
+  """ copy a dict of arrays into one anonymous shared mmap, return read-only views """
+  arrays = {k: np.ascontiguousarray(v) for k, v in arrays.items()}
+  offsets = {}
+  nbytes = 0
+  for name, a in arrays.items():
+    nbytes = (nbytes + 63) // 64 * 64 # keep every array cache-line aligned
+    offsets[name] = nbytes
+    nbytes += a.nbytes
+  buf = mmap.mmap(-1, max(nbytes, 1))
+  views = {}
+  for name, a in arrays.items():
+    view = np.frombuffer(buf, dtype=a.dtype, count=a.size, offset=offsets[name]).reshape(a.shape)
+    view[...] = a
+    view.flags.writeable = False
+    views[name] = view
+  return views
+
+def load(path, parse):
+  """
+  parse(path) -> (dict of arrays, extra) is only called when path is new or has changed on disk.
+  returns (dict of read-only shared arrays, extra). extra should be small (no weights), every
+  caller gets its own copy of it.
+  """
+  path = os.path.abspath(path)
+  mtime = os.stat(path).st_mtime_ns
+  with _lock:
+    entry = _cache.get(path)
+    if entry is not None and entry[0] == mtime:
+      return entry[1], copy.deepcopy(entry[2])
+  arrays, extra = parse(path)
+  arrays = _to_shared(arrays)
+  with _lock:
+    _cache[path] = (mtime, arrays, extra)
+  return arrays, copy.deepcopy(extra)
+
+def load_json(path):
+  """
+  generic json model file: every list in the top level object becomes an array, the other
+  entries are the extra. a top level list is [params, ...], its extra is {'json': [...]} as
+  in model_format.convert_json.
+  """
+  def parse(path):
+    with open(path) as f:
+      data = json.load(f)
+    if isinstance(data, dict):
+      arrays = {k: np.array(v) for k, v in data.items() if isinstance(v, list)}
+      return arrays, {k: v for k, v in data.items() if k not in arrays}
+    return {'params': np.array(data[0])}, {'json': data[1:]}
+  return load(path, parse)
+
+def preload(paths):
+  """ warm the cache in the parent process, before forking rollout workers """
+  for path in paths:
+    load_json(path)
+
+def clear():
+  with _lock:
+    _cache.clear()